@@ -1,53 +1,337 @@
 import os
 import time
 import re
-from flask import Flask, session, request, redirect, url_for, jsonify, render_template
+import math
+from flask import (Flask, session, request, redirect, url_for, jsonify, render_template, Response, stream_with_context,
+                   g, has_request_context)
 from flask_session import Session
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.oauth2 import SpotifyOAuth, SpotifyClientCredentials
 from dotenv import load_dotenv
-import musicbrainzngs # Still present in user's uploaded file
+import musicbrainzngs  # only to parse ws/2 XML, see musicbrainz_ws.py
 from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from geopy.exc import GeocoderTimedOut, GeocoderServiceError, GeocoderRateLimited, GeocoderUnavailable
 import wikipediaapi
 import concurrent.futures  # For parallel processing
+import threading
 import functools  # For advanced caching
-import json  # For disk caching
+import json  # For cache key generation
 import hashlib  # For cache key generation
-from datetime import datetime, timedelta  # For cache expiration
+import logging
+import logging.handlers
+import queue
+from contextlib import contextmanager
+from datetime import datetime  # For cache expiration
+from urllib.parse import urlsplit
 import requests
+from requests.adapters import HTTPAdapter
+import click
 from bs4 import BeautifulSoup
+from cache_store import JsonFileStore, SQLiteCacheDatabase, LRUFrontCache, migrate_json_caches
+from rate_limiter import UpstreamRateLimiter
+from upstream_guard import (Deadline, CircuitBreaker, UpstreamUnavailable, UpstreamError, DeadlineExceeded,
+                            CircuitOpenError, OPEN as CIRCUIT_OPEN, STATE_VALUES as CIRCUIT_STATE_VALUES)
+from singleflight import SingleFlight
+from resolution_jobs import BackgroundResolver, REFRESH, WARM
+from scheduler import QueueFull
+from gazetteer import Gazetteer, CITIES_FILE as GAZETTEER_CITIES_FILE
+from musicbrainz_records import MBArtistRecord
+from musicbrainz_ws import artist_search_request, artist_lookup_request, url_lookup_request, parse_response
+from wiki_infobox import origin_from_wikitext, has_infobox, ExtractionStats
+from metrics import Registry, SIZE_BUCKETS
+from cache_warming import read_seeds, WarmCheckpoint
+from response_cache import ResponseCache, CachedResponse, etag_matches
+from top_artist_ranges import TopArtistsLibrary
+from artist_keys import ArtistKeys, canonical_key, display_name, name_key, normalize_name, spotify_artist_id
+from clustering import ClusterIndex
+from session_store import SQLiteSessionInterface
+from facets import FacetIndex, REGION_LEVELS
+from wikidata_batch import (WIKIPEDIA_BATCH_SIZE, chunked, title_query_params, items_for_titles, origin_sparql,
+                            origins_from_bindings)
 
 # Load environment variables
 load_dotenv()
 
+# --- Logging ---
+# LOG_LEVEL=DEBUG traces every pipeline step per artist; INFO (default) logs one line per artist and request
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(threadName)s] %(name)s: %(message)s'
+# Worker threads only enqueue records; a single listener thread does the (blocking) stream writes
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+_queue_handler = logging.handlers.QueueHandler(_log_queue)
+_queue_handler.setFormatter(logging.Formatter('%(message)s'))  # message (+ traceback) only; the listener adds the rest
+logging.basicConfig(level=LOG_LEVEL, handlers=[_queue_handler])
+logger = logging.getLogger('music_map')
+
+# --- Metrics (served at /metrics) ---
+metrics = Registry()
+STAGE_SECONDS = metrics.histogram(
+    'music_map_stage_seconds', 'Latency of each artist resolution stage, cache hits included.', ['stage'])
+UPSTREAM_SECONDS = metrics.histogram(
+    'music_map_upstream_request_seconds', 'Upstream request latency, excluding rate-limit waits.', ['host'])
+UPSTREAM_REQUESTS = metrics.counter(
+    'music_map_upstream_requests_total', 'Upstream requests by host and outcome (HTTP status, ok, timeout or error).',
+    ['host', 'status'])
+RATE_LIMIT_WAIT_SECONDS = metrics.histogram(
+    'music_map_rate_limit_wait_seconds', 'Time spent queued for an upstream rate-limit token.', ['host'])
+CACHE_LOOKUPS = metrics.counter(
+    'music_map_cache_lookups_total', 'Cache lookups by cache and result (hit, miss; stale/negative for artists).',
+    ['cache', 'result'])
+REQUEST_SECONDS = metrics.histogram(
+    'music_map_request_seconds', 'Time to serve /top-artists, and to finish streaming /top-artists/stream.', ['route'])
+RESOLVER_QUEUE_WAIT_SECONDS = metrics.histogram(
+    'music_map_resolver_queue_wait_seconds', 'Time an artist waited in the resolver queue, by priority class.', ['class'])
+BATCH_SIZE = metrics.histogram(
+    'music_map_batch_size', 'Artists per request, per uncached set and per Wikipedia prefetch batch.', ['kind'],
+    buckets=SIZE_BUCKETS)
+
 # Initialize Flask App
 app = Flask(__name__, template_folder='templates', static_folder='static')
 
-# Configure Flask-Session
-app.config['SESSION_TYPE'] = 'filesystem'
+# Configure sessions
+# 'sqlite':     one row per session in a shared SQLite file, written only when it changes (default)
+# 'cookie':     Flask's signed cookie; no server-side storage at all (the session holds only the token fields)
+# 'filesystem': Flask-Session's one-file-per-session store (the original setup)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite').lower()
 app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY')
 if not app.config['SECRET_KEY']:
     raise ValueError("No FLASK_SECRET_KEY set. Set it in your .env file.")
-Session(app)
+if SESSION_BACKEND == 'sqlite':
+    app.session_interface = SQLiteSessionInterface(
+        os.getenv('SESSION_DB_FILE', os.path.join(os.path.dirname(__file__), "cache", "sessions.sqlite3")))
+elif SESSION_BACKEND == 'filesystem':
+    app.config['SESSION_TYPE'] = 'filesystem'
+    Session(app)
+elif SESSION_BACKEND != 'cookie':  # Flask's default session interface
+    raise ValueError(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r}; use 'sqlite', 'cookie' or 'filesystem'.")
 
 # --- Configure External APIs ---
-# MusicBrainz
-try:
-    musicbrainzngs.set_useragent(
-        "MusicGeoMapApp", "0.1", os.getenv("CONTACT_EMAIL", "default@example.com")
-    )
-except TypeError as e:
-     print(f"Warning: Could not set MusicBrainz user agent: {e}")
+# Base URLs can be pointed at local stubs (see benchmarks/bench_pipeline.py)
+MUSICBRAINZ_URL = urlsplit(os.getenv('MUSICBRAINZ_URL', 'https://musicbrainz.org'))
+NOMINATIM_URL = urlsplit(os.getenv('NOMINATIM_URL', 'https://nominatim.openstreetmap.org'))
+WIKIPEDIA_URL = os.getenv('WIKIPEDIA_URL', 'https://en.wikipedia.org').rstrip('/')
+WIKIDATA_URL = os.getenv('WIKIDATA_URL', 'https://query.wikidata.org').rstrip('/')
+SPOTIFY_API_URL = os.getenv('SPOTIFY_API_URL')  # e.g. http://127.0.0.1:8900/v1/ ; unset = Spotify itself
+
+# MusicBrainz: ws/2 over our own session, so calls run in parallel with a real timeout (see musicbrainz_ws.py)
+MB_WS_URL = f"{MUSICBRAINZ_URL.scheme}://{MUSICBRAINZ_URL.netloc}/ws/2/"
+mb_session = requests.Session()
+mb_session.headers['User-Agent'] = f'MusicGeoMapApp/0.1 ( {os.getenv("CONTACT_EMAIL", "default@example.com")} )'
+mb_session.mount(f'{MUSICBRAINZ_URL.scheme}://', HTTPAdapter(pool_connections=1,
+                                                             pool_maxsize=int(os.getenv('MB_POOL_SIZE', '16'))))
 
 # Geopy (Nominatim)
-geolocator = Nominatim(user_agent="MusicGeoMapApp/0.1")
+geolocator = Nominatim(user_agent="MusicGeoMapApp/0.1", domain=NOMINATIM_URL.netloc, scheme=NOMINATIM_URL.scheme)
+
+# Offline gazetteer (country centroids, first-level regions, major cities) checked before Nominatim
+GAZETTEER_ENABLED = os.getenv('GAZETTEER_ENABLED', 'true').lower() in ['true', '1', 't']
+if GAZETTEER_ENABLED:
+    gazetteer = Gazetteer.load(
+        cities_file=os.getenv('GAZETTEER_CITIES_FILE', GAZETTEER_CITIES_FILE),
+        min_population=int(os.getenv('GAZETTEER_MIN_POPULATION', '15000')),
+    )
+    logger.info("Gazetteer loaded: %s places", len(gazetteer))
+else:
+    gazetteer = None
+
+# --- Upstream Rate Limiting ---
+# One token bucket per host shared by all threads (requests/sec, burst).
+# MusicBrainz and Nominatim both ask for at most 1 req/s.
+MUSICBRAINZ_HOST = "musicbrainz.org"
+NOMINATIM_HOST = "nominatim.openstreetmap.org"
+WIKIPEDIA_HOST = "en.wikipedia.org"
+WIKIDATA_HOST = "query.wikidata.org"
+SPOTIFY_HOST = "api.spotify.com"  # not rate limited here; listed for metrics
+upstream_limiter = UpstreamRateLimiter({
+    MUSICBRAINZ_HOST: (float(os.getenv('RATE_LIMIT_MUSICBRAINZ', '1')), int(os.getenv('RATE_BURST_MUSICBRAINZ', '1'))),
+    NOMINATIM_HOST: (float(os.getenv('RATE_LIMIT_NOMINATIM', '1')), int(os.getenv('RATE_BURST_NOMINATIM', '1'))),
+    WIKIPEDIA_HOST: (float(os.getenv('RATE_LIMIT_WIKIPEDIA', '10')), int(os.getenv('RATE_BURST_WIKIPEDIA', '5'))),
+    WIKIDATA_HOST: (float(os.getenv('RATE_LIMIT_WIKIDATA', '2')), int(os.getenv('RATE_BURST_WIKIDATA', '2'))),
+})
+
+# --- Upstream Timeouts, Deadlines and Circuit Breakers ---
+# Longest single upstream request. Clients without a per-call timeout (spotipy)
+# are run on upstream_call_executor and abandoned after this long.
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv('UPSTREAM_TIMEOUT_SECONDS', '10'))
+# Overall budgets: one streamed /top-artists request, and one artist's pipeline run in the background
+REQUEST_BUDGET_SECONDS = float(os.getenv('REQUEST_BUDGET_SECONDS', '30'))
+ARTIST_BUDGET_SECONDS = float(os.getenv('ARTIST_BUDGET_SECONDS', '20'))
+# Consecutive timeouts / 5xx / 429 that open a host's breaker, and seconds until it lets a probe through
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+def log_circuit_change(host, old, new):
+    log = logger.warning if new == CIRCUIT_OPEN else logger.info
+    log("[Circuit] %s: %s -> %s", host, old, new)
+
+upstream_breakers = {
+    host: CircuitBreaker(host, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS, on_state_change=log_circuit_change)
+    for host in (MUSICBRAINZ_HOST, NOMINATIM_HOST, WIKIPEDIA_HOST, WIKIDATA_HOST, SPOTIFY_HOST)
+}
+upstream_call_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('UPSTREAM_CALL_WORKERS', '16')), thread_name_prefix='upstream'
+)
+
+def wait_for_upstream(host, label, deadline=None):
+    """Block until ``host`` is within budget, logging noticeable queue waits.
+
+    Raises DeadlineExceeded instead of queueing past ``deadline``.
+    """
+    waited = upstream_limiter.acquire(host, max_wait=deadline.remaining() if deadline else None)
+    if waited is None:
+        raise DeadlineExceeded(f"{label}: rate-limit queue is longer than the {deadline.budget:g}s budget allows")
+    RATE_LIMIT_WAIT_SECONDS.observe(waited, host=host)
+    if waited >= 0.5: logger.info("[%s] Waited %.2fs in rate-limit queue", label, waited)
+    return waited
+
+def upstream_status(error):
+    """Low-cardinality status label for a failed upstream call."""
+    if isinstance(error, GeocoderRateLimited): return '429'
+    if isinstance(error, GeocoderUnavailable): return 'unavailable'
+    names = type(error).__name__
+    if isinstance(error, (concurrent.futures.TimeoutError, DeadlineExceeded)) or 'Timeout' in names or 'TimedOut' in names:
+        return 'timeout'
+    if isinstance(error, requests.ConnectionError): return 'unavailable'
+    return str(getattr(error, 'http_status', None) or 'error')  # spotipy's SpotifyException
+
+def upstream_failed(status):
+    """True for outcomes that count against a host's circuit breaker."""
+    return status in ('timeout', 'unavailable', '429') or status.startswith('5')
+
+def call_with_timeout(fn, timeout, *args, **kwargs):
+    """Run ``fn`` on upstream_call_executor and stop waiting for it after ``timeout`` seconds."""
+    future = upstream_call_executor.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()  # still queued: never runs; already running: finishes unobserved
+        raise
+
+def upstream_call(host, label, fn, *args, **kwargs):
+    """Wait for ``host``'s rate limit, then call ``fn`` and record its latency and outcome.
+
+    Fails fast with UpstreamUnavailable when the host's circuit is open or the
+    current Deadline leaves no time. The call's timeout (the ``timeout``
+    argument, or how long we wait on clients that have none) is
+    UPSTREAM_TIMEOUT_SECONDS clamped to the deadline. A timeout caused by the
+    clamping is the caller's budget running out, not the host failing, and is
+    not held against the breaker.
+
+    Timeouts, connection errors and 5xx / 429 answers are raised as
+    UpstreamError, so that callers never cache them as "not found".
+    """
+    deadline = Deadline.current() or Deadline()
+    breaker = upstream_breakers.get(host)
+    deadline.check(label)
+    if breaker: breaker.allow()
+    status = None
+    try:
+        wait_for_upstream(host, label, deadline)
+        requested = kwargs.get('timeout', UPSTREAM_TIMEOUT_SECONDS)
+        timeout = deadline.timeout(requested)
+        clamped = timeout < requested
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            if 'timeout' in kwargs:
+                result = fn(*args, **dict(kwargs, timeout=timeout))
+            else:
+                result = call_with_timeout(fn, timeout, *args, **kwargs)
+            status = str(getattr(result, 'status_code', 'ok'))
+        except Exception as e:
+            status = upstream_status(e)
+            if status == 'timeout' and clamped:
+                status = 'deadline'
+                raise DeadlineExceeded(f"{label}: {deadline.budget:g}s budget spent waiting on {host}") from e
+            if upstream_failed(status):
+                raise UpstreamError(f"{label}: {host} failed ({status}): {e}", status) from e
+            raise
+        finally:
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, host=host)
+            UPSTREAM_REQUESTS.inc(host=host, status=status)
+        if upstream_failed(status):
+            raise UpstreamError(f"{label}: {host} answered {status}", status)
+        return result
+    finally:
+        if breaker:
+            if status is None or status in ('deadline', 'error'): breaker.release()
+            elif upstream_failed(status): breaker.record_failure()
+            else: breaker.record_success()
+
+# Optional per-request timing breakdown in a Server-Timing response header (visible in browser devtools)
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+@contextmanager
+def server_timing(name):
+    """Add the duration of the block to this request's Server-Timing header (if enabled)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(g, 'server_timing', None) if has_request_context() else None
+        if timings is not None:
+            timings.append((name, time.perf_counter() - started))
+
+@app.before_request
+def start_server_timing():
+    if SERVER_TIMING:
+        g.server_timing = []
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def add_server_timing_header(response):
+    timings = getattr(g, 'server_timing', None)
+    if timings is not None:
+        timings.append(('total', time.perf_counter() - g.request_started))
+        response.headers['Server-Timing'] = ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings)
+    return response
+
+def observe_route(route):
+    """Record the decorated view's latency under ``route``."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with REQUEST_SECONDS.time(route=route):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def observe_stage(stage):
+    """Record the decorated function's latency under ``stage``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+        return wrapper
+    return decorator
 
 # --- Wikipedia ---
 WIKI_CONTACT_EMAIL = os.getenv("CONTACT_EMAIL", "default@example.com")
 wiki_wiki = wikipediaapi.Wikipedia(
     f'MusicGeoMapApp/0.1 ({WIKI_CONTACT_EMAIL})', 'en'
 )
+WIKI_API_URL = f"{WIKIPEDIA_URL}/w/api.php"
+# 'wikitext': infobox wikitext of the lead section via the MediaWiki API, rendered HTML only as fallback
+# 'html':     always parse the rendered article (the original path; useful for comparing the two)
+WIKI_EXTRACTION = os.getenv('WIKI_EXTRACTION', 'wikitext').lower()
+# One keep-alive session for all Wikipedia requests, pooled across worker threads
+wiki_session = requests.Session()
+wiki_session.headers['User-Agent'] = f'MusicGeoMapApp/0.1 ({WIKI_CONTACT_EMAIL})'
+wiki_session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=int(os.getenv('WIKI_POOL_SIZE', '16'))))
+wiki_extraction_stats = ExtractionStats()
+WIKIDATA_SPARQL_URL = f"{WIKIDATA_URL}/sparql"
+# Resolve the Wikipedia origins of a whole page of uncached artists with a few batched requests
+WIKI_BATCH_PREFETCH = os.getenv('WIKI_BATCH_PREFETCH', 'true').lower() in ('1', 'true', 'yes')
+# How long an artist's Wikipedia stage waits for the batch covering it before fetching on its own
+WIKI_BATCH_TIMEOUT = float(os.getenv('WIKI_BATCH_TIMEOUT', '8'))
 
 # --- Improved Persistent Caching ---
 CACHE_DIR = os.path.join(os.path.dirname(__file__), "cache")
@@ -56,52 +340,136 @@ ARTIST_CACHE_FILE = os.path.join(CACHE_DIR, "artist_location_cache.json")
 GEOCODE_CACHE_FILE = os.path.join(CACHE_DIR, "geocode_cache.json")
 MB_CACHE_FILE = os.path.join(CACHE_DIR, "musicbrainz_cache.json")
 WIKI_CACHE_FILE = os.path.join(CACHE_DIR, "wikipedia_cache.json")
+NEGATIVE_CACHE_FILE = os.path.join(CACHE_DIR, "artist_negative_cache.json")
+SPOTIFY_MB_CACHE_FILE = os.path.join(CACHE_DIR, "musicbrainz_spotify_cache.json")
+ARTIST_ALIAS_FILE = os.path.join(CACHE_DIR, "artist_alias_cache.json")
 CACHE_EXPIRY_DAYS = 30
+WIKI_CACHE_EXPIRY_DAYS = 7
+# Artists that could not be located are retried after this many hours instead of on every request
+NEGATIVE_CACHE_TTL_HOURS = float(os.getenv('NEGATIVE_CACHE_TTL_HOURS', '24'))
+# 'sqlite' (default): per-key upserts into one WAL database shared by all workers
+# 'json': legacy whole-file JSON caches, rewritten on every save
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'sqlite').lower()
+CACHE_DB_FILE = os.getenv('CACHE_DB_FILE', os.path.join(CACHE_DIR, "cache.sqlite3"))
+# Namespace in the SQLite database -> legacy JSON file
+LEGACY_CACHE_FILES = {
+    'artist_location': ARTIST_CACHE_FILE,
+    'geocode': GEOCODE_CACHE_FILE,
+    'musicbrainz': MB_CACHE_FILE,
+    'wikipedia': WIKI_CACHE_FILE,
+    'artist_negative': NEGATIVE_CACHE_FILE,
+    'musicbrainz_spotify': SPOTIFY_MB_CACHE_FILE,
+    'artist_alias': ARTIST_ALIAS_FILE,
+}
 
-def load_cache(cache_file):
-    try:
-        if os.path.exists(cache_file):
-            with open(cache_file, 'r') as f: return json.load(f)
-    except Exception as e: print(f"Error loading cache from {cache_file}: {e}")
-    return {}
+# In-memory LRU tier in front of SQLite namespaces (per worker process)
+CACHE_FRONT_MAX_ENTRIES = int(os.getenv('CACHE_FRONT_MAX_ENTRIES', '5000'))
+CACHE_FRONT_MAX_BYTES = int(os.getenv('CACHE_FRONT_MAX_BYTES', str(8 * 1024 * 1024)))
+# How long an entry is worth keeping in memory; artist locations are served stale, so they only age out by LRU.
+# artist_negative has no front tier: `flask purge-negative-cache` deletes rows from another process, and
+# workers must see that on their next lookup rather than keep serving the purged entries from memory.
+CACHE_FRONT_TTL_SECONDS = {
+    'artist_location': None,
+    'geocode': CACHE_EXPIRY_DAYS * 86400,
+    'musicbrainz': CACHE_EXPIRY_DAYS * 86400,
+    'musicbrainz_spotify': CACHE_EXPIRY_DAYS * 86400,
+    'wikipedia': WIKI_CACHE_EXPIRY_DAYS * 86400,
+    'artist_alias': None,
+}
 
-def save_cache(cache_data, cache_file):
-    try:
-        with open(cache_file, 'w') as f: json.dump(cache_data, f)
-    except Exception as e: print(f"Error saving cache to {cache_file}: {e}")
+if CACHE_BACKEND == 'sqlite':
+    cache_db = SQLiteCacheDatabase(CACHE_DB_FILE)
+    if cache_db.created:
+        # Fresh database: seed it once from whatever JSON caches are on disk
+        logger.info("Migrating JSON caches into %s: %s", CACHE_DB_FILE, migrate_json_caches(cache_db, LEGACY_CACHE_FILES))
+    def open_cache(namespace):
+        if CACHE_FRONT_MAX_ENTRIES <= 0 or namespace not in CACHE_FRONT_TTL_SECONDS: return cache_db.store(namespace)
+        return LRUFrontCache(cache_db.store(namespace), max_entries=CACHE_FRONT_MAX_ENTRIES,
+                             max_bytes=CACHE_FRONT_MAX_BYTES, ttl_seconds=CACHE_FRONT_TTL_SECONDS[namespace])
+else:
+    cache_db = None
+    def open_cache(namespace): return JsonFileStore(LEGACY_CACHE_FILES[namespace])
 
-artist_location_cache = load_cache(ARTIST_CACHE_FILE)
-geocode_cache = load_cache(GEOCODE_CACHE_FILE)
-musicbrainz_cache = load_cache(MB_CACHE_FILE)
-wikipedia_cache = load_cache(WIKI_CACHE_FILE)
+artist_location_cache = open_cache('artist_location')
+geocode_cache = open_cache('geocode')
+musicbrainz_cache = open_cache('musicbrainz')
+musicbrainz_spotify_cache = open_cache('musicbrainz_spotify')  # Spotify artist ID -> MB record (with MBID)
+wikipedia_cache = open_cache('wikipedia')
+# Negative tier: artists whose lookup produced no coordinates, with the stages that failed
+artist_negative_cache = open_cache('artist_negative')
+# The two artist caches above are keyed by Spotify ID; normalized name / MBID -> that key (see artist_keys)
+artist_alias_cache = open_cache('artist_alias')
+artist_keys = ArtistKeys(artist_alias_cache)
 
 def save_caches_to_disk():
-    save_cache(artist_location_cache, ARTIST_CACHE_FILE)
-    save_cache(geocode_cache, GEOCODE_CACHE_FILE)
-    save_cache(musicbrainz_cache, MB_CACHE_FILE)
-    save_cache(wikipedia_cache, WIKI_CACHE_FILE)
+    # Only the JSON backend buffers writes; SQLite stores commit per key
+    for cache in all_caches().values():
+        cache.flush()
+
+def all_caches():
+    return {
+        'artist_location': artist_location_cache, 'geocode': geocode_cache, 'musicbrainz': musicbrainz_cache,
+        'musicbrainz_spotify': musicbrainz_spotify_cache, 'wikipedia': wikipedia_cache,
+        'artist_negative': artist_negative_cache, 'artist_alias': artist_alias_cache,
+    }
+
+def timed_cache(cache_dict, expiry_days=CACHE_EXPIRY_DAYS, codec=None, key_fn=None):
+    """Cache ``func(key)`` results in ``cache_dict`` for ``expiry_days``.
+
+    ``codec`` (optional) converts between the value ``func`` returns and what
+    is stored: ``encode(value)``, ``decode(data)`` and ``is_current(data)``.
+    Entries in an older layout are decoded and written back in the current
+    one, keeping their original timestamp.
+
+    ``key_fn`` (optional) maps a string key to the stored key, e.g. to make
+    lookups case-insensitive. An entry still stored under the plain key is
+    moved to the mapped one when it is first read.
+    """
+    expiry_seconds = expiry_days * 86400
 
-def timed_cache(cache_dict, expiry_days=CACHE_EXPIRY_DAYS):
     def decorator(func):
+        # Concurrent misses for the same key share one upstream call
+        flight = SingleFlight()
+
+        def load(cache_key, cached_item):
+            data = cached_item['data']
+            if codec is None:
+                return data
+            value = codec.decode(data)
+            if not codec.is_current(data):
+                cache_dict[cache_key] = {'data': codec.encode(value), 'timestamp': cached_item['timestamp']}
+            return value
+
+        def fetch_and_store(cache_key, key, args, kwargs):
+            # Re-check: a call that just finished may have filled the cache
+            cached_item = cache_dict.get_fresh(cache_key, expiry_seconds)
+            if cached_item is not None:
+                return load(cache_key, cached_item)
+            now = datetime.now().isoformat()
+            result = func(key, *args, **kwargs)
+            cache_dict[cache_key] = {'data': codec.encode(result) if codec else result, 'timestamp': now}
+            return result
+
         @functools.wraps(func)
         def wrapper(key, *args, **kwargs):
-            now = datetime.now().isoformat()
             if not isinstance(key, str):
                 try: key_str = json.dumps(key, sort_keys=True)
                 except TypeError: key_str = str(key)
                 cache_key = hashlib.md5(key_str.encode()).hexdigest()
-            else: cache_key = key
-            cached_item = cache_dict.get(cache_key)
-            if cached_item and 'timestamp' in cached_item:
-                try:
-                    cached_time = datetime.fromisoformat(cached_item['timestamp'])
-                    if cached_time + timedelta(days=expiry_days) > datetime.now():
-                        # print(f"Cache hit for key: {cache_key[:20]}...") # DEBUG
-                        return cached_item['data']
-                except ValueError: pass # Ignore invalid timestamp
-            result = func(key, *args, **kwargs)
-            cache_dict[cache_key] = {'data': result, 'timestamp': now}
-            return result
+            else: cache_key = key_fn(key) if key_fn else key
+            cached_item = cache_dict.get_fresh(cache_key, expiry_seconds)
+            legacy_key = key if key_fn and isinstance(key, str) and cache_key != key else None
+            if cached_item is None and legacy_key and cache_key not in cache_dict:
+                legacy_item = cache_dict.pop(legacy_key)
+                if legacy_item is not None:
+                    cache_dict[cache_key] = legacy_item
+                    cached_item = cache_dict.get_fresh(cache_key, expiry_seconds)
+            if cached_item is not None:
+                CACHE_LOOKUPS.inc(cache=func.__name__, result='hit')
+                return load(cache_key, cached_item)
+            CACHE_LOOKUPS.inc(cache=func.__name__, result='miss')
+            return flight.do(cache_key, fetch_and_store, cache_key, key, args, kwargs)
+        wrapper.flight = flight
         return wrapper
     return decorator
 
@@ -118,18 +486,24 @@ def create_spotify_oauth():
         raise ValueError("Spotify API credentials missing.")
     return SpotifyOAuth(client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET, redirect_uri=redirect_uri, scope=SCOPE)
 
+SESSION_TOKEN_FIELDS = ('access_token', 'refresh_token', 'expires_at')
+
+def session_token_fields(token_info):
+    """Only what get_token needs, so sessions stay small (and fit a cookie with SESSION_BACKEND=cookie)."""
+    return {key: token_info.get(key) for key in SESSION_TOKEN_FIELDS}
+
 def get_token():
     token_info = session.get('token_info', None)
     if not token_info: return None
     now = int(time.time())
     is_expired = token_info.get('expires_at', 0) - now < 60
     if is_expired:
-        print("Token expired, attempting refresh.")
+        logger.info("Token expired, attempting refresh.")
         sp_oauth = create_spotify_oauth()
         try:
-            token_info = sp_oauth.refresh_access_token(token_info.get('refresh_token'))
-            session['token_info'] = token_info; print("Token refreshed.")
-        except Exception as e: print(f"Error refreshing token: {e}"); session.clear(); return None
+            token_info = session_token_fields(sp_oauth.refresh_access_token(token_info.get('refresh_token')))
+            session['token_info'] = token_info; logger.info("Token refreshed.")
+        except Exception as e: logger.warning("Error refreshing token: %s", e); session.clear(); return None
     return token_info
 
 # --- Wikipedia Summary Parsing (Fallback - Kept for now but not used in primary logic) ---
@@ -147,39 +521,26 @@ def extract_location_from_wiki(summary):
         if match:
             location = match.group(1).strip().strip(',. ')
             if len(location) > 4 and not location.isdigit() and not re.search(r'\b(?:Records|Labels|LLC|Inc|Ltd)\b', location, re.IGNORECASE):
-                print(f"    [Summary Parse] Found potential location: '{location}' with pattern: {pattern}")
+                logger.debug("[Summary Parse] Found potential location: '%s' with pattern: %s", location, pattern)
                 return location
-    print(f"    [Summary Parse] No location found in summary.")
+    logger.debug("[Summary Parse] No location found in summary.")
     return None
 
 # --- Improved Location Extraction from MusicBrainz Data ---
 def extract_location_from_mb(mb_artist):
-    """Extract the most specific location information from MusicBrainz artist data."""
+    """Extract the most specific location information from an MBArtistRecord (or raw MusicBrainz artist dict)."""
     if not mb_artist:
         return {"specific": None, "country": None}
     
+    if isinstance(mb_artist, dict):
+        mb_artist = MBArtistRecord.from_payload(mb_artist)
+
     locations = {
-        "area": None,           # Current/primary area
-        "begin_area": None,     # Birth/formation area
-        "country": None,        # Country
+        "area": mb_artist.area,             # Current/primary area
+        "begin_area": mb_artist.begin_area, # Birth/formation area
+        "country": mb_artist.country,       # Country
     }
     
-    # Extract area (current/primary location)
-    if mb_artist.get('area'):
-        area = mb_artist['area'].get('name')
-        if area:
-            locations["area"] = area
-    
-    # Extract begin-area (birth/formation location)
-    if mb_artist.get('begin-area'):
-        begin_area = mb_artist['begin-area'].get('name')
-        if begin_area:
-            locations["begin_area"] = begin_area
-    
-    # Extract country
-    if mb_artist.get('country'):
-        locations["country"] = mb_artist['country']
-    
     # For specific location, prioritize area with more detail
     specific_location = None
     
@@ -206,22 +567,35 @@ def extract_location_from_mb(mb_artist):
     }
 
 # --- MusicBrainz Lookup ---
-@timed_cache(musicbrainz_cache)
+def musicbrainz_get(request_spec):
+    """GET a ws/2 ``(path, params)`` request through upstream_call and parse it; None if MusicBrainz has no such entity.
+
+    Other 4xx answers raise musicbrainzngs.ResponseError; 5xx, 429 and timeouts raise UpstreamError.
+    """
+    path, params = request_spec
+    response = upstream_call(MUSICBRAINZ_HOST, "MB", mb_session.get, MB_WS_URL + path, params=params,
+                             timeout=UPSTREAM_TIMEOUT_SECONDS)
+    if response.status_code == 404:
+        return None
+    if not response.ok:
+        raise musicbrainzngs.ResponseError(f"MusicBrainz answered {response.status_code} for {path}")
+    return parse_response(response.content)
+
+@observe_stage('musicbrainz')
+@timed_cache(musicbrainz_cache, codec=MBArtistRecord, key_fn=name_key)  # MusicBrainz search ignores case
 def get_musicbrainz_data(artist_name):
-    """Enhanced MusicBrainz lookup that properly extracts all location data."""
+    """Look up an artist on MusicBrainz; returns a compact MBArtistRecord or None."""
     if not artist_name: 
         return None
     
-    print(f"  [MB] Querying MusicBrainz for: '{artist_name}'")
+    logger.debug("[MB] Querying MusicBrainz for: '%s'", artist_name)
 
     try:
-        time.sleep(0.5)  # Rate limiting
-        
         # Initial search to find the MusicBrainz ID
-        result = musicbrainzngs.search_artists(artist=artist_name, limit=3)
+        result = musicbrainz_get(artist_search_request(artist_name, limit=3))
         
         if not result or not result.get('artist-list'):
-            print(f"  [MB] No results found.")
+            logger.debug("[MB] No results found.")
             return None
             
         artist_list = result['artist-list']
@@ -232,64 +606,136 @@ def get_musicbrainz_data(artist_name):
         if exact_matches:
             best_match = sorted(exact_matches, key=lambda x: int(x.get('ext:score', 0)), reverse=True)[0]
             artist_id = best_match.get('id')
-            print(f"  [MB] Found exact match: {best_match.get('name')} (Score: {best_match.get('ext:score')})")
+            logger.debug("[MB] Found exact match: %s (Score: %s)", best_match.get('name'), best_match.get('ext:score'))
         else:
             # If no exact match, use the highest scored match
             sorted_results = sorted(artist_list, key=lambda x: int(x.get('ext:score', 0)), reverse=True)
             if not sorted_results:
-                print(f"  [MB] Results found but couldn't determine best match.")
+                logger.debug("[MB] Results found but couldn't determine best match.")
                 return None
                 
             best_match = sorted_results[0]
             artist_id = best_match.get('id')
-            print(f"  [MB] Found best match (highest score): {best_match.get('name')} (Score: {best_match.get('ext:score')})")
+            logger.debug("[MB] Found best match (highest score): %s (Score: %s)", best_match.get('name'), best_match.get('ext:score'))
         
         # Important: Get the full artist data using the lookup method
         # The search results don't contain all the data we need
         if artist_id:
-            print(f"  [MB] Looking up full artist data with ID: {artist_id}")
-            time.sleep(0.5)  # Rate limiting
+            logger.debug("[MB] Looking up full artist data with ID: %s", artist_id)
             try:
-                full_artist_data = musicbrainzngs.get_artist_by_id(artist_id, includes=["url-rels", "aliases"])
+                full_artist_data = musicbrainz_get(artist_lookup_request(artist_id))
                 if full_artist_data and 'artist' in full_artist_data:
-                    return full_artist_data['artist']  # Return the complete artist data
+                    return MBArtistRecord.from_payload(full_artist_data['artist'])
                 else:
-                    print(f"  [MB] Couldn't get full artist data.")
-                    return best_match  # Fallback to search result
+                    logger.debug("[MB] Couldn't get full artist data.")
+                    return MBArtistRecord.from_payload(best_match)  # Fallback to search result
+            except UpstreamUnavailable:
+                raise
             except Exception as e:
-                print(f"  [MB] Error fetching full artist data: {e}")
-                return best_match  # Fallback to search result
+                logger.warning("[MB] Error fetching full artist data: %s", e)
+                return MBArtistRecord.from_payload(best_match)  # Fallback to search result
         else:
-            print(f"  [MB] No artist ID found in best match.")
-            return best_match  # Use the search result
+            logger.debug("[MB] No artist ID found in best match.")
+            return MBArtistRecord.from_payload(best_match)  # Use the search result
             
+    except UpstreamUnavailable:
+        raise  # not a miss: nothing is cached and the caller falls through
     except Exception as e:
-        print(f"  [MB] MusicBrainz error for '{artist_name}': {e}")
+        logger.warning("[MB] MusicBrainz error for '%s': %s", artist_name, e)
         return None
 
-# --- Wikipedia Infobox Parsing ---
-@timed_cache(wikipedia_cache, expiry_days=7)
-def get_wikipedia_origin(artist_name):
-    """Extract artist origin directly from Wikipedia infobox."""
-    if not artist_name: return None
-    print(f"  [Wiki Infobox] Fetching/Parsing for: '{artist_name}'")
+# --- MusicBrainz Lookup by Spotify URL ---
+# 'spotify_url': find the artist through MusicBrainz's URL relations (exact), name search only on a miss
+# 'search':      always search by name
+MB_LOOKUP = os.getenv('MB_LOOKUP', 'spotify_url').lower()
+
+@observe_stage('musicbrainz_spotify')
+@timed_cache(musicbrainz_spotify_cache, codec=MBArtistRecord)
+def get_musicbrainz_by_spotify_id(spotify_id):
+    """MusicBrainz artist linked to a Spotify artist page, or None if MusicBrainz has no such link."""
+    spotify_url = f"https://open.spotify.com/artist/{spotify_id}"
+    logger.debug("[MB] Looking up URL relation for: %s", spotify_url)
     try:
-        artist_name_formatted = artist_name.replace(' ', '_')
-        url = f"https://en.wikipedia.org/wiki/{artist_name_formatted}"
-        headers = {'User-Agent': f'MusicGeoMapApp/0.1 ({WIKI_CONTACT_EMAIL})'}
-        response = requests.get(url, headers=headers, timeout=10)
-        if not response.ok:
-            print(f"  [Wiki Infobox] Page not found or error: {response.status_code}")
-            return None
+        result = musicbrainz_get(url_lookup_request(spotify_url))
+    except musicbrainzngs.ResponseError as e:
+        logger.warning("[MB] URL lookup rejected for %s: %s", spotify_url, e)
+        return None
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("[MB] URL lookup error for %s: %s", spotify_url, e)
+        return None
 
-        soup = BeautifulSoup(response.text, 'html.parser')
-        infobox = soup.find('table', class_=re.compile(r'\binfobox\b', re.IGNORECASE))
-        if not infobox:
-            print(f"  [Wiki Infobox] No infobox table found.")
-            return None
+    if result is None:
+        logger.debug("[MB] No MusicBrainz URL entry for %s", spotify_url)
+        return None
+    artist_ids = {rel['artist']['id'] for rel in result.get('url', {}).get('artist-relation-list', []) if rel.get('artist')}
+    if len(artist_ids) != 1:
+        logger.debug("[MB] URL is linked to %s artists; not using it.", len(artist_ids))
+        return None
+    artist_id = artist_ids.pop()
+    logger.debug("[MB] Spotify URL linked to MBID %s", artist_id)
+    try:
+        full_artist_data = musicbrainz_get(artist_lookup_request(artist_id))
+        return MBArtistRecord.from_payload(full_artist_data['artist']) if full_artist_data else None
+    except UpstreamUnavailable:
+        raise
+    except Exception as e:
+        logger.warning("[MB] Error fetching artist %s: %s", artist_id, e)
+        return None
+
+# --- Wikipedia Infobox Parsing ---
+def fetch_infobox_wikitext(artist_name):
+    """Lead-section wikitext for ``artist_name`` (redirects followed), or None if the API lookup failed."""
+    response = upstream_call(WIKIPEDIA_HOST, "Wiki Infobox", wiki_session.get, WIKI_API_URL,
+                             timeout=UPSTREAM_TIMEOUT_SECONDS, params={
+        'action': 'parse', 'page': artist_name, 'prop': 'wikitext', 'section': 0,
+        'redirects': 1, 'format': 'json', 'formatversion': 2,
+    })
+    if not response.ok:
+        logger.warning("[Wiki Infobox] API error: %s", response.status_code)
+        return None, len(response.content)
+    payload = response.json()
+    if 'error' in payload:
+        code = payload['error'].get('code')
+        logger.warning("[Wiki Infobox] API: %s", code)
+        # No such article: the HTML page would 404 too
+        return ('' if code == 'missingtitle' else None), len(response.content)
+    return payload.get('parse', {}).get('wikitext', ''), len(response.content)
+
+def wikipedia_origin_from_wikitext(artist_name):
+    """Returns (origin or None, done); ``done`` is False when the HTML path should be tried."""
+    wikitext, response_bytes = fetch_infobox_wikitext(artist_name)
+    if wikitext is None:
+        wiki_extraction_stats.record('wikitext', response_bytes, 0.0, False)
+        return None, False
+    started = time.perf_counter()
+    found = origin_from_wikitext(wikitext)
+    wiki_extraction_stats.record('wikitext', response_bytes, time.perf_counter() - started, found)
+    if found:
+        field, origin = found
+        logger.debug("[Wiki Infobox] Found key '%s', extracted origin: '%s'", field, origin)
+        return origin, True
+    # An infobox without a usable field may still render one (e.g. values pulled from Wikidata)
+    return None, not has_infobox(wikitext)
+
+def wikipedia_origin_from_html(artist_name):
+    artist_name_formatted = artist_name.replace(' ', '_')
+    url = f"{WIKIPEDIA_URL}/wiki/{artist_name_formatted}"
+    response = upstream_call(WIKIPEDIA_HOST, "Wiki Infobox", wiki_session.get, url, timeout=UPSTREAM_TIMEOUT_SECONDS)
+    if not response.ok:
+        logger.debug("[Wiki Infobox] Page not found or error: %s", response.status_code)
+        wiki_extraction_stats.record('html', len(response.content), 0.0, False)
+        return None
 
+    started = time.perf_counter()
+    origin = None
+    soup = BeautifulSoup(response.text, 'html.parser')
+    infobox = soup.find('table', class_=re.compile(r'\binfobox\b', re.IGNORECASE))
+    if not infobox:
+        logger.debug("[Wiki Infobox] No infobox table found.")
+    else:
         location_keys = ['origin', 'born', 'birth place', 'hometown', 'founded', 'location']
-        origin = None
         for row in infobox.find_all('tr'):
             header = row.find('th')
             if header:
@@ -301,111 +747,254 @@ def get_wikipedia_origin(artist_name):
                         cleaned_text = re.sub(r'\s*\[\d+\]', '', raw_text).strip()
                         origin_candidate = cleaned_text.split('\n')[0].split('(')[0].strip().strip(',. ')
                         if origin_candidate and len(origin_candidate) > 2:
-                            print(f"  [Wiki Infobox] Found key '{header_text}', extracted origin: '{origin_candidate}'")
+                            logger.debug("[Wiki Infobox] Found key '%s', extracted origin: '%s'", header_text, origin_candidate)
                             origin = origin_candidate
                             break # Found one, stop looking
+        if not origin: logger.debug("[Wiki Infobox] Relevant keys not found or no value extracted.")
+    wiki_extraction_stats.record('html', len(response.content), time.perf_counter() - started, origin)
+    return origin
 
-        if not origin: print(f"  [Wiki Infobox] Relevant keys not found or no value extracted.")
-        return origin
+@observe_stage('wikipedia')
+@timed_cache(wikipedia_cache, expiry_days=WIKI_CACHE_EXPIRY_DAYS)
+def get_wikipedia_origin(artist_name):
+    """Extract artist origin directly from Wikipedia infobox."""
+    if not artist_name: return None
+    logger.debug("[Wiki Infobox] Fetching/Parsing for: '%s'", artist_name)
+    try:
+        if WIKI_EXTRACTION == 'wikitext':
+            origin, done = wikipedia_origin_from_wikitext(artist_name)
+            if done:
+                if not origin: logger.debug("[Wiki Infobox] No infobox in lead section.")
+                return origin
+            logger.debug("[Wiki Infobox] Falling back to rendered HTML.")
+        return wikipedia_origin_from_html(artist_name)
+    except UpstreamUnavailable:
+        raise
     except Exception as e:
-        print(f"  [Wiki Infobox] Error for '{artist_name}': {e}")
+        logger.warning("[Wiki Infobox] Error for '%s': %s", artist_name, e)
         return None
 
-# --- Geocoding ---
-@timed_cache(geocode_cache)
-def geocode_location(place_name):
-    if not place_name: return None
-    place_name_cleaned = re.sub(r'\s*\(.*?\)\s*', '', place_name).strip().strip(',. ')
-    if not place_name_cleaned: return None
-    print(f"    [Geocode] Attempting to geocode: '{place_name_cleaned}' (Original: '{place_name}')")
-    try:
-        time.sleep(0.75) # Be nice to Nominatim
-        location = geolocator.geocode(place_name_cleaned, timeout=10)
-        if location:
-            coords = {"lat": location.latitude, "lon": location.longitude}
-            print(f"    [Geocode] SUCCESS: {coords}")
-            return coords
-        else:
-            print(f"    [Geocode] FAILED: No results from Nominatim.")
+# --- Batched Wikipedia/Wikidata Origins ---
+wiki_prefetches = {}  # artist name -> future of the batch prefetch covering it
+# Own threads, so a batch is never queued behind the stage tasks that wait for it
+wiki_batch_executor = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix='wiki-batch')
+wiki_prefetch_lock = threading.Lock()
+
+@observe_stage('wiki_prefetch')
+def prefetch_wikipedia_origins(artist_names):
+    """Fill wikipedia_cache (and geocode_cache, where Wikidata has coordinates) for many artists.
+
+    Per 50 artists: one MediaWiki query maps names to Wikidata items, one
+    SPARQL query fetches formation location / birthplace with coordinates.
+    Artists Wikidata knows nothing about, and names without an article
+    (which may just be spelled differently there), are left for the
+    per-artist infobox path; the batch caches no misses.
+    """
+    filled = 0
+    for batch in chunked(artist_names, WIKIPEDIA_BATCH_SIZE):
+        try:
+            BATCH_SIZE.observe(len(batch), kind='wiki_prefetch')
+            response = upstream_call(WIKIPEDIA_HOST, "Wiki Batch", wiki_session.get, WIKI_API_URL,
+                                     params=title_query_params(batch), timeout=UPSTREAM_TIMEOUT_SECONDS)
+            if not response.ok:
+                logger.warning("[Wiki Batch] Title query error: %s", response.status_code); continue
+            items = items_for_titles(batch, response.json())
+            qids = sorted({qid for qid in items.values() if qid})
+            origins = {}
+            if qids:
+                response = upstream_call(WIKIDATA_HOST, "Wikidata", wiki_session.get, WIKIDATA_SPARQL_URL,
+                                         timeout=WIKI_BATCH_TIMEOUT, params={'query': origin_sparql(qids), 'format': 'json'})
+                if response.ok: origins = origins_from_bindings(response.json())
+                else: logger.warning("[Wiki Batch] Wikidata query error: %s", response.status_code)
+        except Exception as e:
+            logger.warning("[Wiki Batch] Error for batch of %s: %s", len(batch), e); continue
+
+        now = datetime.now().isoformat()
+        for artist_name, qid in items.items():
+            origin = origins.get(qid) if qid else None
+            if not origin:
+                continue
+            wikipedia_cache[artist_name] = {'data': origin['origin'], 'timestamp': now}; filled += 1
+            geocode_key = clean_location_string(origin['origin'])
+            if origin['lat'] is not None and geocode_key and \
+                    geocode_cache.get_fresh(geocode_key, CACHE_EXPIRY_DAYS * 86400) is None:
+                geocode_cache[geocode_key] = {'data': {'lat': origin['lat'], 'lon': origin['lon']}, 'timestamp': now}
+    logger.info("[Wiki Batch] Prefetched Wikipedia origins for %s of %s artists", filled, len(artist_names))
+    return filled
+
+def start_wikipedia_prefetch(artist_names):
+    """Prefetch origins for the artists without a fresh Wikipedia entry, in the background."""
+    if not WIKI_BATCH_PREFETCH:
+        return None
+    with wiki_prefetch_lock:
+        names = [name for name in dict.fromkeys(artist_names) if name not in wiki_prefetches
+                 and wikipedia_cache.get_fresh(name, WIKI_CACHE_EXPIRY_DAYS * 86400) is None]
+        if not names:
             return None
-    except GeocoderTimedOut: print(f"    [Geocode] TIMEOUT for '{place_name_cleaned}'"); return None
-    except GeocoderServiceError as e: print(f"    [Geocode] SERVICE ERROR for '{place_name_cleaned}': {e}"); return None
-    except Exception as e: print(f"    [Geocode] UNEXPECTED ERROR for '{place_name_cleaned}': {e}"); return None
+        future = wiki_batch_executor.submit(prefetch_wikipedia_origins, names)
+        for name in names: wiki_prefetches[name] = future
+    def forget(_):
+        with wiki_prefetch_lock:
+            for name in names:
+                if wiki_prefetches.get(name) is future: del wiki_prefetches[name]
+    future.add_done_callback(forget)
+    return future
+
+def wait_for_wikipedia_prefetch(artist_name):
+    """Block (up to WIKI_BATCH_TIMEOUT, within the current deadline) until a batch covering ``artist_name`` has finished."""
+    future = wiki_prefetches.get(artist_name)
+    if future is None:
+        return
+    try: future.result(timeout=(Deadline.current() or Deadline()).timeout(WIKI_BATCH_TIMEOUT))
+    except Exception: pass  # errors are logged by the batch; the per-artist path takes over
 
 # --- Artist Location Processing ---
-# --- Updated Process Artist Location Function ---
-def process_artist_location(artist_name, spotify_data=None):
-    """Enhanced artist location processing with improved MusicBrainz handling."""
-    print(f"--- Processing START: {artist_name} ---")
+# 'speculative': start every source at once and abandon lower-priority ones as soon as a
+#                higher-priority candidate geocodes (cold latency ~ slowest needed stage)
+# 'lazy':        fetch a source only once every higher-priority source has failed (fewest upstream calls)
+RESOLUTION_MODE = os.getenv('RESOLUTION_MODE', 'speculative').lower()
+# Threads for speculative source fetches and candidate geocoding, shared by all requests
+stage_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('STAGE_WORKERS', '16')), thread_name_prefix='stage'
+)
+
+def fetch_wiki_candidates(artist_name, spotify_data=None):
+    """Location source: Wikipedia infobox origin."""
+    wait_for_wikipedia_prefetch(artist_name)
+    wiki_origin = get_wikipedia_origin(artist_name)
+    if wiki_origin:
+        logger.debug("Result from Wiki Infobox: '%s'", wiki_origin)
+        return wiki_origin, [(wiki_origin, "Wikipedia Infobox")]
+    logger.debug("Wiki Infobox returned no results")
+    return None, []
+
+def fetch_mb_candidates(artist_name, spotify_data=None):
+    """Location source: MusicBrainz begin-area/area (specific) and country."""
+    mb_artist = None
+    spotify_id = spotify_artist_id(spotify_data) if MB_LOOKUP == 'spotify_url' else None
+    if spotify_id:
+        mb_artist = get_musicbrainz_by_spotify_id(spotify_id)
+    if not mb_artist:
+        mb_artist = get_musicbrainz_data(artist_name)
+    if not mb_artist:
+        logger.debug("MusicBrainz returned no results")
+        return None, []
+    # Use the enhanced extraction function
+    mb_locations = extract_location_from_mb(mb_artist)
+    candidates = []
+    if mb_locations["specific"]:
+        candidates.append((mb_locations["specific"], "MusicBrainz Specific"))
+        logger.debug("Result from MusicBrainz (Specific): '%s'", mb_locations['specific'])
+    if mb_locations["country"]:
+        candidates.append((mb_locations["country"], "MusicBrainz Country"))
+        logger.debug("Result from MusicBrainz (Country): '%s'", mb_locations['country'])
+    return mb_artist, candidates
+
+# Location sources in priority order: Wiki Infobox > MB Specific > MB Country
+# Each is called as fetch(artist_name, spotify_data) and returns (raw result, [(location, source label)])
+LOCATION_SOURCES = [
+    ("wiki_infobox", fetch_wiki_candidates),
+    ("musicbrainz", fetch_mb_candidates),
+]
+
+def geocode_candidates(candidates, speculative, deadline, unavailable):
+    """Geocode (location, source) pairs; return (clean_location, source, coords) for the
+    first one that succeeds in priority order, or None.
+
+    Candidates that could not be geocoded within ``deadline`` (or with Nominatim's
+    circuit open) are skipped and their locations appended to ``unavailable``.
+    """
+    cleaned = []
+    for location_string, source in candidates:
+        # Clean the location string before geocoding
+        clean_location = clean_location_string(location_string)
+        if clean_location: cleaned.append((clean_location, source))
+    if speculative and len(cleaned) > 1:
+        futures = [stage_executor.submit(deadline.run, geocode_location, clean_location) for clean_location, _ in cleaned]
+    else:
+        futures = None
+    for i, (clean_location, source) in enumerate(cleaned):
+        logger.debug("Attempting geocoding for: '%s' (Source: %s)", clean_location, source)
+        try:
+            coords = futures[i].result(timeout=deadline.remaining()) if futures else deadline.run(geocode_location, clean_location)
+        except (UpstreamUnavailable, concurrent.futures.TimeoutError) as e:
+            logger.info("[Geocode] Skipped '%s': %s", clean_location, str(e) or "budget spent")
+            unavailable.append(clean_location)
+            continue
+        if coords:
+            logger.debug("Geocoding successful: %s", coords)
+            if futures:
+                for pending in futures[i + 1:]: pending.cancel()
+            return clean_location, source, coords
+        logger.debug("Geocoding failed for: '%s'", clean_location)
+    return None
+
+@observe_stage('process_artist')
+def process_artist_location(artist_name, spotify_data=None, stage_log=None, mode=None, deadline=None):
+    """Resolve an artist's origin by walking LOCATION_SOURCES in priority order.
+
+    ``mode`` overrides RESOLUTION_MODE. If ``stage_log`` (a dict) is given it is
+    filled with the pipeline stages that produced nothing, the stages that were
+    never needed, the stages that were unavailable, and the location candidates
+    that were tried.
+
+    Every source fetch and geocode runs within ``deadline`` (a Deadline; none by
+    default). A source that runs out of time or hits an open circuit is skipped
+    like one that found nothing, but the result is then marked ``"partial": true``
+    so that it is retried rather than cached as the final answer.
+    """
+    logger.debug("--- Processing START: %s ---", artist_name)
     if not artist_name:
         return None
+    speculative = (mode or RESOLUTION_MODE) == 'speculative'
+    deadline = deadline or Deadline()
 
-    # Initialize result tracking
-    location_results = {
-        "wiki_infobox": None,
-        "mb_specific": None,
-        "mb_country": None
-    }
     location_source = "None"  # Default source
     origin_name_final = None
     coords = None
+    source_raw = {}           # stage name -> raw source result (wiki origin / MB artist)
+    candidate_locations = []  # every candidate tried, in priority order
+    failed_stages = []
+    unavailable_stages = []   # sources (or "geocode") skipped for lack of time or an open circuit
+    ungeocoded = []
 
-    # 1. Try Wikipedia Infobox first (Primary source)
-    wiki_origin = get_wikipedia_origin(artist_name)
-    if wiki_origin:
-        location_results["wiki_infobox"] = wiki_origin
-        print(f"  Result from Wiki Infobox: '{wiki_origin}'")
-    else:
-        print(f"  Wiki Infobox returned no results")
+    # 1. Start sources: all at once when speculative, otherwise one by one on demand
+    futures = {}
+    if speculative:
+        for stage, fetch in LOCATION_SOURCES:
+            futures[stage] = stage_executor.submit(deadline.run, fetch, artist_name, spotify_data)
 
-    # 2. Get MusicBrainz data with improved lookup
-    mb_artist = get_musicbrainz_data(artist_name)
-    if mb_artist:
-        # Use the enhanced extraction function
-        mb_locations = extract_location_from_mb(mb_artist)
-        
-        if mb_locations["specific"]:
-            location_results["mb_specific"] = mb_locations["specific"]
-            print(f"  Result from MusicBrainz (Specific): '{mb_locations['specific']}'")
-        
-        if mb_locations["country"]:
-            location_results["mb_country"] = mb_locations["country"]
-            print(f"  Result from MusicBrainz (Country): '{mb_locations['country']}'")
+    # 2. Walk sources in priority order, geocoding each one's candidates before moving on
+    for stage, fetch in LOCATION_SOURCES:
+        try:
+            if stage in futures:
+                raw, candidates = futures[stage].result(timeout=deadline.remaining())
+            else:
+                raw, candidates = deadline.run(fetch, artist_name, spotify_data)
+        except (UpstreamUnavailable, concurrent.futures.TimeoutError) as e:
+            logger.info("[%s] Skipped for '%s': %s", stage, artist_name, str(e) or "budget spent")
+            source_raw[stage] = None
+            unavailable_stages.append(stage)
+            continue
+        source_raw[stage] = raw
+        if not candidates:
+            failed_stages.append(stage if not raw else f"{stage}_location")
+            continue
+        candidate_locations.extend(candidates)
+        geocoded = geocode_candidates(candidates, speculative, deadline, ungeocoded)
+        if geocoded:
+            origin_name_final, location_source, coords = geocoded
+            break  # Stop trying sources once we have coordinates
     else:
-        print(f"  MusicBrainz returned no results")
+        if candidate_locations: failed_stages.append("geocode")
+    if ungeocoded: unavailable_stages.append("geocode")
 
-    # 3. Determine best location string using a clearer priority order
-    # Priority: Wiki Infobox > MB Specific > MB Country
-    candidate_locations = []
-    
-    # Add locations in order of preference
-    if location_results["wiki_infobox"]:
-        candidate_locations.append((location_results["wiki_infobox"], "Wikipedia Infobox"))
-    if location_results["mb_specific"]:
-        candidate_locations.append((location_results["mb_specific"], "MusicBrainz Specific"))
-    if location_results["mb_country"]:
-        candidate_locations.append((location_results["mb_country"], "MusicBrainz Country"))
-    
-    # 4. Try geocoding each candidate in preference order
-    for location_string, source in candidate_locations:
-        if not location_string:
-            continue
-            
-        # Clean the location string before geocoding
-        clean_location = clean_location_string(location_string)
-        print(f"  Attempting geocoding for: '{clean_location}' (Source: {source})")
-        
-        # Try geocoding
-        coords = geocode_location(clean_location)
-        if coords:
-            origin_name_final = clean_location
-            location_source = source
-            print(f"  Geocoding successful: {coords}")
-            break  # Stop trying candidates once we have coordinates
-        else:
-            print(f"  Geocoding failed for: '{clean_location}'")
-    
-    # 5. Prepare the result with all available data
+    # Lower-priority sources still queued are no longer needed
+    for future in futures.values(): future.cancel()
+    wiki_origin = source_raw.get("wiki_infobox")
+    mb_artist = source_raw.get("musicbrainz")
+
+    # 3. Prepare the result with all available data
     location_data = {
         "name": artist_name,
         "origin": origin_name_final,
@@ -413,6 +1002,10 @@ def process_artist_location(artist_name, spotify_data=None):
         "lon": coords["lon"] if coords else None,
         "location_source": location_source
     }
+    if unavailable_stages:
+        location_data["partial"] = True
+    if mb_artist and mb_artist.mbid:
+        location_data["mbid"] = mb_artist.mbid
     
     # Add Spotify data if available
     if spotify_data:
@@ -425,17 +1018,24 @@ def process_artist_location(artist_name, spotify_data=None):
 
     # Special debugging for problem artists like "Arppa"
     if artist_name.lower() == "arppa" or (location_data['lat'] is None and location_data['origin'] is None):
-        print(f"--- SPECIAL DEBUG for {artist_name} ---")
-        print(f"  Wiki origin: {wiki_origin}")
-        print(f"  MB data available: {bool(mb_artist)}")
+        logger.debug("--- SPECIAL DEBUG for %s ---", artist_name)
+        logger.debug("Wiki origin: %s", wiki_origin)
+        logger.debug("MB data available: %s", bool(mb_artist))
         if mb_artist:
-            print(f"  MB area: {mb_artist.get('area', {}).get('name')}")
-            print(f"  MB begin-area: {mb_artist.get('begin-area', {}).get('name')}")
-            print(f"  MB country: {mb_artist.get('country')}")
-        print(f"  Final location candidates: {candidate_locations}")
-        print(f"--- END SPECIAL DEBUG ---")
+            logger.debug("MB area: %s", mb_artist.area)
+            logger.debug("MB begin-area: %s", mb_artist.begin_area)
+            logger.debug("MB country: %s", mb_artist.country)
+        logger.debug("Final location candidates: %s", candidate_locations)
+        logger.debug("--- END SPECIAL DEBUG ---")
 
-    print(f"--- Processing END: {artist_name} -> Origin='{location_data['origin']}', Source='{location_data['location_source']}', Coords=({location_data['lat']}, {location_data['lon']}) ---")
+    if stage_log is not None:
+        stage_log["failed_stages"] = failed_stages
+        stage_log["skipped_stages"] = [stage for stage, _ in LOCATION_SOURCES if stage not in source_raw]
+        stage_log["unavailable_stages"] = unavailable_stages
+        stage_log["candidates"] = [location_string for location_string, _ in candidate_locations]
+
+    logger.info("--- Processing END: %s -> Origin='%s', Source='%s', Coords=(%s, %s) ---", artist_name,
+                location_data['origin'], location_data['location_source'], location_data['lat'], location_data['lon'])
     return location_data
 
 def clean_location_string(location):
@@ -455,131 +1055,375 @@ def clean_location_string(location):
     return cleaned if cleaned else None
 
 # --- Enhanced Geocoding ---
-@timed_cache(geocode_cache)
+@observe_stage('geocode')
 def geocode_location(place_name):
+    """Geocode via the offline gazetteer, falling back to (cached) Nominatim for the long tail."""
+    if not place_name:
+        return None
+    if gazetteer:
+        place = gazetteer.lookup(place_name)
+        if place:
+            logger.debug("[Geocode] Gazetteer hit for '%s': %s (%s, %s)", place_name, place['name'], place['kind'], place['country'])
+            return {"lat": place["lat"], "lon": place["lon"]}
+    return nominatim_geocode(place_name)
+
+@timed_cache(geocode_cache)
+def nominatim_geocode(place_name):
     """Enhanced geocoding with better error handling and normalization."""
     if not place_name:
         return None
         
-    print(f"    [Geocode] Attempting to geocode: '{place_name}'")
+    logger.debug("[Geocode] Attempting to geocode: '%s'", place_name)
     
     # Don't retry if we previously failed on this exact string
     # This creates a "negative cache" effect to avoid repeated calls for known failures
     # Implementation detail: timed_cache needs a slight modification to store None values
     
     try:
-        time.sleep(0.75)  # Be nice to Nominatim
-        
         # First attempt - direct geocoding
-        location = geolocator.geocode(place_name, timeout=10)
+        location = upstream_call(NOMINATIM_HOST, "Geocode", geolocator.geocode, place_name, timeout=UPSTREAM_TIMEOUT_SECONDS)
         
         if location:
             coords = {"lat": location.latitude, "lon": location.longitude}
-            print(f"    [Geocode] SUCCESS: {coords}")
+            logger.debug("[Geocode] SUCCESS: %s", coords)
             return coords
             
         # No results - try adding "music" qualifier to help Nominatim understand it's a location
         # This can help with band names that are also common words
         if re.search(r"\b(?:band|group|musician|singer)\b", place_name, re.IGNORECASE) is None:
-            print(f"    [Geocode] First attempt failed, trying with music qualifier...")
+            logger.debug("[Geocode] First attempt failed, trying with music qualifier...")
             alt_place = f"{place_name} music"
-            location = geolocator.geocode(alt_place, timeout=10)
+            location = upstream_call(NOMINATIM_HOST, "Geocode", geolocator.geocode, alt_place, timeout=UPSTREAM_TIMEOUT_SECONDS)
             
             if location:
                 coords = {"lat": location.latitude, "lon": location.longitude}
-                print(f"    [Geocode] SUCCESS with music qualifier: {coords}")
+                logger.debug("[Geocode] SUCCESS with music qualifier: %s", coords)
                 return coords
         
-        print(f"    [Geocode] FAILED: No results from Nominatim.")
+        logger.debug("[Geocode] FAILED: No results from Nominatim.")
         return None
         
+    except UpstreamUnavailable:
+        raise
     except GeocoderTimedOut:
-        print(f"    [Geocode] TIMEOUT for '{place_name}'")
+        logger.warning("[Geocode] TIMEOUT for '%s'", place_name)
         return None
     except GeocoderServiceError as e:
-        print(f"    [Geocode] SERVICE ERROR for '{place_name}': {e}")
+        logger.warning("[Geocode] SERVICE ERROR for '%s': %s", place_name, e)
         return None
     except Exception as e:
-        print(f"    [Geocode] UNEXPECTED ERROR for '{place_name}': {e}")
+        logger.warning("[Geocode] UNEXPECTED ERROR for '%s': %s", place_name, e)
         return None
 
+# --- Global Artist Indexes ---
+# Both are keyed like artist_location_cache (Spotify ID, else normalized name), with the display name as a property.
+# Every located artist in artist_location_cache, clustered per zoom level for /artists/clusters
+artist_map_index = ClusterIndex(max_zoom=int(os.getenv('CLUSTER_MAX_ZOOM', '16')), radius=int(os.getenv('CLUSTER_RADIUS', '40')))
+# ... and filed by genre and by gazetteer region (country / first-level region / city) for /facets/*
+artist_facets = FacetIndex()
+artist_indexes_loaded = threading.Event()
+
+def artist_map_properties(artist_name, location_data):
+    """The fields shown for a single artist on the global map (kept small; details come from the list APIs)."""
+    return {'name': artist_name, 'origin': location_data.get('origin'), 'image_url': location_data.get('image_url')}
+
+@functools.lru_cache(maxsize=20000)
+def origin_regions(origin):
+    """Gazetteer regions of an origin string, ``((level, key, name), ...)``; many artists share an origin."""
+    return tuple(gazetteer.hierarchy(origin)) if gazetteer and origin else ()
+
+def index_artist(key, artist_name, location_data):
+    """Add, move or drop the artist cached under ``key`` in the map and facet indexes after its location changed."""
+    if location_data and location_data.get('lat') is not None and location_data.get('lon') is not None:
+        artist_map_index.add(key, float(location_data['lon']), float(location_data['lat']),
+                             artist_map_properties(artist_name, location_data))
+        artist_facets.update(key, location_data.get('genres') or [], origin_regions(location_data.get('origin')),
+                             name=artist_name)
+    else:
+        artist_map_index.remove(key)
+        artist_facets.remove(key)
+
+def reindex_moved_artist(store, old_key, new_key, entry):
+    """Follow an artist_location_cache entry that ArtistKeys moved to its canonical key."""
+    if store is not artist_location_cache:
+        return
+    artist_map_index.remove(old_key)
+    artist_facets.remove(old_key)
+    index_artist(new_key, display_name(new_key, entry), (entry or {}).get('data'))
+
+artist_keys.on_move = reindex_moved_artist
+
+def load_artist_indexes():
+    """Index the whole artist cache; runs once in the background, newly resolved artists are added as they come."""
+    started = time.perf_counter()
+    try:
+        for key, entry in artist_location_cache.items():
+            artist_name = display_name(key, entry)
+            if artist_name and key not in artist_map_index:  # a fresher resolution may have been indexed already
+                index_artist(key, artist_name, (entry or {}).get('data'))
+    except Exception as e:
+        logger.exception("Could not load the artist indexes: %s", e)
+    finally:
+        artist_indexes_loaded.set()
+    logger.info("Artist indexes loaded: %s artists in %.1fs", len(artist_map_index), time.perf_counter() - started)
+
+threading.Thread(target=load_artist_indexes, name='artist-indexes', daemon=True).start()
+
+# --- Single Artist Resolution ---
+def artist_key(artist_name, spotify_data=None):
+    """The artist's canonical cache key: its Spotify ID, or its normalized name without one."""
+    return canonical_key(artist_name, spotify_artist_id(spotify_data))
+
+def artist_cache_key(cache, artist_name, spotify_data=None, mbid=None):
+    """Where ``cache`` (artist_location_cache or artist_negative_cache) keeps this artist.
+
+    An entry found under an older key (the display name, or the name before
+    the Spotify ID was known) is moved to the canonical key first.
+    """
+    return artist_keys.locate(cache, artist_name, spotify_artist_id(spotify_data), mbid)
+
+# Concurrent requests for the same artist (e.g. two users sharing a favourite) share one pipeline run
+artist_flight = SingleFlight()
+
+def resolve_and_cache_artist(artist_name, spotify_data, deadline=None):
+    """Run the location pipeline for one artist and record the outcome in the positive or negative cache.
+
+    A partial result (a source was unavailable) is cached only if it located the
+    artist, and is then refreshed on its next use. A partial miss is not cached.
+    """
+    stage_log = {}
+    location_data = process_artist_location(artist_name, spotify_data, stage_log, deadline=deadline)
+    if location_data:
+        now = datetime.now().isoformat()
+        mbid = location_data.get('mbid')
+        if location_data.get('lat') is not None:
+            key = artist_cache_key(artist_location_cache, artist_name, spotify_data, mbid)
+            artist_location_cache[key] = {'data': location_data, 'timestamp': now}
+            artist_negative_cache.pop(artist_cache_key(artist_negative_cache, artist_name, spotify_data, mbid))
+            artist_keys.remember(key, artist_name, mbid)
+            index_artist(key, artist_name, location_data)
+        elif location_data.get('partial'):
+            logger.info("Not caching unresolved '%s': %s unavailable", artist_name, ', '.join(stage_log['unavailable_stages']))
+        else:
+            # Remember the miss (without per-user Spotify fields) and why it failed
+            key = artist_cache_key(artist_negative_cache, artist_name, spotify_data, mbid)
+            artist_keys.remember(key, artist_name, mbid)
+            artist_negative_cache[key] = {
+                'data': {
+                    'location': {k: location_data.get(k) for k in ('name', 'origin', 'lat', 'lon', 'location_source')},
+                    'spotify_id': spotify_artist_id(spotify_data),  # so the entry is not adopted by a namesake
+                    **stage_log,
+                },
+                'timestamp': now
+            }
+    return location_data
+
+def resolve_artist(artist_name, spotify_data, budget=ARTIST_BUDGET_SECONDS):
+    """Resolve one artist within ``budget`` seconds (None: no limit), waiting on an identical in-flight lookup if there is one."""
+    location_data = artist_flight.do(artist_key(artist_name, spotify_data), resolve_and_cache_artist, artist_name,
+                                     spotify_data, Deadline(budget))
+    if location_data:
+        # The shared result may carry another caller's Spotify fields
+        location_data = {**location_data, **spotify_data}
+    return location_data
+
+# The JSON backend buffers writes. Resolved artists ask for a save, and one thread writes the files
+# at most once per CACHE_FLUSH_INTERVAL_SECONDS (SQLite already committed per key).
+CACHE_FLUSH_INTERVAL_SECONDS = float(os.getenv('CACHE_FLUSH_INTERVAL_SECONDS', '5'))
+cache_flush_requested = threading.Event()
+
+def schedule_cache_flush():
+    if CACHE_BACKEND != 'sqlite': cache_flush_requested.set()
+
+def cache_flush_loop():
+    while True:
+        cache_flush_requested.wait()
+        time.sleep(CACHE_FLUSH_INTERVAL_SECONDS)  # batch the artists resolved meanwhile
+        cache_flush_requested.clear()
+        save_caches_to_disk()
+
+if CACHE_BACKEND != 'sqlite':
+    threading.Thread(target=cache_flush_loop, name='cache-flush', daemon=True).start()
+
+# One process-wide queue resolves missing artists (interactive), revalidates expired ones (refresh)
+# and warms the cache (warm), in that order of priority. Its workers are sized to what the upstream
+# rate limits can feed: with RESOLVER_LATENCY_ESTIMATE_SECONDS per call, that many calls in flight
+# keep every host at its budget, and more workers would only wait in the rate-limit queues.
+RESOLVER_LATENCY_ESTIMATE_SECONDS = float(os.getenv('RESOLVER_LATENCY_ESTIMATE_SECONDS', '0.5'))
+RESOLVER_WORKERS = int(os.getenv('RESOLVER_WORKERS') or
+                       max(2, min(32, math.ceil(upstream_limiter.concurrency(RESOLVER_LATENCY_ESTIMATE_SECONDS)))))
+RESOLVER_MAX_QUEUE = int(os.getenv('RESOLVER_MAX_QUEUE', '1000'))
+background_resolver = BackgroundResolver(
+    resolve_artist, max_workers=RESOLVER_WORKERS, max_queue=RESOLVER_MAX_QUEUE, on_resolved=schedule_cache_flush,
+    key_fn=artist_key,
+    on_wait=lambda name, seconds: RESOLVER_QUEUE_WAIT_SECONDS.observe(seconds, **{'class': name}),
+)
+
+def refresh_in_background(items):
+    """Queue ``(index, name, spotify_data)`` items served stale for revalidation; skipped while the queue is full."""
+    for _, artist_name, spotify_data in items:
+        try:
+            background_resolver.submit(artist_name, spotify_data, priority=REFRESH)
+        except QueueFull:
+            logger.info("Resolver queue full; not refreshing %s stale artists now", len(items))
+            break
+
+# Gauges read at scrape time from the objects that already keep these numbers
+def _front_cache_samples(field):
+    return [({'cache': namespace}, cache.stats()[field])
+            for namespace, cache in all_caches().items() if isinstance(cache, LRUFrontCache)]
+
+metrics.collector('music_map_cache_memory_entries', 'Entries held in the in-memory cache tier.',
+                  lambda: _front_cache_samples('entries'), ['cache'])
+metrics.collector('music_map_cache_memory_bytes', 'Approximate bytes held in the in-memory cache tier.',
+                  lambda: _front_cache_samples('bytes'), ['cache'])
+metrics.collector('music_map_cache_memory_evictions_total', 'LRU evictions from the in-memory cache tier.',
+                  lambda: _front_cache_samples('evictions'), ['cache'], kind='counter')
+metrics.collector('music_map_upstream_circuit_state', 'Circuit breaker state per upstream host (0 closed, 1 half-open, 2 open).',
+                  lambda: [({'host': host}, CIRCUIT_STATE_VALUES[breaker.state]) for host, breaker in upstream_breakers.items()],
+                  ['host'])
+metrics.collector('music_map_upstream_circuit_rejections_total', 'Upstream calls failed fast by an open circuit.',
+                  lambda: [({'host': host}, breaker.stats()['rejected']) for host, breaker in upstream_breakers.items()],
+                  ['host'], kind='counter')
+metrics.collector('music_map_resolver_queue_depth', 'Artists queued or running in the background resolver.',
+                  lambda: [({}, background_resolver.queue_depth())])
+metrics.collector('music_map_resolver_queued', 'Artists waiting in the resolver queue, by priority class.',
+                  lambda: [({'class': name}, count) for name, count in background_resolver.scheduler.depth().items()],
+                  ['class'])
+metrics.collector('music_map_resolver_shed_total', 'Artists displaced from or refused by the full resolver queue.',
+                  lambda: [({'class': name, 'reason': reason}, counts[reason])
+                           for name, counts in background_resolver.stats()['classes'].items()
+                           for reason in ('displaced', 'rejected')],
+                  ['class', 'reason'], kind='counter')
+metrics.collector('music_map_singleflight_coalesced_total', 'Lookups that waited on an identical in-flight call.',
+                  lambda: [({'layer': layer}, flight.stats()['coalesced']) for layer, flight in (
+                      ('artist', artist_flight), ('musicbrainz', get_musicbrainz_data.flight),
+                      ('wikipedia', get_wikipedia_origin.flight), ('geocode', nominatim_geocode.flight))],
+                  ['layer'], kind='counter')
+
 # --- Enhanced Batch Processing with Rate Limiting ---
-def get_artist_locations(artists_data):
-    """Process multiple artists with improved concurrency control and error handling."""
-    if not artists_data:
-        return []
-        
-    results = []
-    artists_to_process = []
-    print(f"--- Batch Processing START for {len(artists_data)} artists ---")
+def spotify_artist_fields(artist):
+    """The per-artist Spotify fields merged into every location result."""
+    return {
+        'genres': artist.get('genres', []),
+        'spotify_url': artist.get('external_urls', {}).get('spotify'),
+        'image_url': artist['images'][-1]['url'] if artist.get('images') else None,
+        'uri': artist.get('uri')
+    }
+
+def lookup_cached_artists(artists_data):
+    """Answer as many Spotify artists as possible from the caches without any upstream calls.
+
+    Returns ``(ready, to_resolve, to_refresh)``:
+    - ready: ``(index, location_data)`` for fresh, stale and known-unlocatable artists
+    - to_resolve: ``(index, name, spotify_data)`` for artists with nothing usable cached
+    - to_refresh: ``(index, name, spotify_data)`` for artists served stale that need revalidating
+    ``index`` is the artist's position in ``artists_data`` (its Spotify rank - 1).
+    """
+    ready, to_resolve, to_refresh = [], [], []
 
     # Enhanced cache check with smart update for spotify data
-    for artist in artists_data:
+    for index, artist in enumerate(artists_data):
         artist_name = artist['name']
-        spotify_data = {
-            'genres': artist.get('genres', []),
-            'spotify_url': artist.get('external_urls', {}).get('spotify'),
-            'image_url': artist['images'][-1]['url'] if artist.get('images') else None,
-            'uri': artist.get('uri')
-        }
+        spotify_data = spotify_artist_fields(artist)
         
-        # Check if we have a valid cached item
-        cached_item = artist_location_cache.get(artist_name)
-        is_expired = True
-        
-        if cached_item and 'timestamp' in cached_item:
-            try:
-                cached_time = datetime.fromisoformat(cached_item['timestamp'])
-                if cached_time + timedelta(days=CACHE_EXPIRY_DAYS) > datetime.now():
-                    is_expired = False
-            except ValueError:
-                pass
-                
-        if cached_item and not is_expired and cached_item.get('data', {}).get('lat') is not None:
-            # Only use cache if it actually has coordinates
-            cached_data = cached_item['data']
-            # Update with fresh Spotify data (they might have changed their profile pic, etc.)
-            cached_data.update(spotify_data)
-            results.append(cached_data)
-        else:
-            artists_to_process.append((artist_name, spotify_data))
+        # Any cached item with coordinates is served; expired ones are served stale and refreshed
+        key = artist_cache_key(artist_location_cache, artist_name, spotify_data)
+        fresh_item = artist_location_cache.get_fresh(key, CACHE_EXPIRY_DAYS * 86400)
+        cached_item = fresh_item or artist_location_cache.get(key)
+        if cached_item and cached_item.get('data', {}).get('lat') is not None:
+            cached_data = dict(cached_item['data'])
+            # Update with fresh Spotify data (they might have changed their name or profile pic, etc.)
+            cached_data.update(spotify_data, name=artist_name)
+            if fresh_item is None or cached_data.get('partial'):
+                cached_data['stale'] = True
+                to_refresh.append((index, artist_name, spotify_data))
+            CACHE_LOOKUPS.inc(cache='artist_location', result='hit' if fresh_item else 'stale')
+            ready.append((index, cached_data))
+            continue
 
-    # Process remaining artists with adaptive concurrency
-    if artists_to_process:
-        print(f"  Processing {len(artists_to_process)} artists via API calls...")
-        
-        # Adjust number of workers based on batch size to avoid rate limiting
-        max_workers = min(5, max(1, len(artists_to_process) // 3))
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_artist = {
-                executor.submit(process_artist_location, name, data): name 
-                for name, data in artists_to_process
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_artist):
-                artist_name = future_to_artist[future]
+        # Known-unlocatable artist: skip the whole pipeline until the negative entry expires
+        negative_key = artist_cache_key(artist_negative_cache, artist_name, spotify_data)
+        negative_item = artist_negative_cache.get_fresh(negative_key, NEGATIVE_CACHE_TTL_HOURS * 3600)
+        if negative_item is not None:
+            negative_data = dict(negative_item['data']['location'])
+            negative_data.update(spotify_data, name=artist_name)
+            CACHE_LOOKUPS.inc(cache='artist_location', result='negative')
+            ready.append((index, negative_data))
+            continue
+
+        CACHE_LOOKUPS.inc(cache='artist_location', result='miss')
+        to_resolve.append((index, artist_name, spotify_data))
+    BATCH_SIZE.observe(len(artists_data), kind='top_artists')
+    BATCH_SIZE.observe(len(to_resolve), kind='uncached')
+    return ready, to_resolve, to_refresh
+
+def lookup_and_queue_artists(artists_data, prefetch=()):
+    """``lookup_cached_artists`` over ``artists_data`` and ``prefetch`` together, as one batch.
+
+    Starts the Wikipedia prefetch for everything that needs resolving and
+    queues the stale artists, and the ``prefetch`` artists with nothing
+    usable cached, for background refresh. Returns ``(ready, to_resolve,
+    to_refresh)`` for ``artists_data`` only; resolving ``to_resolve`` is up
+    to the caller.
+    """
+    count = len(artists_data)
+    ready, to_resolve, to_refresh = lookup_cached_artists(list(artists_data) + list(prefetch))
+    start_wikipedia_prefetch([name for _, name, _ in to_resolve + to_refresh])
+    refresh_in_background([item for item in to_resolve if item[0] >= count] + to_refresh)
+    return ([item for item in ready if item[0] < count], [item for item in to_resolve if item[0] < count],
+            [item for item in to_refresh if item[0] < count])
+
+def iter_artist_locations(artists_data, deadline=None, unfinished=None, prefetch=()):
+    """Yield ``(index, location_data)`` for each Spotify artist as soon as it is known.
+
+    Cached artists (fresh, stale or negative) come out immediately and stale ones
+    are refreshed in the background without being waited on. The rest are queued
+    on the background resolver and follow in completion order, until ``deadline``
+    (a Deadline) passes. Artists still being resolved then are left to the
+    background resolver and appended to ``unfinished`` as ``(index, name, spotify_data)``.
+    ``prefetch`` artists (the user's other time ranges) are looked up in the
+    same batch and resolved in the background, but not yielded or waited on.
+    """
+    if not artists_data:
+        return
+    logger.info("--- Batch Processing START for %s artists (%s prefetched) ---", len(artists_data), len(prefetch))
+    ready, to_resolve, to_refresh = lookup_and_queue_artists(artists_data, prefetch)
+    yield from ready
+
+    resolved_count = 0
+    if to_resolve:
+        logger.debug("Processing %s artists via API calls...", len(to_resolve))
+        future_to_artist = {
+            background_resolver.submit(name, data): (index, name, data)
+            for index, name, data in to_resolve
+        }
+        waiting = dict(future_to_artist)
+        try:
+            for future in concurrent.futures.as_completed(future_to_artist, timeout=deadline.remaining() if deadline else None):
+                index, artist_name, spotify_data = waiting.pop(future)
                 try:
                     location_data = future.result()
-                    if location_data:
-                        # Don't cache results without coordinates
-                        if location_data.get('lat') is not None:
-                            artist_location_cache[artist_name] = {
-                                'data': location_data,
-                                'timestamp': datetime.now().isoformat()
-                            }
-                        results.append(location_data)
                 except Exception as e:
-                    print(f"Error processing {artist_name} in parallel thread: {e}")
-                    import traceback
-                    traceback.print_exc()
-
-    # Save updated caches - but only periodically to reduce disk I/O
-    # This approach reduces excessive writes when processing large batches
-    save_caches_to_disk()
+                    logger.exception("Error processing %s in background resolver: %s", artist_name, e)
+                    continue
+                if location_data:
+                    resolved_count += 1
+                    # The queued lookup may have been submitted with another user's Spotify fields
+                    yield index, {**location_data, **spotify_data}
+        except concurrent.futures.TimeoutError:
+            logger.info("Request budget of %gs spent; %s artists left to the background resolver", deadline.budget, len(waiting))
+            if unfinished is not None: unfinished.extend(sorted(waiting.values(), key=lambda entry: entry[0]))
     
-    print(f"--- Batch Processing END. Returning {len(results)} results. ---")
-    return results
+    logger.info("--- Batch Processing END. %s from cache (%s stale), resolved %s of %s uncached artists. ---",
+                len(ready), len(to_refresh), resolved_count, len(to_resolve))
+
+def get_artist_locations(artists_data, deadline=None, prefetch=()):
+    """Process multiple artists with improved concurrency control and error handling.
+
+    Artists not resolved by ``deadline`` are left out (and keep resolving in the background).
+    """
+    return [location_data for _, location_data in iter_artist_locations(artists_data, deadline, prefetch=prefetch)]
 
 # --- Flask Routes ---
 @app.route('/')
@@ -590,54 +1434,600 @@ def index():
 @app.route('/login')
 def login():
     try: sp_oauth = create_spotify_oauth(); auth_url = sp_oauth.get_authorize_url(); return redirect(auth_url)
-    except Exception as e: print(f"Login error: {e}"); return "Login Error", 500
+    except Exception as e: logger.warning("Login error: %s", e); return "Login Error", 500
 
 @app.route('/callback')
 def callback():
     sp_oauth = create_spotify_oauth(); session.clear(); code = request.args.get('code')
     if not code: error = request.args.get('error'); return f"Callback Error: {error}", 400
-    try: token_info = sp_oauth.get_access_token(code, check_cache=False); session['token_info'] = token_info; return redirect(url_for('index'))
-    except Exception as e: print(f"Token error: {e}"); return f"Token Error: {e}", 500
+    try: token_info = sp_oauth.get_access_token(code, check_cache=False); session['token_info'] = session_token_fields(token_info); return redirect(url_for('index'))
+    except Exception as e: logger.warning("Token error: %s", e); return f"Token Error: {e}", 500
 
 @app.route('/logout')
 def logout():
+    user_id = session.get('spotify_user_id')
+    if user_id:
+        top_artists_responses.discard_where(lambda key: key[0] == user_id)
+        top_artist_libraries.discard_where(lambda key: key == user_id)
     session.clear(); return redirect(url_for('index'))
 
+VALID_TIME_RANGES = ['short_term', 'medium_term', 'long_term']
+
+# Complete /top-artists answers per (Spotify user, time range, format), reused when the user switches back to a range
+top_artists_responses = ResponseCache(
+    ttl_seconds=float(os.getenv('TOP_ARTISTS_RESPONSE_TTL_SECONDS', '300')),
+    max_entries=int(os.getenv('TOP_ARTISTS_RESPONSE_MAX_ENTRIES', '1000')),
+)
+
+TOP_ARTISTS_LIMIT = int(os.getenv('TOP_ARTISTS_LIMIT', '30'))
+SPOTIFY_TOP_ARTISTS_PER_REQUEST = 50  # /v1/me/top/artists limit; more are fetched page by page
+# Fetch all three time ranges on a user's first request and resolve their union together
+PREFETCH_TIME_RANGES = os.getenv('PREFETCH_TIME_RANGES', 'true').lower() in ('1', 'true', 'yes')
+
+# Each user's top artists for every time range (a TopArtistsLibrary), fetched together
+top_artist_libraries = ResponseCache(
+    ttl_seconds=float(os.getenv('TOP_ARTISTS_LIBRARY_TTL_SECONDS') or top_artists_responses.ttl_seconds),
+    max_entries=int(os.getenv('TOP_ARTISTS_RESPONSE_MAX_ENTRIES', '1000')),
+    entry_factory=TopArtistsLibrary,
+)
+top_artist_library_flight = SingleFlight()
+spotify_range_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=int(os.getenv('SPOTIFY_RANGE_WORKERS', '12')), thread_name_prefix='spotify-range'
+)
+
+def spotify_client(token_info):
+    sp = spotipy.Spotify(auth=token_info['access_token'])
+    if SPOTIFY_API_URL: sp.prefix = SPOTIFY_API_URL
+    return sp
+
+def spotify_app_client():
+    """Spotify client authenticated as the app itself (client credentials), for calls outside a user session."""
+    if not (SPOTIPY_CLIENT_ID and SPOTIPY_CLIENT_SECRET):
+        raise ValueError("Spotify API credentials missing.")
+    sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET))
+    if SPOTIFY_API_URL: sp.prefix = SPOTIFY_API_URL
+    return sp
+
+def spotify_user_id(sp):
+    """The logged-in user's Spotify ID, looked up once per session."""
+    user_id = session.get('spotify_user_id')
+    if not user_id:
+        user_id = upstream_call(SPOTIFY_HOST, "Spotify", sp.current_user)['id']
+        session['spotify_user_id'] = user_id
+    return user_id
+
+def cached_top_artists(cache_key):
+    cached = top_artists_responses.get(cache_key)
+    CACHE_LOOKUPS.inc(cache='top_artists_response', result='hit' if cached else 'miss')
+    return cached
+
+def etag_response(entry):
+    """``entry`` (a CachedResponse) as JSON with its ETag, or an empty 304 if the client already has it."""
+    if etag_matches(request.headers.get('If-None-Match'), entry.etag):
+        response = Response(status=304)
+    else:
+        response = Response(entry.body, mimetype='application/json')
+    response.headers['ETag'] = entry.etag
+    response.headers['Cache-Control'] = 'private, no-cache'  # always revalidate; the ETag makes that cheap
+    return response
+
+def fetch_top_artist_pages(sp, time_range, limit=None):
+    """The user's top ``limit`` artists for one time range, paging through Spotify's results."""
+    limit = limit or TOP_ARTISTS_LIMIT
+    items = []
+    while len(items) < limit:
+        results = upstream_call(SPOTIFY_HOST, "Spotify", sp.current_user_top_artists, time_range=time_range,
+                                limit=min(SPOTIFY_TOP_ARTISTS_PER_REQUEST, limit - len(items)), offset=len(items))
+        page = results.get('items', [])
+        items.extend(page)
+        if not page or not results.get('next'):
+            break
+    return items[:limit]
+
+def fetch_top_artist_ranges(sp):
+    """``{time_range: artists}`` for all three time ranges, fetched concurrently."""
+    futures = {time_range: spotify_range_executor.submit(fetch_top_artist_pages, sp, time_range)
+               for time_range in VALID_TIME_RANGES}
+    return {time_range: future.result() for time_range, future in futures.items()}
+
+def store_top_artist_library(sp, user_id):
+    library = top_artist_libraries.put(user_id, fetch_top_artist_ranges(sp))
+    logger.info("Fetched %s distinct top artists over %s time ranges.", len(library), len(library.ranges))
+    return library
+
+def user_top_artist_library(sp, user_id):
+    """The user's TopArtistsLibrary from the cache, or fetched once for all concurrent requests."""
+    library = top_artist_libraries.get(user_id)
+    CACHE_LOOKUPS.inc(cache='top_artists_library', result='miss' if library is None else 'hit')
+    if library is None:
+        library = top_artist_library_flight.do(user_id, store_top_artist_library, sp, user_id)
+    return library
+
+def fetch_top_artists(sp, user_id, time_range):
+    """``(artists, prefetch)``: the user's top artists for ``time_range`` and those of the other ranges.
+
+    With PREFETCH_TIME_RANGES, the first request fetches every range and
+    keeps them per user for TOP_ARTISTS_LIBRARY_TTL_SECONDS; later requests
+    (any range) are views of that. ``prefetch`` is empty otherwise.
+    (Timed for metrics and Server-Timing.)
+    """
+    with server_timing('spotify'):
+        if not PREFETCH_TIME_RANGES:
+            return fetch_top_artist_pages(sp, time_range), []
+        library = user_top_artist_library(sp, user_id)
+    return library.view(time_range), library.others(time_range)
+
+def requested_time_range():
+    time_range = request.args.get('time_range', 'medium_term')
+    return time_range if time_range in VALID_TIME_RANGES else 'medium_term'
+
+def requested_format():
+    return 'geojson' if request.args.get('format') == 'geojson' else 'json'
+
+# Artist fields the map client shows; the rest (mbid, location_source, ...) stays on the server
+ARTIST_FEATURE_FIELDS = ('name', 'origin', 'genres', 'image_url', 'spotify_url', 'uri', 'stale', 'partial')
+
+def artist_feature(rank, location_data):
+    """One artist as a GeoJSON Feature the browser can put on the map as is.
+
+    ``id`` and ``properties.artistId`` (which Mapbox keeps on rendered
+    features) are the Spotify ID. Located artists get a Point rounded to 5
+    decimals (about 1 m), others a null geometry. Empty fields are left out.
+    """
+    artist_id = spotify_artist_id(location_data) or f"generated-{location_data.get('name')}-{rank}"
+    properties = {field: location_data[field] for field in ARTIST_FEATURE_FIELDS if location_data.get(field)}
+    properties.update(artistId=artist_id, rank=rank)
+    geometry = None
+    if location_data.get('lat') is not None and location_data.get('lon') is not None:
+        geometry = {'type': 'Point',
+                    'coordinates': [round(float(location_data['lon']), 5), round(float(location_data['lat']), 5)]}
+    return {'type': 'Feature', 'id': artist_id, 'geometry': geometry, 'properties': properties}
+
+def top_artists_payload(ranked, pending, job_id, fmt):
+    """/top-artists body for ``(rank, location_data)`` pairs: artist objects, or a FeatureCollection for geojson."""
+    if fmt == 'geojson':
+        return {"type": "FeatureCollection", "features": [artist_feature(rank, data) for rank, data in ranked],
+                "pending": pending, "job_id": job_id}
+    return {"artists": [dict(data, rank=rank) for rank, data in ranked], "pending": pending, "job_id": job_id}
+
+def spotify_error_response(e):
+    """JSON error response for a failed Spotify API call."""
+    logger.warning("Spotify API error: %s - %s", e.http_status, e.msg)
+    error_message = e.msg or "Spotify Error"; status_code = e.http_status or 500
+    if e.http_status == 429: error_message = "Rate limited by Spotify."
+    elif e.http_status in [401, 403]: error_message = "Spotify auth error. Try logout/login."; session.clear()
+    logger.info("--- API Request END (Spotify Error) ---"); return jsonify({"error": error_message}), status_code
+
+def spotify_unavailable_response(e):
+    """503 for a Spotify call that timed out, failed with 5xx/429 or hit the open circuit."""
+    logger.warning("Spotify unavailable: %s", e)
+    logger.info("--- API Request END (Spotify Unavailable) ---")
+    retry_after = CIRCUIT_RESET_SECONDS if isinstance(e, CircuitOpenError) else 5
+    return jsonify({"error": "Spotify is not responding. Try again shortly."}), 503, {'Retry-After': f"{retry_after:.0f}"}
+
+RESOLVER_BUSY_MESSAGE = "Too many artists are being looked up right now. Try again shortly."
+
+def resolver_busy_response():
+    """503 when the resolver queue is full of other users' artists (backpressure)."""
+    logger.warning("Resolver queue full: %s", background_resolver.stats()['queued'])
+    logger.info("--- API Request END (Resolver Busy) ---")
+    return jsonify({"error": RESOLVER_BUSY_MESSAGE}), 503, {'Retry-After': '10'}
+
 @app.route('/top-artists')
+@observe_route('/top-artists')
 def top_artists():
+    """Top artists answered from cache without waiting on any upstream lookup.
+
+    Returns ``{"artists": [...], "pending": [{"name", "rank"}], "job_id": ...}``;
+    with ``format=geojson``, ``"artists"`` is replaced by ``"type":
+    "FeatureCollection", "features": [...]`` (see artist_feature). Artists in ``pending`` are being resolved in the background; poll
+    ``/top-artists/jobs/<job_id>`` for them. Expired cache entries are served
+    (marked ``"stale": true``) while they are refreshed.
+
+    With PREFETCH_TIME_RANGES, the other two time ranges are fetched along
+    with this one and their artists queued behind it, so switching ranges
+    finds them resolved. Up to TOP_ARTISTS_LIMIT artists per range.
+
+    Complete answers (nothing pending or stale) are kept per user and time
+    range for TOP_ARTISTS_RESPONSE_TTL_SECONDS. Every answer carries a strong
+    ETag, and ``If-None-Match`` gets a 304 when it still matches.
+    """
     token_info = get_token()
     if not token_info: return jsonify({"error": "User not logged in or session expired"}), 401
-    valid_time_ranges = ['short_term', 'medium_term', 'long_term']
-    time_range = request.args.get('time_range', 'medium_term')
-    if time_range not in valid_time_ranges: time_range = 'medium_term'
-    print(f"--- API Request START /top-artists?time_range={time_range} ---")
+    time_range, fmt = requested_time_range(), requested_format()
+    logger.info("--- API Request START /top-artists?time_range=%s ---", time_range)
     try:
-        sp = spotipy.Spotify(auth=token_info['access_token'])
-        results = sp.current_user_top_artists(limit=30, time_range=time_range)
-        spotify_artists = results.get('items', [])
+        sp = spotify_client(token_info)
+        cache_key = (spotify_user_id(sp), time_range, fmt)
+        cached = cached_top_artists(cache_key)
+        if cached:
+            logger.info("--- API Request END /top-artists (response cache) ---")
+            return etag_response(cached)
+        spotify_artists, prefetch = fetch_top_artists(sp, cache_key[0], time_range)
         if not spotify_artists:
-             print("No top artists from Spotify."); print(f"--- API Request END (No Spotify Artists) ---"); return jsonify([])
+             logger.info("No top artists from Spotify."); logger.info("--- API Request END (No Spotify Artists) ---")
+             return jsonify(top_artists_payload([], [], None, fmt))
+
+        with server_timing('cache'):
+            ready, to_resolve, to_refresh = lookup_and_queue_artists(spotify_artists, prefetch)
+        with server_timing('queue'):
+            job = background_resolver.create_job(
+                [(index + 1, name, data) for index, name, data in to_resolve]
+            ) if to_resolve else None
+
+        logger.info("Sending back %s cached artists (%s stale), %s pending.",
+                    len(ready), len(to_refresh), len(to_resolve))
+        logger.info("--- API Request END /top-artists ---")
+        payload = top_artists_payload([(index + 1, location_data) for index, location_data in ready],
+                                      job.pending() if job else [], job.id if job else None, fmt)
+        complete = job is None and not to_refresh
+        return etag_response(top_artists_responses.put(cache_key, payload) if complete else CachedResponse(payload))
+    except spotipy.exceptions.SpotifyException as e:
+        return spotify_error_response(e)
+    except UpstreamUnavailable as e:
+        return spotify_unavailable_response(e)
+    except QueueFull:
+        return resolver_busy_response()
+    except Exception as e:
+        logger.exception("Unexpected error in /top-artists: %s", e)
+        logger.info("--- API Request END (Server Error) ---"); return jsonify({"error": "Server error"}), 500
+
+@app.route('/top-artists/jobs/<job_id>')
+def top_artists_job(job_id):
+    """Progress of a background resolution job started by /top-artists (``format=geojson`` as there)."""
+    job = background_resolver.get_job(job_id)
+    if not job: return jsonify({"error": "Unknown or expired job"}), 404
+    payload = top_artists_payload(job.resolved(), job.pending(), job.id, requested_format())
+    payload["status"] = "done" if job.done() else "running"
+    return jsonify(payload)
+
+@app.route('/top-artists/stream')
+def top_artists_stream():
+    """NDJSON variant of /top-artists: one line per artist as soon as it is located.
+
+    Lines are ``{"event": "start", "total": n}``, then ``{"event": "artist",
+    "rank": r, "artist": {...}}`` per artist (cached ones first), then
+    ``{"event": "end", "count": k}``. A failure mid-stream is sent as
+    ``{"event": "error", "error": "..."}``. With ``format=geojson`` each
+    artist line carries ``"feature"`` (see artist_feature) instead of ``"artist"``.
 
-        artists_processed_list = get_artist_locations(spotify_artists)
+    The stream lasts at most REQUEST_BUDGET_SECONDS. Artists still being
+    resolved by then are listed in the end line, as ``"pending"`` with a
+    ``"job_id"`` to poll, as in /top-artists.
 
-        if artists_processed_list: print(f"Sending back {len(artists_processed_list)} artists. First: {artists_processed_list[0]}")
-        else: print("Sending back empty list.")
-        print(f"--- API Request END /top-artists ---")
-        return jsonify(artists_processed_list)
+    Shares the /top-artists response cache: a cached answer is replayed as
+    lines, and a stream that located every artist with fresh data is stored.
+    """
+    token_info = get_token()
+    if not token_info: return jsonify({"error": "User not logged in or session expired"}), 401
+    time_range, fmt = requested_time_range(), requested_format()
+    logger.info("--- API Request START /top-artists/stream?time_range=%s ---", time_range)
+    deadline = Deadline(REQUEST_BUDGET_SECONDS)
+    try:
+        sp = spotify_client(token_info)
+        cache_key = (spotify_user_id(sp), time_range, fmt)
+        cached = cached_top_artists(cache_key)
+        spotify_artists, prefetch = (None, None) if cached else fetch_top_artists(sp, cache_key[0], time_range)
     except spotipy.exceptions.SpotifyException as e:
-        print(f"Spotify API error: {e.http_status} - {e.msg}")
-        error_message = e.msg or "Spotify Error"; status_code = e.http_status or 500
-        if e.http_status == 429: error_message = "Rate limited by Spotify."
-        elif e.http_status in [401, 403]: error_message = "Spotify auth error. Try logout/login."; session.clear()
-        print(f"--- API Request END (Spotify Error) ---"); return jsonify({"error": error_message}), status_code
+        return spotify_error_response(e)
+    except UpstreamUnavailable as e:
+        return spotify_unavailable_response(e)
     except Exception as e:
-        print(f"Unexpected error in /top-artists: {e}"); import traceback; traceback.print_exc()
-        print(f"--- API Request END (Server Error) ---"); return jsonify({"error": "Server error"}), 500
+        logger.exception("Unexpected error in /top-artists/stream: %s", e)
+        logger.info("--- API Request END (Server Error) ---"); return jsonify({"error": "Server error"}), 500
+
+    def artist_event(rank, location_data):
+        if fmt == 'geojson':
+            return {"event": "artist", "rank": rank, "feature": artist_feature(rank, location_data)}
+        return {"event": "artist", "rank": rank, "artist": location_data}
+
+    def replay():
+        if fmt == 'geojson':
+            events = [{"event": "artist", "rank": feature["properties"]["rank"], "feature": feature}
+                      for feature in cached.payload["features"]]
+        else:
+            events = [{"event": "artist", "rank": artist["rank"], "artist": artist} for artist in cached.payload["artists"]]
+        yield json.dumps({"event": "start", "total": len(events)}) + "\n"
+        for event in events:
+            yield json.dumps(event) + "\n"
+        yield json.dumps({"event": "end", "count": len(events)}) + "\n"
+        logger.info("--- API Request END /top-artists/stream (response cache) ---")
+
+    def generate():
+        with REQUEST_SECONDS.time(route='/top-artists/stream'):
+            yield json.dumps({"event": "start", "total": len(spotify_artists)}) + "\n"
+            count = 0
+            located, complete, unfinished = [], True, []
+            try:
+                for index, location_data in iter_artist_locations(spotify_artists, deadline, unfinished, prefetch):
+                    count += 1
+                    complete = complete and not location_data.get('stale') and not location_data.get('partial')
+                    located.append((index + 1, location_data))
+                    yield json.dumps(artist_event(index + 1, location_data)) + "\n"
+            except QueueFull:
+                logger.warning("Resolver queue full during /top-artists/stream")
+                yield json.dumps({"event": "error", "error": RESOLVER_BUSY_MESSAGE}) + "\n"
+                complete = False
+            except Exception as e:
+                logger.exception("Unexpected error in /top-artists/stream: %s", e)
+                yield json.dumps({"event": "error", "error": "Server error"}) + "\n"
+                complete = False
+            if complete and count == len(spotify_artists):
+                located.sort(key=lambda ranked: ranked[0])
+                top_artists_responses.put(cache_key, top_artists_payload(located, [], None, fmt))
+            end = {"event": "end", "count": count}
+            if unfinished:
+                # Already queued, so this only groups them for polling
+                job = background_resolver.create_job([(index + 1, name, data) for index, name, data in unfinished])
+                end.update(pending=job.pending(), job_id=job.id)
+            yield json.dumps(end) + "\n"
+        logger.info("--- API Request END /top-artists/stream (%s artists) ---", count)
+
+    # No buffering by proxies (nginx) so each line reaches the browser as it is produced
+    return Response(stream_with_context(replay() if cached else generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+def parse_bbox(text):
+    """``(west, south, east, north)`` from ``"w,s,e,n"``; raises ValueError."""
+    west, south, east, north = (float(value) for value in text.split(','))
+    if not (-90 <= south <= 90 and -90 <= north <= 90) or not all(map(math.isfinite, (west, east))):
+        raise ValueError("bbox latitudes must be within -90..90")
+    return west, south, east, north
+
+@app.route('/artists/clusters')
+@observe_route('/artists/clusters')
+def artist_clusters():
+    """Clusters and single artists of the global map within ``bbox=west,south,east,north`` at ``zoom``.
+
+    Returns a GeoJSON FeatureCollection. Clusters have ``cluster``,
+    ``cluster_id``, ``point_count`` and ``expansion_zoom`` properties; single
+    artists have ``name``, ``origin`` and ``image_url``. ``loading`` is true
+    while the index is still being built from the cache at startup.
+    """
+    try:
+        bbox = parse_bbox(request.args.get('bbox', '-180,-85,180,85'))
+        zoom = float(request.args.get('zoom', '0'))
+        features = artist_map_index.clusters(bbox, zoom)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid bbox or zoom: {e}"}), 400
+    response = jsonify({"type": "FeatureCollection", "features": features, "loading": not artist_indexes_loaded.is_set()})
+    response.headers['Cache-Control'] = 'public, max-age=60'  # the same for every user
+    return response
+
+@app.route('/artists/clusters/leaves')
+def artist_cluster_leaves():
+    """A page of the artists in one cluster: ``?cluster_id=...&limit=50&offset=0``."""
+    try:
+        limit = max(1, min(200, int(request.args.get('limit', '50'))))
+        offset = max(0, int(request.args.get('offset', '0')))
+    except ValueError:
+        return jsonify({"error": "limit and offset must be integers"}), 400
+    found = artist_map_index.leaves(request.args.get('cluster_id', ''), limit=limit, offset=offset)
+    if found is None: return jsonify({"error": "Unknown cluster"}), 404
+    total, features = found
+    return jsonify({"type": "FeatureCollection", "features": features, "total": total, "offset": offset})
+
+def facet_limit(default=20, maximum=200):
+    try: return max(1, min(maximum, int(request.args.get('limit', default))))
+    except ValueError: return default
+
+def requested_region():
+    """``region`` argument as an index key: "FI" and "US:Oregon" are used as given, place names are resolved."""
+    region = request.args.get('region')
+    if not region or artist_facets.has_region(region):
+        return region
+    regions = origin_regions(region)
+    return regions[-1][1] if regions else region
+
+@app.route('/facets/genres')
+def facet_genres():
+    """Top genres by artist count, overall or from ``region`` (a key such as "FI" / "US:Oregon", or a place name)."""
+    return jsonify(artist_facets.top_genres(requested_region(), limit=facet_limit()))
+
+@app.route('/facets/regions')
+def facet_regions():
+    """Top regions of ``level`` (country, region, city) by artist count, overall or for ``genre``."""
+    level = request.args.get('level', 'country')
+    if level not in REGION_LEVELS: return jsonify({"error": f"level must be one of {', '.join(REGION_LEVELS)}"}), 400
+    return jsonify(artist_facets.top_regions(request.args.get('genre'), level=level, limit=facet_limit()))
+
+@app.route('/facets/artists')
+def facet_artists():
+    """A page of the artists matching ``genre`` and/or ``region``, by name, with their locations.
+
+    Each artist's ``key`` is its cache key (``spotify:artist:<id>``, or ``name:<name>`` without an ID);
+    two artists of the same name are two entries.
+    """
+    try: offset = max(0, int(request.args.get('offset', '0')))
+    except ValueError: offset = 0
+    total, page = artist_facets.artists(request.args.get('genre'), requested_region(), limit=facet_limit(50), offset=offset)
+    artists = []
+    for cache_key, artist_name in page:
+        data = (artist_location_cache.get(cache_key) or {}).get('data') or {}
+        artists.append({'key': cache_key, 'name': artist_name,
+                        **{field: data.get(field) for field in ('origin', 'lat', 'lon', 'genres', 'image_url', 'spotify_url')}})
+    return jsonify({"total": total, "offset": offset, "artists": artists})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of this worker's metrics."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/stats/upstreams')
+def upstream_stats():
+    """Rate-limit budget, queue wait time and circuit breaker state per upstream host."""
+    stats = upstream_limiter.stats()
+    for host, breaker in upstream_breakers.items():
+        stats.setdefault(host, {})['circuit'] = breaker.stats()
+    return jsonify(stats)
+
+@app.route('/stats/wikipedia')
+def wikipedia_stats():
+    """Response bytes and parse time per Wikipedia extraction path (wikitext vs. HTML)."""
+    return jsonify({'mode': WIKI_EXTRACTION, 'paths': wiki_extraction_stats.stats()})
+
+@app.route('/stats/caches')
+def cache_stats():
+    """Hit/miss/eviction counters and memory use of the in-memory cache tier, per namespace."""
+    stats = {
+        namespace: cache.stats() if isinstance(cache, LRUFrontCache) else {'entries': len(cache)}
+        for namespace, cache in all_caches().items()
+    }
+    stats['top_artists_response'] = top_artists_responses.stats()
+    stats['top_artists_library'] = top_artist_libraries.stats()
+    stats['artist_map_index'] = artist_map_index.stats()
+    stats['artist_facets'] = artist_facets.stats()
+    stats['artist_alias']['migrated'] = artist_keys.migrated
+    return jsonify(stats)
+
+@app.route('/stats/resolver')
+def resolver_stats():
+    """Resolver workers and queue: depth, oldest wait, mean/max wait and shed artists per priority class."""
+    return jsonify(background_resolver.stats())
+
+@app.route('/stats/inflight')
+def inflight_stats():
+    """Single-flight calls run vs. coalesced, per lookup layer."""
+    return jsonify({
+        'artist': artist_flight.stats(),
+        'musicbrainz': get_musicbrainz_data.flight.stats(),
+        'musicbrainz_spotify': get_musicbrainz_by_spotify_id.flight.stats(),
+        'wikipedia': get_wikipedia_origin.flight.stats(),
+        'geocode': nominatim_geocode.flight.stats(),
+    })
+
+# --- CLI Commands ---
+@app.cli.command('migrate-caches')
+def migrate_caches_command():
+    """Import the legacy JSON cache files into the SQLite cache database."""
+    if cache_db is None:
+        print("CACHE_BACKEND is not 'sqlite'; nothing to migrate."); return
+    counts = migrate_json_caches(cache_db, LEGACY_CACHE_FILES)
+    for namespace, count in counts.items():
+        print(f"  {namespace}: {count} entries read, {len(open_cache(namespace))} now stored")
+
+@app.cli.command('purge-negative-cache')
+@click.option('--stage', default=None, help="Only purge entries where this stage failed (wiki_infobox, musicbrainz, musicbrainz_location, geocode).")
+@click.option('--artist', 'artist_names', multiple=True, help="Only purge these artist names (repeatable).")
+def purge_negative_cache_command(stage, artist_names):
+    """Drop negative (unlocatable artist) entries so they are looked up again."""
+    purged = 0
+    wanted = {normalize_name(artist_name) for artist_name in artist_names}
+    for key, entry in artist_negative_cache.items():
+        if wanted and normalize_name(display_name(key, entry) or '') not in wanted: continue
+        if stage and stage not in (entry.get('data') or {}).get('failed_stages', []): continue
+        del artist_negative_cache[key]; purged += 1
+    artist_negative_cache.flush()
+    print(f"Purged {purged} negative cache entries ({len(artist_negative_cache)} remaining).")
+
+SPOTIFY_ARTISTS_PER_REQUEST = 50  # /v1/artists?ids= limit
+
+def warm_cache_targets(seeds, force):
+    """Split seeds into ``(to_resolve, finished)`` for warm-cache.
+
+    ``to_resolve`` holds ``(seed, artist name, spotify_data)``. ``finished`` holds
+    ``(seed, outcome, details)`` for seeds that are already cached or that failed.
+    Spotify IDs are looked up by name in batches through the app's own credentials.
+    """
+    to_resolve, finished = [], []
+    named = [(seed, seed[1], {}) for seed in seeds if seed[0] == 'name']
+    spotify_ids = [seed[1] for seed in seeds if seed[0] == 'spotify']
+    if spotify_ids:
+        answered = set()
+        try:
+            sp = spotify_app_client()
+            for ids in chunked(spotify_ids, SPOTIFY_ARTISTS_PER_REQUEST):
+                found = upstream_call(SPOTIFY_HOST, "Spotify", sp.artists, ids).get('artists', [])
+                by_id = {artist['id']: artist for artist in found if artist}
+                for spotify_id in ids:
+                    answered.add(spotify_id)
+                    artist = by_id.get(spotify_id)
+                    if artist: named.append((('spotify', spotify_id), artist['name'], spotify_artist_fields(artist)))
+                    else: finished.append((('spotify', spotify_id), 'error', {'error': 'Unknown Spotify artist ID'}))
+        except Exception as e:
+            logger.warning("[Warm Cache] Spotify ID lookup failed: %s", e)
+            finished.extend((('spotify', spotify_id), 'error', {'error': f'Spotify lookup failed: {e}'})
+                            for spotify_id in spotify_ids if spotify_id not in answered)
+
+    for seed, artist_name, spotify_data in named:
+        if not force:
+            key = artist_cache_key(artist_location_cache, artist_name, spotify_data)
+            fresh_item = artist_location_cache.get_fresh(key, CACHE_EXPIRY_DAYS * 86400)
+            if fresh_item and fresh_item.get('data', {}).get('lat') is not None and not fresh_item['data'].get('partial'):
+                finished.append((seed, 'cached', {'name': artist_name, 'located': True,
+                                                  'source': fresh_item['data'].get('location_source')}))
+                continue
+            negative_key = artist_cache_key(artist_negative_cache, artist_name, spotify_data)
+            if artist_negative_cache.get_fresh(negative_key, NEGATIVE_CACHE_TTL_HOURS * 3600) is not None:
+                finished.append((seed, 'cached', {'name': artist_name, 'located': False}))
+                continue
+        to_resolve.append((seed, artist_name, spotify_data))
+    return to_resolve, finished
+
+@app.cli.command('warm-cache')
+@click.argument('seed_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--checkpoint', 'checkpoint_file', default=None, help="Progress file (default: SEED_FILE.checkpoint). Run again with the same file to resume.")
+@click.option('--workers', default=None, type=int, help="Resolver workers for this run (default: sized from the upstream rate limits).")
+@click.option('--force', is_flag=True, help="Resolve artists again even if they are already cached.")
+@click.option('--report', 'report_file', default=None, help="Also write the coverage report as JSON to this file.")
+def warm_cache_command(seed_file, checkpoint_file, workers, force, report_file):
+    """Resolve a seed list (artist names or Spotify IDs, one per line) into the caches."""
+    seeds = read_seeds(seed_file)
+    checkpoint = WarmCheckpoint(checkpoint_file or f"{seed_file}.checkpoint")
+    pending = [seed for seed in seeds if not checkpoint.is_done(seed)]
+    print(f"{len(seeds)} seeds: {len(seeds) - len(pending)} already done, {len(pending)} to go.")
+
+    started = time.time()
+    if workers: background_resolver.scheduler.set_workers(workers)
+    futures = {}
+    try:
+        # One chunk at a time so the Wikipedia prefetch batches line up with the work in flight
+        for chunk in chunked(pending, WIKIPEDIA_BATCH_SIZE):
+            to_resolve, finished = warm_cache_targets(chunk, force)
+            for seed, outcome, details in finished:
+                checkpoint.record(seed, outcome, **details)
+            start_wikipedia_prefetch([artist_name for _, artist_name, _ in to_resolve])
+            # Lowest priority on the shared resolver queue, waiting for room when it is full. No overall
+            # budget: a long rate-limit queue is expected here. Timeouts and breakers still apply.
+            futures = {}
+            for seed, artist_name, spotify_data in to_resolve:
+                future = background_resolver.submit(artist_name, spotify_data, priority=WARM, block=True, budget=None)
+                futures.setdefault(future, []).append((seed, artist_name))  # two seeds may name one artist
+            for future in concurrent.futures.as_completed(futures):
+                for seed, artist_name in futures[future]:
+                    try:
+                        location_data = future.result()
+                    except Exception as e:  # includes being displaced by interactive work
+                        logger.warning("[Warm Cache] %s failed: %s", artist_name, str(e) or type(e).__name__)
+                        checkpoint.record(seed, 'error', name=artist_name, error=str(e) or type(e).__name__)
+                        continue
+                    if location_data and location_data.get('lat') is not None:
+                        checkpoint.record(seed, 'resolved', name=artist_name, located=True,
+                                          source=location_data.get('location_source'))
+                    elif location_data and location_data.get('partial'):
+                        # Retried on the next run, like any other error
+                        checkpoint.record(seed, 'error', name=artist_name, error='upstream unavailable')
+                    else:
+                        checkpoint.record(seed, 'negative', name=artist_name, located=False)
+            save_caches_to_disk()
+            report = checkpoint.report(seeds)
+            print(f"  {report['done']}/{report['seeds']} done, {report['located']} located, "
+                  f"{report['error']} errors ({time.time() - started:.0f}s)")
+    except KeyboardInterrupt:
+        print("Interrupted; run the same command again to resume.")
+        for future in futures: future.cancel()
+        save_caches_to_disk()
+        raise SystemExit(130)
+
+    report = checkpoint.report(seeds)
+    print(json.dumps(report, indent=2))
+    if report_file:
+        with open(report_file, 'w') as f: json.dump(report, f, indent=2)
 
 # --- Run the App ---
 if __name__ == '__main__':
     host = os.getenv('FLASK_RUN_HOST', '127.0.0.1')
     port = int(os.getenv('FLASK_RUN_PORT', '5000'))
     debug_mode = os.getenv('FLASK_DEBUG', 'True').lower() in ['true', '1', 't']
-    print(f"Starting Flask app on {host}:{port} (Debug: {debug_mode})")
+    logger.info("Starting Flask app on %s:%s (Debug: %s)", host, port, debug_mode)
     app.run(host=host, port=port, debug=debug_mode)
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Identity keys for the per-artist caches.
+
+The artist location and negative caches are keyed by a canonical artist
+key: ``spotify:artist:<id>`` when the Spotify artist ID is known, and
+``name:<normalized name>`` otherwise. Two artists who share a display name
+therefore no longer share an entry, and a renamed artist keeps its entry.
+
+An alias index, stored like any other cache namespace, maps
+``name:<normalized name>`` and ``mbid:<MusicBrainz ID>`` to the canonical
+key. It serves lookups that arrive without a Spotify ID: a cache-warming
+seed given by name, or the facet list. Names are normalized so that
+"Björk", "bjork" and "BJÖRK " are the same alias.
+
+Entries written before this were keyed by the raw display name. They are
+moved to their canonical key the first time they are read, so there is no
+migration step. An old entry is only moved onto a Spotify ID when it
+belongs to that ID, or records none: an entry written for another artist of
+the same name stays where it is.
+"""
+import re
+import unicodedata
+from datetime import datetime
+
+SPOTIFY_PREFIX = 'spotify:artist:'
+NAME_PREFIX = 'name:'
+MBID_PREFIX = 'mbid:'
+
+SPOTIFY_ARTIST_ID = re.compile(r'(?:open\.spotify\.com/artist/|spotify:artist:)([A-Za-z0-9]+)')
+
+
+def normalize_name(name):
+    """Case-, accent- and whitespace-insensitive form of an artist name."""
+    decomposed = unicodedata.normalize('NFKD', str(name))
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).casefold().split())
+
+
+def spotify_artist_id(spotify_data):
+    """Spotify artist ID from the artist's Spotify URL or URI, or None."""
+    for value in (spotify_data or {}).get('spotify_url'), (spotify_data or {}).get('uri'):
+        match = SPOTIFY_ARTIST_ID.search(value or '')
+        if match: return match.group(1)
+    return None
+
+
+def entry_spotify_id(entry):
+    """The Spotify ID a cache entry was written for, or None if it does not say."""
+    data = (entry or {}).get('data') or {}
+    return data.get('spotify_id') or spotify_artist_id(data)
+
+
+def name_key(name):
+    return NAME_PREFIX + normalize_name(name)
+
+
+def spotify_key(spotify_id):
+    return SPOTIFY_PREFIX + spotify_id
+
+
+def mbid_key(mbid):
+    return MBID_PREFIX + mbid
+
+
+def canonical_key(name, spotify_id=None):
+    """The key an artist's entries are written under."""
+    return spotify_key(spotify_id) if spotify_id else name_key(name)
+
+
+def display_name(key, entry):
+    """The artist name of a cache entry (legacy entries are keyed by it)."""
+    data = (entry or {}).get('data') or {}
+    name = data.get('name') or (data.get('location') or {}).get('name')
+    return name or (None if key.startswith((SPOTIFY_PREFIX, NAME_PREFIX)) else key)
+
+
+class ArtistKeys:
+    """Alias index (``name:`` / ``mbid:`` key -> canonical key) kept in a cache store."""
+
+    def __init__(self, aliases, on_move=None):
+        """``on_move(store, old_key, new_key, entry)`` is called after an entry has been moved."""
+        self.aliases = aliases
+        self.on_move = on_move
+        self.migrated = 0  # legacy or name-keyed entries moved to their canonical key
+
+    def lookup(self, alias):
+        entry = self.aliases.get(alias)
+        return entry['data'] if entry else None
+
+    def remember(self, key, name=None, mbid=None):
+        """Point the artist's name (and MBID, once known) at ``key``."""
+        for alias in (name_key(name) if name else None, mbid_key(mbid) if mbid else None):
+            if alias and self.lookup(alias) != key:
+                self.aliases[alias] = {'data': key, 'timestamp': datetime.now().isoformat()}
+
+    def candidates(self, name, spotify_id=None, mbid=None):
+        """Keys an entry for this artist may be stored under, canonical key first."""
+        keys = [canonical_key(name, spotify_id)]
+        for alias in (mbid_key(mbid) if mbid else None, name_key(name)):
+            target = alias and self.lookup(alias)
+            # Given an ID, a name alias for another Spotify ID is a different artist of the same name
+            if target and not (spotify_id and target.startswith(SPOTIFY_PREFIX)):
+                keys.append(target)
+        if spotify_id:
+            keys.append(name_key(name))  # resolved by name before the ID was known
+        keys.append(name)  # legacy: raw display name
+        return list(dict.fromkeys(keys))
+
+    def locate(self, store, name, spotify_id=None, mbid=None):
+        """The key this artist's entry in ``store`` has, moving one found under an old key first.
+
+        An old entry written for another Spotify ID is not this artist and is
+        skipped. Without ``spotify_id``, an old entry that records one moves to
+        that ID's key. Returns the canonical key when there is no entry yet.
+        """
+        if spotify_id and store.get(spotify_key(spotify_id)) is not None:
+            return spotify_key(spotify_id)  # the common case, without touching the alias index
+        candidates = self.candidates(name, spotify_id, mbid)
+        key = candidates[0]
+        if spotify_id is None:
+            # No ID given, but the name (or MBID) is known to belong to one
+            key = next((candidate for candidate in candidates if candidate.startswith(SPOTIFY_PREFIX)), key)
+        others = [candidate for candidate in candidates if candidate != key]
+        if not spotify_id and store.get(key) is not None:
+            return key
+        for old in others:
+            entry = store.get(old)
+            if entry is None:
+                continue
+            owner = entry_spotify_id(entry)
+            if spotify_id and owner and owner != spotify_id:
+                continue  # another artist of the same name; it keeps its entry
+            target = spotify_key(owner) if owner and not spotify_id else key
+            if store.get(target) is None:
+                store[target] = entry
+            store.pop(old)
+            self.remember(target, name, (entry.get('data') or {}).get('mbid'))
+            self.migrated += 1
+            if self.on_move:
+                self.on_move(store, old, target, store.get(target))
+            return target
+        return key
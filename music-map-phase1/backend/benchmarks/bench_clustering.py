@@ -0,0 +1,76 @@
+"""
+/artists/clusters index: build time, query time and payload size as the artist count grows.
+
+    python benchmarks/bench_clustering.py [--sizes 10000,100000,300000] [--output results.json]
+
+Synthetic artists: a third share the coordinates of a few big cities (as
+geocoded artists do), the rest are spread over the land-ish latitudes. Each
+size is queried with the same viewports (world, continent, country, city).
+Query time and payload should stay flat as the size grows.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from clustering import ClusterIndex  # noqa: E402
+
+CITIES = [(-0.1276, 51.5072), (-73.9857, 40.7484), (24.9384, 60.1699), (139.6917, 35.6895), (-43.1729, -22.9068)]
+VIEWPORTS = {  # name -> (bbox, zoom), roughly a 1600x900 px screen
+    'world': ((-180, -85, 180, 85), 1.5),
+    'europe': ((-25, 34, 45, 71), 3.5),
+    'finland': ((19, 59.5, 32, 70.5), 5),
+    'london': ((-0.35, 51.4, 0.15, 51.6), 11),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,300000')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"benchmark": "artist_clusters", "sizes": {}}
+    for size in (int(value) for value in args.sizes.split(',')):
+        rng = random.Random(size)
+        index = ClusterIndex()
+        started = time.perf_counter()
+        for i in range(size):
+            lon, lat = rng.choice(CITIES) if i % 3 == 0 else (rng.uniform(-180, 180), rng.uniform(-55, 70))
+            index.add(f"artist-{i}", lon, lat, {'name': f"Artist {i}", 'origin': None, 'image_url': None})
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(1000):  # incremental updates: a newly resolved artist, a moved one
+            index.add(f"artist-new-{i}", rng.uniform(-180, 180), rng.uniform(-55, 70), {'name': 'new'})
+            index.add(f"artist-{i}", rng.uniform(-180, 180), rng.uniform(-55, 70), {'name': 'moved'})
+        update_us = (time.perf_counter() - started) / 2000 * 1e6
+
+        queries = {}
+        for name, (bbox, zoom) in VIEWPORTS.items():
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                features = index.clusters(bbox, zoom)
+                timings.append(time.perf_counter() - started)
+            queries[name] = {
+                "features": len(features),
+                "payload_kb": round(len(json.dumps(features, separators=(',', ':'))) / 1024, 1),
+                "ms_p50": round(statistics.median(timings) * 1000, 3),
+            }
+        results["sizes"][size] = {"build_s": round(build, 2), "update_us": round(update_us, 1), "queries": queries}
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Gazetteer memory footprint and lookup latency.
+
+    python benchmarks/bench_gazetteer.py [--cities-file cities15000.txt] [--output results.json]
+
+Queries are the keys of cache/geocode_cache.json (real strings the app has
+geocoded) plus a few synthetic misses. Memory is measured with tracemalloc
+around ``Gazetteer.load``.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from gazetteer import Gazetteer, CITIES_FILE  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cities-file', default=CITIES_FILE)
+    parser.add_argument('--min-population', type=int, default=15000)
+    parser.add_argument('--rounds', type=int, default=2000, help="lookups per query")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    gazetteer = Gazetteer.load(cities_file=args.cities_file, min_population=args.min_population)
+    load_seconds = time.perf_counter() - started
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    with open(os.path.join(BACKEND_DIR, "cache", "geocode_cache.json")) as f:
+        queries = list(json.load(f).keys())
+    queries += ["Nowhere In Particular", "Springfield, Atlantis", "Los Angeles, CA", "FI"]
+
+    timings_us = []
+    hits = 0
+    for query in queries:
+        hits += gazetteer.lookup(query) is not None
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            gazetteer.lookup(query)
+        timings_us.append((time.perf_counter() - started) / args.rounds * 1e6)
+
+    results = {
+        "benchmark": "gazetteer",
+        "cities_file": os.path.basename(args.cities_file),
+        "places": len(gazetteer),
+        "load_seconds": round(load_seconds, 4),
+        "memory_bytes": memory_bytes,
+        "memory_bytes_per_place": round(memory_bytes / max(1, len(gazetteer)), 1),
+        "queries": len(queries),
+        "hit_ratio": round(hits / len(queries), 3),
+        "lookup_us_mean": round(statistics.mean(timings_us), 2),
+        "lookup_us_p50": round(statistics.median(timings_us), 2),
+        "lookup_us_max": round(max(timings_us), 2),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
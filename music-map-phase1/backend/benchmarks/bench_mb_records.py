@@ -0,0 +1,70 @@
+"""
+Full MusicBrainz payloads vs compact MBArtistRecord cache entries.
+
+    python benchmarks/bench_mb_records.py [--artists 20000] [--output results.json]
+
+The entries in cache/musicbrainz_cache.json are replicated up to
+``--artists`` and compared as stored JSON (bytes, dump and load time) and
+as in-memory objects (tracemalloc).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from musicbrainz_records import MBArtistRecord  # noqa: E402
+
+
+def measure(label, build):
+    tracemalloc.start()
+    objects = build()
+    memory_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    started = time.perf_counter()
+    blob = json.dumps(objects if label == "full" else [MBArtistRecord.encode(r) for r in objects])
+    dump_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    json.loads(blob)
+    load_seconds = time.perf_counter() - started
+    return {
+        "memory_bytes": memory_bytes,
+        "json_bytes": len(blob),
+        "dump_seconds": round(dump_seconds, 4),
+        "load_seconds": round(load_seconds, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--artists', type=int, default=20000)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "cache", "musicbrainz_cache.json")) as f:
+        payloads = [item['data'] for item in json.load(f).values() if item.get('data')]
+    blob = json.dumps(payloads)
+    sample = [payloads[i % len(payloads)] for i in range(args.artists)]
+
+    full = measure("full", lambda: [json.loads(json.dumps(p)) for p in sample])
+    compact = measure("compact", lambda: [MBArtistRecord.from_payload(p) for p in sample])
+    results = {
+        "benchmark": "mb_records",
+        "source_payloads": len(payloads),
+        "source_bytes": len(blob),
+        "artists": args.artists,
+        "full": full,
+        "compact": compact,
+        "ratio": {key: round(full[key] / max(compact[key], 1e-9), 1) for key in full},
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+"""
+Offline replay benchmark for the /top-artists location pipeline.
+
+    python benchmarks/bench_pipeline.py [--users 8] [--artists 30] [--latency musicbrainz=150,...]
+                                        [--error-rate musicbrainz=0.05,...] [--real-rate-limits] [--response-cache]
+                                        [--scenarios cold,warm,mixed,concurrent,memory,outage] [--output results.json]
+
+MusicBrainz, Wikipedia, Wikidata, Nominatim and Spotify are replaced by
+the local stubs in stub_upstreams.py (fixtures from cache/*.json, injectable
+latency and 429/503 errors); the app runs in-process through Flask's test
+client against a throwaway cache database. Scenarios:
+
+- cold:       a page of never-seen artists
+- warm:       the same page again, all cached
+- mixed:      half cached, half new
+- concurrent: N users at once, each with a page sharing some popular artists
+- memory:     many pages of new artists; traced Python memory and peak RSS per page
+- outage:     new pages while MusicBrainz answers 503 and Nominatim hangs, then
+              after they recover; stream time, artists left pending and breaker
+              states (not run by default: it waits out the upstream timeouts)
+
+For the stream it reports time to the first artist and to the whole page;
+for /top-artists, the response time and how many artists were pending.
+Upstream rate limits are lifted unless --real-rate-limits is given, so the
+numbers measure the pipeline itself rather than the politeness budget.
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stub_upstreams import SERVICES, Fixtures, StubState, start_stub_server  # noqa: E402
+
+DEFAULT_LATENCY_MS = {'musicbrainz': 150, 'wikipedia': 80, 'wikidata': 300, 'nominatim': 200, 'spotify': 100}
+RATE_LIMIT_NAMES = ('MUSICBRAINZ', 'NOMINATIM', 'WIKIPEDIA', 'WIKIDATA')
+
+
+def service_map(text, cast):
+    """``"musicbrainz=150,wikipedia=80"`` -> ``{"musicbrainz": 150.0, ...}``."""
+    values = {}
+    for item in filter(None, (text or '').split(',')):
+        service, _, value = item.partition('=')
+        if service.strip() not in SERVICES:
+            raise argparse.ArgumentTypeError(f"unknown service {service!r} (one of {', '.join(SERVICES)})")
+        values[service.strip()] = cast(value)
+    return values
+
+
+def configure_environment(base_url, workdir, real_rate_limits, response_cache):
+    """Point the app at the stubs and a throwaway cache; must run before ``import app``."""
+    if not response_cache:
+        # Scenarios change a user's artists between loads; measure the pipeline, not the response cache
+        os.environ['TOP_ARTISTS_RESPONSE_TTL_SECONDS'] = '0'
+    os.environ.update({
+        'MUSICBRAINZ_URL': base_url, 'NOMINATIM_URL': base_url, 'WIKIPEDIA_URL': base_url,
+        'WIKIDATA_URL': base_url, 'SPOTIFY_API_URL': f"{base_url}/v1/",
+        'CACHE_DB_FILE': os.path.join(workdir, 'cache.sqlite3'),
+        'SESSION_DB_FILE': os.path.join(workdir, 'sessions.sqlite3'),
+        'FLASK_SECRET_KEY': 'benchmark', 'LOG_LEVEL': os.getenv('LOG_LEVEL', 'WARNING'),
+    })
+    if not real_rate_limits:
+        for name in RATE_LIMIT_NAMES:
+            os.environ.setdefault(f'RATE_LIMIT_{name}', '1000')
+            os.environ.setdefault(f'RATE_BURST_{name}', '100')
+    os.chdir(workdir)  # SESSION_BACKEND=filesystem would write its session files to the working directory
+
+
+class ArtistPool:
+    """Endless supply of distinct artist names ("Name (k)") backed by the fixtures."""
+
+    def __init__(self, fixtures):
+        self.base_names = fixtures.artist_names
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def take(self, count):
+        with self._lock:
+            start, self._next = self._next, self._next + count
+        return [f"{self.base_names[i % len(self.base_names)]} ({i // len(self.base_names) + 1})"
+                for i in range(start, start + count)]
+
+
+class User:
+    def __init__(self, flask_app, state, token):
+        self.client = flask_app.test_client()
+        self.state = state
+        self.token = token
+        with self.client.session_transaction() as sess:
+            sess['token_info'] = {'access_token': token, 'refresh_token': 'unused', 'token_type': 'Bearer',
+                                  'expires_at': int(time.time()) + 7 * 86400, 'scope': 'user-top-read'}
+
+    def set_top_artists(self, names):
+        self.state.user_artists[self.token] = names
+
+    def stream(self):
+        """Load /top-artists/stream: seconds to the first artist and to the end, artists received."""
+        started = time.perf_counter()
+        response = self.client.get('/top-artists/stream', buffered=False)
+        first = None
+        count = pending = 0
+        for chunk in response.response:
+            for line in (chunk.decode() if isinstance(chunk, bytes) else chunk).splitlines():
+                event = json.loads(line) if line else {}
+                if event.get('event') == 'artist':
+                    count += 1
+                    if first is None:
+                        first = time.perf_counter() - started
+                elif event.get('event') == 'end':
+                    pending = len(event.get('pending', []))
+        response.close()
+        return {'first_artist_s': first, 'complete_s': time.perf_counter() - started, 'artists': count,
+                'pending': pending}
+
+    def page(self):
+        """Load /top-artists (cache-only answer): response seconds, artists returned and pending."""
+        started = time.perf_counter()
+        payload = self.client.get('/top-artists').get_json()
+        return {'response_s': time.perf_counter() - started,
+                'artists': len(payload.get('artists', [])), 'pending': len(payload.get('pending', []))}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def rounded(result):
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in result.items()}
+
+
+def measured(state, fn):
+    """Run ``fn`` and attach the upstream requests it caused."""
+    state.reset_counters()
+    result = rounded(fn())
+    result['upstream'] = state.counters()
+    return result
+
+
+def run_cold_warm_mixed(flask_app, state, pool, artists):
+    user = User(flask_app, state, 'user-single')
+    results = {}
+    page = pool.take(artists)
+    user.set_top_artists(page)
+    results['cold'] = measured(state, user.stream)
+    results['warm'] = measured(state, user.stream)
+    results['warm_top_artists'] = measured(state, user.page)
+    user.set_top_artists(page[:artists // 2] + pool.take(artists - artists // 2))
+    results['mixed'] = measured(state, user.stream)
+    user.set_top_artists(page[:artists // 2] + pool.take(artists - artists // 2))
+    results['mixed_top_artists'] = measured(state, user.page)
+    return results
+
+
+def run_concurrent(flask_app, state, pool, users, artists, shared_fraction=0.3):
+    shared = pool.take(int(artists * shared_fraction))  # popular artists every user has
+    clients = []
+    for index in range(users):
+        user = User(flask_app, state, f'user-{index}')
+        user.set_top_artists(shared + pool.take(artists - len(shared)))
+        clients.append(user)
+
+    samples, barrier = [None] * users, threading.Barrier(users)
+
+    def load(index):
+        barrier.wait()
+        samples[index] = clients[index].stream()
+
+    state.reset_counters()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=load, args=(index,)) for index in range(users)]
+    for thread in threads: thread.start()
+    for thread in threads: thread.join()
+    elapsed = time.perf_counter() - started
+
+    complete = [sample['complete_s'] for sample in samples]
+    first = [sample['first_artist_s'] for sample in samples if sample['first_artist_s'] is not None]
+    located = sum(sample['artists'] for sample in samples)
+    return {
+        'users': users, 'artists_per_user': artists, 'shared_artists': len(shared),
+        'wall_s': round(elapsed, 3),
+        'pages_per_s': round(users / elapsed, 3),
+        'artists_located_per_s': round(located / elapsed, 2),
+        'complete_s_p50': round(statistics.median(complete), 3),
+        'complete_s_p95': round(percentile(complete, 0.95), 3),
+        'first_artist_s_p50': round(statistics.median(first), 3) if first else None,
+        'upstream': state.counters(),
+    }
+
+
+def run_memory(flask_app, state, pool, artists, pages):
+    user = User(flask_app, state, 'user-memory')
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    timeline = []
+    for number in range(1, pages + 1):
+        user.set_top_artists(pool.take(artists))
+        user.stream()
+        current, peak = tracemalloc.get_traced_memory()
+        timeline.append({
+            'page': number, 'artists_seen': number * artists,
+            'traced_mb': round((current - baseline) / 2**20, 2), 'traced_peak_mb': round((peak - baseline) / 2**20, 2),
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+    tracemalloc.stop()
+    half = timeline[len(timeline) // 2]
+    last = timeline[-1]
+    growth = (last['traced_mb'] - half['traced_mb']) / max(1, last['artists_seen'] - half['artists_seen'])
+    return {'pages': pages, 'artists_per_page': artists,
+            'traced_kb_per_artist_second_half': round(growth * 1024, 3), 'timeline': timeline}
+
+
+def run_outage(flask_app, state, pool, artists, music_map, hang_ms=60000):
+    """Cold pages during an incident: the first one opens the breakers, later ones should fail fast."""
+    user = User(flask_app, state, 'user-outage')
+    saved = dict(state.error_rate), dict(state.latency_ms)
+    state.error_rate['musicbrainz'] = 1.0
+    state.latency_ms['nominatim'] = hang_ms
+    results = {}
+    try:
+        for number in (1, 2):
+            user.set_top_artists(pool.take(artists))
+            results[f'page_{number}'] = measured(state, user.stream)
+        results['circuits'] = {host: breaker.stats()['state'] for host, breaker in music_map.upstream_breakers.items()}
+    finally:
+        state.error_rate.update(saved[0])
+        state.latency_ms.update(saved[1])
+    time.sleep(music_map.CIRCUIT_RESET_SECONDS)  # until the breakers let a probe through
+    user.set_top_artists(pool.take(artists))
+    results['recovered'] = measured(state, user.stream)
+    results['circuits_after'] = {host: breaker.stats()['state'] for host, breaker in music_map.upstream_breakers.items()}
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=8, help="concurrent users in the concurrent scenario")
+    parser.add_argument('--artists', type=int, default=30, help="artists per page (Spotify returns up to 30)")
+    parser.add_argument('--memory-pages', type=int, default=20)
+    parser.add_argument('--latency', type=lambda text: service_map(text, float), default={},
+                        help="per-service stub latency in ms, e.g. musicbrainz=150,nominatim=200")
+    parser.add_argument('--error-rate', type=lambda text: service_map(text, float), default={},
+                        help="per-service fraction of 429/503 answers, e.g. musicbrainz=0.05")
+    parser.add_argument('--real-rate-limits', action='store_true', help="keep the app's upstream rate limits")
+    parser.add_argument('--response-cache', action='store_true', help="keep the per-user /top-artists response cache on")
+    parser.add_argument('--scenarios', default='cold,warm,mixed,concurrent,memory')
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+    scenarios = set(args.scenarios.split(','))
+    output = os.path.abspath(args.output) if args.output else None  # resolved before the chdir below
+
+    latency = {**DEFAULT_LATENCY_MS, **args.latency}
+    fixtures = Fixtures()
+    state = StubState(fixtures, latency_ms=latency, error_rate=args.error_rate)
+    server, base_url = start_stub_server(state)
+    workdir = tempfile.mkdtemp(prefix='music-map-bench-')
+    configure_environment(base_url, workdir, args.real_rate_limits, args.response_cache)
+
+    import app as music_map  # noqa: E402  (reads the environment set above)
+    flask_app = music_map.app
+    pool = ArtistPool(fixtures)
+
+    results = {
+        "benchmark": "pipeline_replay",
+        "revision": git_revision(),
+        "timestamp": int(time.time()),
+        "config": {
+            "latency_ms": latency, "error_rate": state.error_rate, "real_rate_limits": args.real_rate_limits,
+            "artists_per_page": args.artists, "fixture_artists": len(fixtures.artist_names),
+            "resolution_mode": music_map.RESOLUTION_MODE, "mb_lookup": music_map.MB_LOOKUP,
+            "wiki_extraction": music_map.WIKI_EXTRACTION, "wiki_batch_prefetch": music_map.WIKI_BATCH_PREFETCH,
+            "request_budget_s": music_map.REQUEST_BUDGET_SECONDS, "upstream_timeout_s": music_map.UPSTREAM_TIMEOUT_SECONDS,
+            "resolver_workers": music_map.RESOLVER_WORKERS,
+            "prefetch_time_ranges": music_map.PREFETCH_TIME_RANGES,
+        },
+    }
+    try:
+        if scenarios & {'cold', 'warm', 'mixed'}:
+            results.update(run_cold_warm_mixed(flask_app, state, pool, args.artists))
+        if 'concurrent' in scenarios:
+            results['concurrent'] = run_concurrent(flask_app, state, pool, args.users, args.artists)
+        if 'memory' in scenarios:
+            results['memory'] = run_memory(flask_app, state, pool, args.artists, args.memory_pages)
+        if 'outage' in scenarios:
+            results['outage'] = run_outage(flask_app, state, pool, args.artists, music_map)
+        results['caches'] = {name: cache.stats() for name, cache in music_map.all_caches().items()
+                             if hasattr(cache, 'stats')}
+    finally:
+        server.shutdown()
+
+    print(json.dumps(results, indent=2))
+    if output:
+        with open(output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
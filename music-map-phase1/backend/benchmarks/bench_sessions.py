@@ -0,0 +1,131 @@
+"""
+Per-request session overhead: Flask-Session filesystem vs. SQLite vs. signed cookie.
+
+    python benchmarks/bench_sessions.py [--users 200] [--requests 50] [--threads 4]
+                                        [--refresh-every 20] [--output results.json]
+
+Each backend serves a minimal Flask app with a route that reads the token
+fields the way get_token does. Every ``--refresh-every`` requests the route
+rewrites them instead, as a token refresh does. ``--users`` clients log in
+and then make ``--requests`` requests each, from ``--threads`` threads. The
+report gives per-request latency and what is left on disk afterwards.
+"""
+import argparse
+import json
+import os
+import secrets
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from flask import Flask, session
+from flask_session import Session
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from session_store import SQLiteSessionInterface  # noqa: E402
+
+BACKENDS = ('filesystem', 'sqlite', 'cookie')
+
+
+def token_fields():
+    return {'access_token': secrets.token_urlsafe(200), 'refresh_token': secrets.token_urlsafe(100),
+            'expires_at': int(time.time()) + 3600}
+
+
+def make_app(backend, workdir):
+    app = Flask(__name__)
+    app.secret_key = 'benchmark'
+    if backend == 'filesystem':
+        app.config.update(SESSION_TYPE='filesystem', SESSION_FILE_DIR=os.path.join(workdir, 'flask_session'))
+        Session(app)
+    elif backend == 'sqlite':
+        app.session_interface = SQLiteSessionInterface(os.path.join(workdir, 'sessions.sqlite3'))
+
+    @app.route('/login')
+    def login():
+        session['token_info'] = token_fields()
+        return 'ok'
+
+    @app.route('/token')
+    def token():
+        return 'ok' if session.get('token_info', {}).get('access_token') else ('no session', 401)
+
+    @app.route('/refresh')
+    def refresh():
+        session['token_info'] = token_fields()
+        return 'ok'
+
+    return app
+
+
+def disk_usage(workdir):
+    files = [os.path.join(root, name) for root, _, names in os.walk(workdir) for name in names]
+    return {'files': len(files), 'bytes': sum(os.path.getsize(path) for path in files)}
+
+
+def run_backend(backend, users, requests_per_user, threads, refresh_every):
+    workdir = tempfile.mkdtemp(prefix=f'sessions-{backend}-')
+    app = make_app(backend, workdir)
+    timings, cookie_sizes, lock = [], [], threading.Lock()
+
+    def user_session(count):
+        for _ in range(count):
+            client = app.test_client()
+            client.get('/login')
+            cookie = client.get_cookie('session')
+            local = []
+            for number in range(1, requests_per_user + 1):
+                path = '/refresh' if refresh_every and number % refresh_every == 0 else '/token'
+                started = time.perf_counter()
+                response = client.get(path)
+                local.append(time.perf_counter() - started)
+                assert response.status_code == 200, (backend, response.status_code)
+            with lock:
+                timings.extend(local)
+                cookie_sizes.append(len(cookie.value) if cookie else 0)
+
+    per_thread = [users // threads + (1 if index < users % threads else 0) for index in range(threads)]
+    started = time.perf_counter()
+    workers = [threading.Thread(target=user_session, args=(count,)) for count in per_thread]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'requests_per_s': round(len(timings) / elapsed, 1),
+        'us_mean': round(statistics.mean(timings) * 1e6, 1),
+        'us_p50': round(timings[len(timings) // 2] * 1e6, 1),
+        'us_p95': round(timings[int(len(timings) * 0.95)] * 1e6, 1),
+        'cookie_bytes': round(statistics.mean(cookie_sizes)),
+        'disk_after': disk_usage(workdir),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=50, help="requests per user after logging in")
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--refresh-every', type=int, default=20, help="every Nth request rewrites the token (0: never)")
+    parser.add_argument('--backends', default=','.join(BACKENDS))
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {"benchmark": "session_backends", "users": args.users, "requests_per_user": args.requests,
+               "threads": args.threads, "refresh_every": args.refresh_every, "backends": {}}
+    for backend in args.backends.split(','):
+        results["backends"][backend] = run_backend(backend, args.users, args.requests, args.threads, args.refresh_every)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Wikipedia origin extraction: rendered HTML + BeautifulSoup vs. lead-section wikitext.
+
+    python benchmarks/bench_wikipedia.py [--limit 40] [--output results.json]
+
+Fetches each artist in cache/wikipedia_cache.json both ways from the live
+site (one keep-alive session, ~5 req/s) and reports response bytes, fetch
+time and parse time per path, plus how often the two paths agree.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+import requests
+from bs4 import BeautifulSoup
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from wiki_infobox import origin_from_wikitext  # noqa: E402
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = f"MusicGeoMapApp/0.1 ({os.getenv('CONTACT_EMAIL', 'default@example.com')}) benchmark"
+
+
+def html_origin(text):
+    """The app's HTML path (infobox row scan), without logging."""
+    soup = BeautifulSoup(text, 'html.parser')
+    infobox = soup.find('table', class_=re.compile(r'\binfobox\b', re.IGNORECASE))
+    if not infobox:
+        return None
+    for row in infobox.find_all('tr'):
+        header, value_cell = row.find('th'), row.find('td')
+        if header and value_cell and header.get_text(strip=True).lower() in \
+                ['origin', 'born', 'birth place', 'hometown', 'founded', 'location']:
+            cleaned = re.sub(r'\s*\[\d+\]', '', value_cell.get_text(separator=' ', strip=True)).strip()
+            candidate = cleaned.split('\n')[0].split('(')[0].strip().strip(',. ')
+            if len(candidate) > 2:
+                return candidate
+    return None
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def summarize(samples):
+    return {
+        "bytes_mean": round(statistics.mean(s["bytes"] for s in samples)),
+        "fetch_ms_mean": round(statistics.mean(s["fetch"] for s in samples) * 1000, 1),
+        "parse_ms_mean": round(statistics.mean(s["parse"] for s in samples) * 1000, 3),
+        "parse_ms_p50": round(statistics.median(s["parse"] for s in samples) * 1000, 3),
+        "found": sum(1 for s in samples if s["origin"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--limit', type=int, default=40)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    with open(os.path.join(BACKEND_DIR, "cache", "wikipedia_cache.json")) as f:
+        names = list(json.load(f).keys())[:args.limit]
+
+    session = requests.Session()
+    session.headers['User-Agent'] = USER_AGENT
+    html_samples, wikitext_samples, agree = [], [], 0
+    for name in names:
+        response, fetch = timed(session.get, f"https://en.wikipedia.org/wiki/{name.replace(' ', '_')}")
+        origin, parse = timed(html_origin, response.text) if response.ok else (None, 0.0)
+        html_samples.append({"bytes": len(response.content), "fetch": fetch, "parse": parse, "origin": origin})
+
+        response, fetch = timed(session.get, API_URL, params={
+            'action': 'parse', 'page': name, 'prop': 'wikitext', 'section': 0,
+            'redirects': 1, 'format': 'json', 'formatversion': 2})
+        wikitext = response.json().get('parse', {}).get('wikitext', '') if response.ok else ''
+        found, parse = timed(origin_from_wikitext, wikitext)
+        wikitext_origin = found[1] if found else None
+        wikitext_samples.append({"bytes": len(response.content), "fetch": fetch, "parse": parse, "origin": wikitext_origin})
+
+        agree += (origin or '').casefold() == (wikitext_origin or '').casefold()
+        time.sleep(0.2)
+
+    results = {
+        "benchmark": "wikipedia_extraction",
+        "artists": len(names),
+        "html": summarize(html_samples),
+        "wikitext": summarize(wikitext_samples),
+        "same_origin": agree,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f: json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
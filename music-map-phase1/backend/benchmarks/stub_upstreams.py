@@ -0,0 +1,314 @@
+"""
+Local stand-ins for MusicBrainz, Wikipedia, Wikidata, Nominatim and Spotify.
+
+One threaded HTTP server answers all five APIs from fixtures built out of
+the app's own cache files (cache/*.json), so a benchmark replays realistic
+data without touching the network:
+
+- MusicBrainz WS/2 (XML): artist search, artist lookup, URL lookup
+- Wikipedia: action=parse (lead wikitext), action=query (titles -> items), /wiki/ pages
+- Wikidata: /sparql origin query
+- Nominatim: /search
+- Spotify: /v1/me, /v1/me/top/artists, paged (the artists for each user, for every time range or
+  per range, are set by the benchmark)
+
+Any number of distinct artists can be served: "Name (3)" is answered with
+the fixture for "Name". Per-service latency and a 429/503 error rate can be
+injected.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.sax.saxutils import escape, quoteattr
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BACKEND_DIR, "cache")
+
+SERVICES = ('musicbrainz', 'wikipedia', 'wikidata', 'nominatim', 'spotify')
+MB_NS = 'xmlns="http://musicbrainz.org/ns/mmd-2.0#" xmlns:ns2="http://musicbrainz.org/ns/ext#-2.0"'
+_VARIANT = re.compile(r'^(.*?) \((\d+)\)$')
+
+
+def _load(name):
+    path = os.path.join(CACHE_DIR, name)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {key: entry.get('data') for key, entry in json.load(f).items() if isinstance(entry, dict)}
+
+
+def _stable_fraction(text):
+    return int(hashlib.md5(text.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+class Fixtures:
+    """Recorded upstream answers keyed by base artist name / place string."""
+
+    def __init__(self):
+        self.musicbrainz = {}
+        for name, data in _load("musicbrainz_cache.json").items():
+            if not data:
+                continue
+            if data.get('v'):  # compact MBArtistRecord layout
+                self.musicbrainz[name.casefold()] = {
+                    'country': data.get('country'), 'area': data.get('area'), 'begin_area': data.get('begin_area')}
+            else:
+                self.musicbrainz[name.casefold()] = {
+                    'country': data.get('country'), 'area': (data.get('area') or {}).get('name'),
+                    'begin_area': (data.get('begin-area') or {}).get('name')}
+        self.wikipedia = {name.casefold(): origin for name, origin in _load("wikipedia_cache.json").items() if origin}
+        self.geocode = {place.casefold(): coords for place, coords in _load("geocode_cache.json").items() if coords}
+        artists = _load("artist_location_cache.json")
+        self.artist_names = sorted(set(artists) | {name for name in _load("musicbrainz_cache.json")})
+        self.genres = {name: (data or {}).get('genres', []) for name, data in artists.items()}
+
+    @staticmethod
+    def base_name(name):
+        match = _VARIANT.match(name)
+        return match.group(1) if match else name
+
+    def coords(self, place):
+        found = self.geocode.get(place.casefold())
+        if found:
+            return found['lat'], found['lon']
+        fraction = _stable_fraction(place)
+        if fraction < 0.15:
+            return None  # some places are just not found
+        return round(fraction * 140 - 60, 5), round(_stable_fraction(place[::-1]) * 360 - 180, 5)
+
+
+class StubState:
+    """Mutable server state: injected faults, per-user top artists, request counters."""
+
+    def __init__(self, fixtures, latency_ms=None, error_rate=None, url_relation_ratio=0.7, seed=1):
+        self.fixtures = fixtures
+        self.latency_ms = {service: 0 for service in SERVICES}
+        self.latency_ms.update(latency_ms or {})
+        self.error_rate = {service: 0.0 for service in SERVICES}
+        self.error_rate.update(error_rate or {})
+        self.url_relation_ratio = url_relation_ratio
+        self.user_artists = {}     # bearer token -> [artist names]
+        self._ids = {}             # MBID / Spotify ID / QID -> artist name
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.requests = {service: 0 for service in SERVICES}
+        self.errors = {service: 0 for service in SERVICES}
+
+    def remember(self, kind, name):
+        key = {'mbid': lambda: str(uuid.uuid5(uuid.NAMESPACE_URL, 'mb:' + name)),
+               'spotify': lambda: hashlib.md5(('sp:' + name).encode()).hexdigest()[:22],
+               'qid': lambda: 'Q' + str(int(hashlib.md5(('wd:' + name).encode()).hexdigest()[:7], 16))}[kind]()
+        with self._lock:
+            self._ids[key] = name
+        return key
+
+    def lookup_id(self, key):
+        with self._lock:
+            return self._ids.get(key)
+
+    def should_fail(self, service):
+        with self._lock:
+            self.requests[service] += 1
+            fail = self._random.random() < self.error_rate[service]
+            if fail:
+                self.errors[service] += 1
+            return fail
+
+    def counters(self):
+        with self._lock:
+            return {'requests': dict(self.requests), 'injected_errors': dict(self.errors)}
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = {service: 0 for service in SERVICES}
+            self.errors = {service: 0 for service in SERVICES}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real services
+    state = None  # set by start_stub_server
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        if path.startswith('/ws/2/'):
+            service, handler = 'musicbrainz', self._musicbrainz
+        elif path == '/w/api.php' or path.startswith('/wiki/'):
+            service, handler = 'wikipedia', self._wikipedia
+        elif path == '/sparql':
+            service, handler = 'wikidata', self._wikidata
+        elif path == '/search':
+            service, handler = 'nominatim', self._nominatim
+        elif path.startswith('/v1/'):
+            service, handler = 'spotify', self._spotify
+        else:
+            return self._send(404, 'text/plain', 'unknown endpoint')
+
+        latency = self.state.latency_ms[service]
+        if latency:
+            time.sleep(latency / 1000 * (0.5 + self.state._random.random()))  # +/-50% jitter
+        if self.state.should_fail(service):
+            status = 429 if self.state._random.random() < 0.5 else 503
+            return self._send(status, 'text/plain', 'injected failure', {'Retry-After': '1'})
+        handler(path, query)
+
+    def _send(self, status, content_type, body, headers=None):
+        data = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _json(self, payload, status=200):
+        self._send(status, 'application/json', json.dumps(payload))
+
+    # --- MusicBrainz (XML) ---
+    def _mb_artist_xml(self, name, mbid, score=None, with_rels=False):
+        record = self.state.fixtures.musicbrainz.get(Fixtures.base_name(name).casefold(), {})
+        parts = [f'<artist id={quoteattr(mbid)} type="Group"' + (f' ns2:score="{score}"' if score else '') + '>',
+                 f'<name>{escape(name)}</name><sort-name>{escape(name)}</sort-name>']
+        if record.get('country'):
+            parts.append(f'<country>{escape(record["country"])}</country>')
+        for tag, key in (('area', 'area'), ('begin-area', 'begin_area')):
+            if record.get(key):
+                area_id = str(uuid.uuid5(uuid.NAMESPACE_URL, 'area:' + record[key]))
+                parts.append(f'<{tag} id="{area_id}"><name>{escape(record[key])}</name></{tag}>')
+        if with_rels:
+            qid = self.state.remember('qid', name)
+            parts.append('<relation-list target-type="url"><relation type="wikidata">'
+                         f'<target>https://www.wikidata.org/wiki/{qid}</target></relation></relation-list>')
+        parts.append('</artist>')
+        return ''.join(parts)
+
+    def _musicbrainz(self, path, query):
+        xml = None
+        if path.rstrip('/') == '/ws/2/artist' and 'query' in query:
+            match = re.search(r'artist:\((.*)\)', query['query'])
+            name = re.sub(r'\\(.)', r'\1', match.group(1) if match else query['query']).strip()
+            if Fixtures.base_name(name).casefold() in self.state.fixtures.musicbrainz:
+                mbid = self.state.remember('mbid', name)
+                xml = f'<artist-list count="1" offset="0">{self._mb_artist_xml(name, mbid, score=100)}</artist-list>'
+            else:
+                xml = '<artist-list count="0" offset="0"></artist-list>'
+        elif path.startswith('/ws/2/artist/'):
+            mbid = path.rsplit('/', 1)[-1]
+            name = self.state.lookup_id(mbid)
+            if name:
+                xml = self._mb_artist_xml(name, mbid, with_rels=True)
+        elif path.rstrip('/') == '/ws/2/url' and 'resource' in query:
+            name = self.state.lookup_id(query['resource'].rsplit('/', 1)[-1])
+            if name and _stable_fraction('rel:' + name) < self.state.url_relation_ratio:
+                mbid = self.state.remember('mbid', name)
+                xml = (f'<url id="{uuid.uuid5(uuid.NAMESPACE_URL, query["resource"])}">'
+                       f'<resource>{escape(query["resource"])}</resource>'
+                       '<relation-list target-type="artist"><relation type="free streaming">'
+                       f'<target>{mbid}</target><artist id="{mbid}"><name>{escape(name)}</name>'
+                       f'<sort-name>{escape(name)}</sort-name></artist></relation></relation-list></url>')
+        if xml is None:
+            return self._send(404, 'application/xml', f'<?xml version="1.0"?><error><text>Not Found</text></error>')
+        self._send(200, 'application/xml', f'<?xml version="1.0" encoding="UTF-8"?><metadata {MB_NS}>{xml}</metadata>')
+
+    # --- Wikipedia / Wikidata ---
+    def _origin(self, title):
+        return self.state.fixtures.wikipedia.get(Fixtures.base_name(title.replace('_', ' ')).casefold())
+
+    def _wikipedia(self, path, query):
+        if path.startswith('/wiki/'):
+            title = unquote(path[len('/wiki/'):])
+            origin = self._origin(title)
+            if origin is None:
+                return self._send(404, 'text/html', '<html><body>No article</body></html>')
+            return self._send(200, 'text/html', '<html><body><table class="infobox">'
+                              f'<tr><th>Origin</th><td>{escape(origin)}</td></tr></table></body></html>')
+        if query.get('action') == 'parse':
+            origin = self._origin(query.get('page', ''))
+            if origin is None:
+                return self._json({'error': {'code': 'missingtitle', 'info': "The page you specified doesn't exist."}})
+            wikitext = (f"{{{{Infobox musical artist\n| name = {query['page']}\n| origin = [[{origin}]]\n"
+                        "| genre = {{hlist|[[Indie pop]]|[[Rock music|Rock]]}}\n}}\n'''" + query['page'] + "''' is ...")
+            return self._json({'parse': {'title': query['page'], 'pageid': 1, 'wikitext': wikitext}})
+        if query.get('action') == 'query':
+            pages = []
+            for title in query.get('titles', '').split('|'):
+                if self._origin(title) is None:
+                    pages.append({'ns': 0, 'title': title, 'missing': True})
+                else:
+                    pages.append({'pageid': 1, 'ns': 0, 'title': title,
+                                  'pageprops': {'wikibase_item': self.state.remember('qid', title)}})
+            return self._json({'batchcomplete': True, 'query': {'pages': pages}})
+        self._json({'error': {'code': 'badvalue'}}, status=400)
+
+    def _wikidata(self, path, query):
+        bindings = []
+        for qid in re.findall(r'wd:(Q\d+)', query.get('query', '')):
+            name = self.state.lookup_id(qid)
+            origin = self._origin(name) if name else None
+            if not origin:
+                continue
+            row = {'item': {'type': 'uri', 'value': f'http://www.wikidata.org/entity/{qid}'},
+                   'prop': {'type': 'uri', 'value': 'http://www.wikidata.org/prop/direct/P740'},
+                   'placeLabel': {'type': 'literal', 'value': origin}}
+            coords = self.state.fixtures.coords(origin)
+            if coords:
+                row['coord'] = {'type': 'literal', 'value': f'Point({coords[1]} {coords[0]})'}
+            bindings.append(row)
+        self._json({'head': {'vars': ['item', 'prop', 'placeLabel', 'countryLabel', 'coord']},
+                    'results': {'bindings': bindings}})
+
+    # --- Nominatim ---
+    def _nominatim(self, path, query):
+        place = query.get('q', '')
+        coords = self.state.fixtures.coords(place)
+        if not coords:
+            return self._json([])
+        self._json([{'place_id': 1, 'lat': str(coords[0]), 'lon': str(coords[1]), 'display_name': place,
+                     'class': 'place', 'type': 'city', 'importance': 0.5}])
+
+    # --- Spotify ---
+    def _spotify(self, path, query):
+        token = self.headers.get('Authorization', '').replace('Bearer ', '')
+        if path.rstrip('/') == '/v1/me':
+            return self._json({'id': token, 'display_name': token, 'type': 'user'})
+        if path.rstrip('/') != '/v1/me/top/artists':
+            return self._json({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+        names = self.state.user_artists.get(token, [])
+        if isinstance(names, dict):  # per time range
+            names = names.get(query.get('time_range', 'medium_term'), [])
+        offset, limit = int(query.get('offset', 0)), int(query.get('limit', 20))
+        total, names = len(names), names[offset:offset + limit]
+        items = []
+        for name in names:
+            spotify_id = self.state.remember('spotify', name)
+            items.append({
+                'id': spotify_id, 'name': name, 'type': 'artist', 'uri': f'spotify:artist:{spotify_id}',
+                'external_urls': {'spotify': f'https://open.spotify.com/artist/{spotify_id}'},
+                'genres': self.state.fixtures.genres.get(Fixtures.base_name(name), []),
+                'images': [{'url': f'https://i.scdn.co/image/{spotify_id}', 'height': 160, 'width': 160}],
+                'popularity': 50,
+            })
+        more = offset + limit < total
+        self._json({'items': items, 'total': total, 'limit': limit, 'offset': offset,
+                    'next': f'{path}?offset={offset + limit}&limit={limit}' if more else None})
+
+
+def start_stub_server(state, host='127.0.0.1', port=0):
+    """Serve ``state`` on a background thread; returns (server, base URL)."""
+    handler = type('BoundStubHandler', (StubHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='stub-upstreams', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
@@ -0,0 +1,436 @@
+"""
+Persistent key/value stores behind the location caches in app.py.
+
+Every store behaves like the plain dicts the caches used to be
+(``get``, ``[]``, ``in``, ``items``...) and holds entries shaped as
+``{"data": ..., "timestamp": ...}`` so ``timed_cache`` does not care which
+backend it talks to.
+
+- ``JsonFileStore``: the original behaviour, one dict per JSON file that is
+  rewritten in full on ``flush()`` (to a temporary file that then replaces
+  it, so a crash mid-write leaves the previous file intact).
+- ``SQLiteStore``: one namespace inside a shared SQLite database in WAL mode.
+  Writes are per-key upserts committed immediately, reads are primary-key
+  lookups, and several worker processes can share the same file.
+- ``LRUFrontCache``: a bounded in-memory tier in front of another store,
+  holding the most recently used entries with their timestamps pre-parsed.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def entry_epoch(entry):
+    """Seconds since the epoch of an entry's ISO ``timestamp``, or None if missing/invalid."""
+    try:
+        return datetime.fromisoformat(entry['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class CacheStore(ABC):
+    """Dict-like interface shared by all cache backends."""
+
+    @abstractmethod
+    def get(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def __setitem__(self, key, entry):
+        ...
+
+    @abstractmethod
+    def __delitem__(self, key):
+        ...
+
+    @abstractmethod
+    def items(self):
+        ...
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    def __getitem__(self, key):
+        entry = self.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def pop(self, key, default=None):
+        entry = self.get(key)
+        if entry is None:
+            return default
+        del self[key]
+        return entry
+
+    def clear(self):
+        for key in self.keys():
+            del self[key]
+
+    def get_fresh(self, key, max_age_seconds):
+        """The entry for ``key`` if it is younger than ``max_age_seconds``, else None."""
+        entry = self.get(key)
+        if entry is None:
+            return None
+        stored = entry_epoch(entry)
+        return entry if stored is not None and stored + max_age_seconds > time.time() else None
+
+    def flush(self):
+        """Persist pending writes. A no-op for stores that write through."""
+
+
+class JsonFileStore(CacheStore):
+    """In-memory dict persisted as a single JSON file (legacy behaviour)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = load_json_file(path)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # one flush at a time
+        self._version = 0                    # bumped on every change
+        self._saved_version = 0
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._version += 1
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+            self._version += 1
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._version += 1
+
+    def flush(self):
+        """Write the file if anything changed since the last flush."""
+        with self._write_lock:
+            with self._lock:
+                if self._version == self._saved_version:
+                    return
+                snapshot, version = dict(self._data), self._version
+            directory = os.path.dirname(os.path.abspath(self.path))
+            try:
+                fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path), suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'w') as f:
+                        json.dump(snapshot, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+                self._saved_version = version
+            except Exception as e: logger.error("Error saving cache to %s: %s", self.path, e)
+
+
+class SQLiteCacheDatabase:
+    """Shared SQLite file holding every cache namespace.
+
+    Connections are opened per thread because sqlite3 connections cannot be
+    shared across threads; WAL mode lets readers proceed while another
+    thread or process is writing.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entries (
+            namespace TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_cache_entries_timestamp
+            ON cache_entries (namespace, timestamp);
+    """
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.created = not os.path.exists(path)
+        self._local = threading.local()
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: autocommit, explicit BEGIN for batches
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout_ms)}')
+            self._local.conn = conn
+        return conn
+
+    def store(self, namespace):
+        return SQLiteStore(self, namespace)
+
+
+class SQLiteStore(CacheStore):
+    """One cache namespace inside a ``SQLiteCacheDatabase``."""
+
+    _UPSERT = """
+        INSERT INTO cache_entries (namespace, key, data, timestamp) VALUES (?, ?, ?, ?)
+        ON CONFLICT (namespace, key) DO UPDATE SET data = excluded.data, timestamp = excluded.timestamp
+    """
+
+    def __init__(self, db, namespace):
+        self.db = db
+        self.namespace = namespace
+
+    def get(self, key, default=None):
+        row = self.db.connection().execute(
+            'SELECT data, timestamp FROM cache_entries WHERE namespace = ? AND key = ?',
+            (self.namespace, key),
+        ).fetchone()
+        if row is None:
+            return default
+        return {'data': json.loads(row[0]), 'timestamp': row[1]}
+
+    def __setitem__(self, key, entry):
+        self.db.connection().execute(self._UPSERT, self._row(key, entry))
+
+    def __delitem__(self, key):
+        self.db.connection().execute(
+            'DELETE FROM cache_entries WHERE namespace = ? AND key = ?', (self.namespace, key)
+        )
+
+    def clear(self):
+        self.db.connection().execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+
+    def update_many(self, entries, keep_newer=False):
+        """Upsert many ``(key, entry)`` pairs in one transaction.
+
+        With ``keep_newer`` an existing row is only replaced when the incoming
+        timestamp is more recent (used when merging JSON files).
+        """
+        sql = self._UPSERT
+        if keep_newer:
+            sql += ' WHERE excluded.timestamp > cache_entries.timestamp'
+        conn = self.db.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(sql, (self._row(key, entry) for key, entry in entries))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def items(self):
+        rows = self.db.connection().execute(
+            'SELECT key, data, timestamp FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchall()
+        return [
+            (key, {'data': json.loads(data), 'timestamp': timestamp})
+            for key, data, timestamp in rows
+        ]
+
+    def __len__(self):
+        return self.db.connection().execute(
+            'SELECT COUNT(*) FROM cache_entries WHERE namespace = ?', (self.namespace,)
+        ).fetchone()[0]
+
+    def _row(self, key, entry):
+        return (self.namespace, key, json.dumps(entry.get('data')), entry['timestamp'])
+
+
+def load_json_file(path):
+    try:
+        if os.path.exists(path):
+            with open(path, 'r') as f: return json.load(f)
+    except Exception as e: logger.error("Error loading cache from %s: %s", path, e)
+    return {}
+
+
+def migrate_json_caches(db, json_files):
+    """One-shot import of the legacy JSON caches into ``db``.
+
+    ``json_files`` maps namespace -> JSON file path. Entries already in the
+    database are only overwritten by newer ones, so running it twice is safe.
+    Returns a dict of namespace -> number of entries read.
+    """
+    counts = {}
+    for namespace, path in json_files.items():
+        entries = [
+            (key, entry) for key, entry in load_json_file(path).items()
+            if isinstance(entry, dict) and 'timestamp' in entry
+        ]
+        if entries:
+            db.store(namespace).update_many(entries, keep_newer=True)
+        counts[namespace] = len(entries)
+    return counts
+
+
+class LRUFrontCache(CacheStore):
+    """Bounded, thread-safe in-memory tier in front of a backing ``CacheStore``.
+
+    Reads are served from memory when possible and fall through to the
+    backing store on a miss; writes go to both. Memory is bounded by
+    ``max_entries`` and ``max_bytes`` (JSON size of the cached data), least
+    recently used entries being evicted first. Entries older than
+    ``ttl_seconds`` (None: no limit) are dropped on access and by a sweep
+    that runs at most every ``sweep_interval`` seconds, piggybacked on writes.
+    Expiry is kept as an epoch float, so a hit never parses a timestamp.
+    """
+
+    def __init__(self, backing, max_entries=5000, max_bytes=16 * 1024 * 1024, ttl_seconds=None,
+                 sweep_interval=300):
+        self.backing = backing
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored epoch, entry, size in bytes)
+        self._bytes = 0
+        self._next_sweep = time.monotonic() + sweep_interval
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    # --- Reads ---
+    def _lookup(self, key):
+        """``(stored epoch, entry)`` from memory or the backing store, or None."""
+        now = time.time()
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                stored, entry, _ = cached
+                if self.ttl_seconds is not None and stored + self.ttl_seconds <= now:
+                    self._discard(key); self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return stored, entry
+            self.misses += 1
+        entry = self.backing.get(key)
+        if entry is None:
+            return None
+        stored = entry_epoch(entry)
+        if stored is None:
+            return 0.0, entry
+        if self.ttl_seconds is None or stored + self.ttl_seconds > now:
+            self._insert(key, stored, entry, replace=False)
+        return stored, entry
+
+    def get(self, key, default=None):
+        found = self._lookup(key)
+        return default if found is None else found[1]
+
+    def get_fresh(self, key, max_age_seconds):
+        found = self._lookup(key)
+        if found is None or found[0] + max_age_seconds <= time.time():
+            return None
+        return found[1]
+
+    # --- Writes ---
+    def __setitem__(self, key, entry):
+        self.backing[key] = entry
+        self._insert(key, entry_epoch(entry) or time.time(), entry, replace=True)
+        self._maybe_sweep()
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._discard(key)
+        del self.backing[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear(); self._bytes = 0
+        self.backing.clear()
+
+    def items(self):
+        return self.backing.items()
+
+    def __len__(self):
+        return len(self.backing)
+
+    def flush(self):
+        self.backing.flush()
+
+    def _insert(self, key, stored, entry, replace):
+        try:
+            size = len(json.dumps(entry.get('data'))) + len(key)
+        except (TypeError, ValueError):
+            size = len(key)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                if not replace:
+                    return  # a concurrent write got there first; keep the newer entry
+                self._discard(key)
+            self._entries[key] = (stored, entry, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _discard(self, key):
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self._bytes -= cached[2]
+
+    # --- Expiry ---
+    def _maybe_sweep(self):
+        if self.ttl_seconds is None or time.monotonic() < self._next_sweep:
+            return
+        self.sweep()
+
+    def sweep(self):
+        """Drop every in-memory entry older than ``ttl_seconds``; returns how many were dropped."""
+        self._next_sweep = time.monotonic() + self.sweep_interval
+        if self.ttl_seconds is None:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [key for key, (stored, _, _) in self._entries.items() if stored <= cutoff]
+            for key in expired:
+                self._discard(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
@@ -0,0 +1,103 @@
+"""
+Bulk cache warming from a seed list.
+
+A seed file has one artist per line: a name, or a Spotify artist ID / URI /
+URL. Blank lines and ``#`` comments are skipped. ``WarmCheckpoint`` appends
+one JSON line per finished seed, so an interrupted run started again with the
+same checkpoint skips everything already done. It also builds the coverage
+report. Seeds that failed with an error are tried again on the next run.
+
+The ``flask warm-cache`` command in app.py does the resolving.
+"""
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+_SPOTIFY_REF = re.compile(r'^(?:spotify:artist:|https?://open\.spotify\.com/(?:intl-[a-z-]+/)?artist/)([A-Za-z0-9]{22})\b')
+_SPOTIFY_ID = re.compile(r'^[A-Za-z0-9]{22}$')
+
+# Outcomes recorded per seed; 'error' is the only one retried on resume
+OUTCOMES = ('resolved', 'negative', 'cached', 'error')
+
+
+def parse_seed(line):
+    """``('spotify', id)``, ``('name', name)`` or None for blank/comment lines.
+
+    A bare 22-character alphanumeric token is taken as a Spotify ID. A name that
+    looks like one can be written as ``name:...``.
+    """
+    line = line.strip()
+    if not line or line.startswith('#'):
+        return None
+    if line.startswith('name:'):
+        return ('name', line[len('name:'):].strip()) if line[len('name:'):].strip() else None
+    match = _SPOTIFY_REF.match(line)
+    if match:
+        return 'spotify', match.group(1)
+    if _SPOTIFY_ID.match(line):
+        return 'spotify', line
+    return 'name', line
+
+
+def read_seeds(path):
+    """Unique seeds from a seed file, in file order."""
+    seeds, seen = [], set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            seed = parse_seed(line)
+            if seed and seed not in seen:
+                seen.add(seed)
+                seeds.append(seed)
+    return seeds
+
+
+def seed_key(seed):
+    return f"{seed[0]}:{seed[1]}"
+
+
+class WarmCheckpoint:
+    """Append-only JSON-lines log of finished seeds; the last line per seed wins."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}  # seed key -> record
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by the interruption
+                    self.entries[record['seed']] = record
+
+    def is_done(self, seed):
+        record = self.entries.get(seed_key(seed))
+        return record is not None and record['outcome'] != 'error'
+
+    def record(self, seed, outcome, **details):
+        record = {'seed': seed_key(seed), 'outcome': outcome, **details}
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.entries[record['seed']] = record
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+    def report(self, seeds=None):
+        """Coverage of ``seeds`` (default: everything in the checkpoint)."""
+        keys = [seed_key(seed) for seed in seeds] if seeds is not None else list(self.entries)
+        records = [self.entries[key] for key in keys if key in self.entries]
+        outcomes = Counter(record['outcome'] for record in records)
+        located = outcomes['resolved'] + sum(1 for r in records if r['outcome'] == 'cached' and r.get('located'))
+        return {
+            'seeds': len(keys),
+            'done': len(records) - outcomes['error'],
+            'remaining': len(keys) - len(records) + outcomes['error'],
+            **{outcome: outcomes[outcome] for outcome in OUTCOMES},
+            'located': located,
+            'coverage': round(located / len(keys), 4) if keys else 0.0,
+            'sources': dict(Counter(r['source'] for r in records if r.get('source')).most_common()),
+            'errors': [{'seed': r['seed'], 'error': r.get('error')} for r in records if r['outcome'] == 'error'][:20],
+        }
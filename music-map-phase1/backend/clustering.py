@@ -0,0 +1,255 @@
+"""
+Hierarchical point clustering for the global artist map.
+
+Points are projected to Web Mercator and bucketed into a grid at every zoom
+level. As in supercluster, a cell is ``radius`` pixels wide on a tile of
+``extent`` pixels. Cell sizes halve from one zoom to the next, so cell
+``(x, y)`` at zoom ``z + 1`` always lies inside cell ``(x // 2, y // 2)`` at
+zoom ``z``. That gives a cluster tree that is updated in
+O(zoom levels) per added, moved or removed point, with no rebuilds.
+
+``clusters(bbox, zoom)`` visits only the occupied cells inside the bounding
+box at that zoom. The work and the payload are therefore bounded by the
+size of the viewport, not by the number of points. A cell holding one point
+is returned as that point; otherwise it is returned as a cluster with its
+centroid, point count and expansion zoom. Points with identical coordinates
+(artists geocoded to the same city) stay clustered at every zoom. Their
+members are paged with ``leaves()``.
+"""
+import math
+import threading
+
+MAX_LATITUDE = 85.05112878  # Web Mercator limit
+
+
+def lon_to_x(lon):
+    return lon / 360.0 + 0.5
+
+
+def lat_to_y(lat):
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin = math.sin(math.radians(lat))
+    return 0.5 - 0.25 * math.log((1 + sin) / (1 - sin)) / math.pi
+
+
+def x_to_lon(x):
+    return (x - 0.5) * 360.0
+
+
+def y_to_lat(y):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+
+
+def abbreviate(count):
+    if count >= 10000:
+        return f"{round(count / 1000)}k"
+    if count >= 1000:
+        return f"{round(count / 100) / 10}k"
+    return str(count)
+
+
+class _Cell:
+    __slots__ = ('count', 'sum_x', 'sum_y', 'sample', 'members')
+
+    def __init__(self):
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.sample = None   # id of one point in the cell
+        self.members = None  # set of point ids (finest zoom only)
+
+
+class ClusterIndex:
+    def __init__(self, min_zoom=0, max_zoom=16, radius=40, extent=512, max_cells=20000):
+        """``max_cells`` bounds one query: about a 5600 px square viewport at the default radius."""
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.radius = radius
+        self.extent = extent
+        self.max_cells = max_cells
+        self._lock = threading.RLock()
+        self._points = {}  # id -> (x, y, lon, lat, properties)
+        self._levels = {z: {} for z in range(min_zoom, max_zoom + 1)}  # zoom -> {(cx, cy): _Cell}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, point_id):
+        return point_id in self._points
+
+    def _cells_per_unit(self, zoom):
+        return (2 ** zoom) * self.extent / self.radius
+
+    def _cell_key(self, x, y, zoom):
+        scale = self._cells_per_unit(zoom)
+        return int(x * scale), int(y * scale)
+
+    # --- Updates ---
+    def add(self, point_id, lon, lat, properties=None):
+        """Insert or move a point; ``properties`` are returned with it when it is shown on its own."""
+        x, y = lon_to_x(lon), lat_to_y(lat)
+        with self._lock:
+            if point_id in self._points:
+                self._remove(point_id)
+            self._points[point_id] = (x, y, lon, lat, properties or {})
+            key = self._cell_key(x, y, self.max_zoom)
+            for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+                level = self._levels[zoom]
+                cell = level.get(key)
+                if cell is None:
+                    cell = level[key] = _Cell()
+                    if zoom == self.max_zoom: cell.members = set()
+                cell.count += 1
+                cell.sum_x += x
+                cell.sum_y += y
+                if cell.sample is None: cell.sample = point_id
+                if cell.members is not None: cell.members.add(point_id)
+                key = (key[0] // 2, key[1] // 2)
+
+    def remove(self, point_id):
+        with self._lock:
+            if point_id in self._points:
+                self._remove(point_id)
+
+    def _remove(self, point_id):
+        x, y = self._points.pop(point_id)[:2]
+        key = self._cell_key(x, y, self.max_zoom)
+        for zoom in range(self.max_zoom, self.min_zoom - 1, -1):
+            level = self._levels[zoom]
+            cell = level[key]
+            cell.count -= 1
+            if cell.count == 0:
+                del level[key]
+            else:
+                cell.sum_x -= x
+                cell.sum_y -= y
+                if cell.members is not None:
+                    cell.members.discard(point_id)
+                if cell.sample == point_id:
+                    cell.sample = self._any_member(zoom, key)
+            key = (key[0] // 2, key[1] // 2)
+
+    def _children(self, zoom, key):
+        if zoom >= self.max_zoom:
+            return []
+        level = self._levels[zoom + 1]
+        x, y = key[0] * 2, key[1] * 2
+        return [((x + dx, y + dy), level[(x + dx, y + dy)]) for dy in (0, 1) for dx in (0, 1)
+                if (x + dx, y + dy) in level]
+
+    def _any_member(self, zoom, key):
+        cell = self._levels[zoom][key]
+        if cell.members is not None:
+            return next(iter(cell.members))
+        return self._children(zoom, key)[0][1].sample  # children are updated before their parent
+
+    # --- Queries ---
+    def _cell_range(self, zoom, west, south, east, north):
+        x0, y0 = self._cell_key(lon_to_x(west), lat_to_y(north), zoom)
+        x1, y1 = self._cell_key(lon_to_x(east), lat_to_y(south), zoom)
+        return x0, y0, x1, y1
+
+    def _cells_in_bbox(self, zoom, west, south, east, north):
+        level = self._levels[zoom]
+        x0, y0, x1, y1 = self._cell_range(zoom, west, south, east, north)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) <= len(level):
+            for cy in range(y0, y1 + 1):
+                for cx in range(x0, x1 + 1):
+                    cell = level.get((cx, cy))
+                    if cell is not None:
+                        yield (cx, cy), cell
+        else:  # fewer occupied cells than cells in the box
+            for key, cell in list(level.items()):
+                if x0 <= key[0] <= x1 and y0 <= key[1] <= y1:
+                    yield key, cell
+
+    def expansion_zoom(self, zoom, key):
+        """First zoom at which the cell's points spread over more than one cell (max_zoom + 1 if never)."""
+        while zoom < self.max_zoom:
+            children = self._children(zoom, key)
+            if len(children) != 1:
+                return zoom + 1
+            zoom, key = zoom + 1, children[0][0]
+        return self.max_zoom + 1
+
+    def _feature(self, zoom, key, cell):
+        if cell.count == 1:
+            x, y, lon, lat, properties = self._points[cell.sample]
+            return {'type': 'Feature', 'id': cell.sample,
+                    'geometry': {'type': 'Point', 'coordinates': [round(lon, 5), round(lat, 5)]},
+                    'properties': properties}
+        cluster_id = f"{zoom}/{key[0]}/{key[1]}"
+        return {
+            'type': 'Feature', 'id': cluster_id,
+            'geometry': {'type': 'Point', 'coordinates': [round(x_to_lon(cell.sum_x / cell.count), 5),
+                                                          round(y_to_lat(cell.sum_y / cell.count), 5)]},
+            'properties': {
+                'cluster': True, 'cluster_id': cluster_id, 'point_count': cell.count,
+                'point_count_abbreviated': abbreviate(cell.count),
+                'expansion_zoom': self.expansion_zoom(zoom, key),
+                'sample': self._points[cell.sample][4].get('name', cell.sample),
+            },
+        }
+
+    def clusters(self, bbox, zoom):
+        """GeoJSON features (clusters and single points) within ``bbox = (west, south, east, north)``.
+
+        Raises ValueError if the box covers more than ``max_cells`` grid cells at
+        this zoom, i.e. it is far larger than any screen, or if any value is not finite.
+        """
+        west, south, east, north = bbox
+        if not all(map(math.isfinite, (west, south, east, north, zoom))):
+            raise ValueError("bbox and zoom must be finite numbers")
+        zoom = max(self.min_zoom, min(self.max_zoom, int(math.floor(zoom))))
+        if east - west >= 360:
+            west, east = -180.0, 180.0
+        elif west > east:  # crosses the antimeridian
+            return self.clusters((west, south, 180.0, north), zoom) + self.clusters((-180.0, south, east, north), zoom)
+        west, east = max(-180.0, west), min(180.0, east)
+        south, north = min(south, north), max(south, north)
+        x0, y0, x1, y1 = self._cell_range(zoom, west, south, east, north)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_cells:
+            raise ValueError(f"bbox is too large for zoom {zoom}")
+        with self._lock:
+            return [self._feature(zoom, key, cell) for key, cell in self._cells_in_bbox(zoom, west, south, east, north)]
+
+    def parse_cluster_id(self, cluster_id):
+        """``(zoom, (cx, cy))`` for an existing cluster id, else None."""
+        try:
+            zoom, cx, cy = (int(part) for part in str(cluster_id).split('/'))
+        except ValueError:
+            return None
+        if zoom not in self._levels or (cx, cy) not in self._levels[zoom]:
+            return None
+        return zoom, (cx, cy)
+
+    def leaves(self, cluster_id, limit=50, offset=0):
+        """``(total, [point features])`` of the points in a cluster, a page at a time; None if unknown."""
+        with self._lock:
+            parsed = self.parse_cluster_id(cluster_id)
+            if parsed is None:
+                return None
+            zoom, key = parsed
+            total = self._levels[zoom][key].count
+            page, skip = [], offset
+            stack = [(zoom, key)]
+            while stack and len(page) < limit:
+                zoom, key = stack.pop()
+                cell = self._levels[zoom][key]
+                if skip >= cell.count:  # skip whole subtrees
+                    skip -= cell.count
+                    continue
+                if cell.members is not None:
+                    for point_id in sorted(cell.members)[skip:skip + limit - len(page)]:
+                        x, y, lon, lat, properties = self._points[point_id]
+                        page.append({'type': 'Feature', 'id': point_id, 'properties': properties,
+                                     'geometry': {'type': 'Point', 'coordinates': [round(lon, 5), round(lat, 5)]}})
+                    skip = 0
+                    continue
+                stack.extend((zoom + 1, child_key) for child_key, _ in reversed(self._children(zoom, key)))
+            return total, page
+
+    def stats(self):
+        with self._lock:
+            return {'points': len(self._points), 'max_zoom': self.max_zoom, 'radius': self.radius,
+                    'cells': {zoom: len(level) for zoom, level in self._levels.items()}}
@@ -0,0 +1,175 @@
+"""
+Genre x region inverted index over the located artists.
+
+Every artist is filed, by its cache key (see artist_keys), under its
+Spotify genres and under the regions its origin resolves to in the gazetteer: country, first-level region and city.
+Each region has a key such as ``"FI"``, ``"US:Oregon"`` or
+``"US:Oregon:Portland"``. Counts are kept up to date on every change:
+- artists per genre and per region
+- genres per region ("which genres come from Finland")
+- regions per genre ("where does bedroom pop come from")
+
+Answering a facet query therefore reads one counter instead of scanning
+the artist cache. ``update()`` diffs an artist's old and new facets, so
+re-resolving an artist costs O(genres x regions) for that artist alone.
+Artists are also kept sorted by name, so an unfiltered artist page is a
+slice rather than a sort of the whole index.
+"""
+import bisect
+import heapq
+import threading
+from collections import Counter, defaultdict
+
+REGION_LEVELS = ('country', 'region', 'city')
+
+
+def normalize_genre(genre):
+    return ' '.join(str(genre).casefold().split())
+
+
+class FacetIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._artists = {}                                 # artist key -> (genres, region keys)
+        self._names = {}                                   # artist key -> display name
+        self._order = []                                   # sorted [(casefolded name, artist key)]
+        self._genre_artists = defaultdict(set)             # genre -> artist keys
+        self._region_artists = defaultdict(set)            # region key -> artist keys
+        self._genres_by_region = defaultdict(Counter)      # region key -> Counter(genre)
+        self._regions_by_genre = defaultdict(Counter)      # (genre, level) -> Counter(region key)
+        self._regions_by_level = defaultdict(Counter)      # level -> Counter(region key)
+        self._region_info = {}                             # region key -> (level, name)
+
+    def __len__(self):
+        return len(self._artists)
+
+    # --- Updates ---
+    def update(self, artist_key, genres, regions, name=None):
+        """File ``artist_key`` under ``genres`` and ``regions`` (``[(level, key, name)]``), replacing its old facets.
+
+        ``name`` is the artist's display name, which artist pages are ordered by.
+        """
+        genres = tuple(sorted({normalize_genre(genre) for genre in genres or () if genre}))
+        region_keys = tuple(key for _, key, _ in regions)
+        with self._lock:
+            for level, key, region_name in regions:
+                self._region_info[key] = (level, region_name)
+            old = self._artists.get(artist_key)
+            new = (genres, region_keys) if genres or region_keys else None
+            if new:
+                self._place(artist_key, name or artist_key)
+            if old == new:
+                return
+            if old:
+                self._apply(artist_key, *old, -1)
+            if new:
+                self._artists[artist_key] = new
+                self._apply(artist_key, *new, +1)
+            else:
+                del self._artists[artist_key]
+                self._unplace(artist_key)
+
+    def remove(self, artist_key):
+        with self._lock:
+            old = self._artists.pop(artist_key, None)
+            self._unplace(artist_key)
+            if old:
+                self._apply(artist_key, *old, -1)
+
+    def _place(self, artist_key, name):
+        """Record ``name`` for ``artist_key`` and (re)file it in the name order."""
+        if self._names.get(artist_key) == name:
+            return
+        self._unplace(artist_key)
+        self._names[artist_key] = name
+        bisect.insort(self._order, (name.casefold(), artist_key))
+
+    def _unplace(self, artist_key):
+        name = self._names.pop(artist_key, None)
+        if name is None:
+            return
+        entry = (name.casefold(), artist_key)
+        i = bisect.bisect_left(self._order, entry)
+        if i < len(self._order) and self._order[i] == entry:
+            del self._order[i]
+
+    def _apply(self, artist_key, genres, region_keys, sign):
+        for genre in genres:
+            self._members(self._genre_artists, genre, artist_key, sign)
+        for key in region_keys:
+            self._members(self._region_artists, key, artist_key, sign)
+            self._count(self._regions_by_level, self._region_info[key][0], key, sign)
+        for genre in genres:
+            for key in region_keys:
+                self._count(self._genres_by_region, key, genre, sign)
+                self._count(self._regions_by_genre, (genre, self._region_info[key][0]), key, sign)
+
+    @staticmethod
+    def _members(index, facet, artist_key, sign):
+        if sign > 0:
+            index[facet].add(artist_key)
+        else:
+            members = index.get(facet)
+            if members is not None:
+                members.discard(artist_key)
+                if not members: del index[facet]
+
+    @staticmethod
+    def _count(index, facet, value, sign):
+        counter = index[facet]
+        counter[value] += sign
+        if counter[value] <= 0:
+            del counter[value]
+            if not counter: del index[facet]
+
+    # --- Queries ---
+    def has_region(self, key):
+        return key in self._region_artists
+
+    def _region_entry(self, key, count):
+        level, name = self._region_info.get(key, (None, key))
+        return {'region': key, 'name': name, 'level': level, 'artists': count}
+
+    def top_genres(self, region=None, limit=20):
+        """Genres by artist count, overall or among artists from ``region``."""
+        with self._lock:
+            if region is None:
+                top = heapq.nlargest(limit, ((len(names), genre) for genre, names in self._genre_artists.items()))
+            else:
+                top = [(count, genre) for genre, count in self._genres_by_region.get(region, Counter()).most_common(limit)]
+            total = len(self._region_artists.get(region, ())) if region else len(self._artists)
+        return {'region': region, 'artists': total, 'genres': [{'genre': genre, 'artists': count} for count, genre in top]}
+
+    def top_regions(self, genre=None, level='country', limit=20):
+        """Regions of one level by artist count, overall or among artists tagged ``genre``."""
+        genre = normalize_genre(genre) if genre else None
+        with self._lock:
+            counts = self._regions_by_genre.get((genre, level)) if genre else self._regions_by_level.get(level)
+            top = (counts or Counter()).most_common(limit)
+            total = len(self._genre_artists.get(genre, ())) if genre else len(self._artists)
+            regions = [self._region_entry(key, count) for key, count in top]
+        return {'genre': genre, 'level': level, 'artists': total, 'regions': regions}
+
+    def artists(self, genre=None, region=None, limit=50, offset=0):
+        """``(total, [(artist key, name)])`` of the artists matching every given facet, by name."""
+        genre = normalize_genre(genre) if genre else None
+        with self._lock:
+            sets = []
+            if genre is not None: sets.append(self._genre_artists.get(genre, set()))
+            if region is not None: sets.append(self._region_artists.get(region, set()))
+            if not sets:
+                page = [key for _, key in self._order[offset:offset + limit]]
+                return len(self._order), [(key, self._names[key]) for key in page]
+            sets.sort(key=len)  # intersect starting from the smallest set
+            matches = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+            page = heapq.nsmallest(offset + limit, matches, key=self._sort_key)[offset:]
+            return len(matches), [(key, self._names.get(key, key)) for key in page]
+
+    def _sort_key(self, artist_key):
+        return self._names.get(artist_key, artist_key).casefold(), artist_key
+
+    def stats(self):
+        with self._lock:
+            levels = Counter(level for level, _ in self._region_info.values())
+            return {'artists': len(self._artists), 'genres': len(self._genre_artists),
+                    'regions': {level: levels[level] for level in REGION_LEVELS}}
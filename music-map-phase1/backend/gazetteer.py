@@ -0,0 +1,230 @@
+"""
+Offline gazetteer for the location strings the app geocodes most often.
+
+Country codes and names from MusicBrainz ("FI", "Finland, FI"), "City, CC"
+pairs and well-known cities from Wikipedia infoboxes can all be answered
+locally. Only strings the gazetteer cannot place unambiguously go to
+Nominatim.
+
+Places are kept in parallel typed arrays (float32 coordinates, uint32
+population, small-int country/region references) plus one dict from
+normalized name to place index, so a few hundred thousand GeoNames cities
+stay compact. Cities are read either from the bundled ``data/cities.tsv``
+or from a GeoNames ``citiesNNNN.txt`` dump (19-column layout).
+"""
+import os
+import re
+import unicodedata
+from array import array
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+COUNTRIES_FILE = os.path.join(DATA_DIR, "countries.tsv")
+REGIONS_FILE = os.path.join(DATA_DIR, "regions.tsv")
+CITIES_FILE = os.path.join(DATA_DIR, "cities.tsv")
+
+KIND_COUNTRY, KIND_REGION, KIND_CITY = 0, 1, 2
+KIND_NAMES = {KIND_COUNTRY: "country", KIND_REGION: "region", KIND_CITY: "city"}
+NO_REGION = -1
+
+_PUNCTUATION = re.compile(r"[.'’`\-_/()\[\]]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_place_name(name):
+    """Casefolded, accent-free, punctuation-free form used as the index key."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    stripped = _PUNCTUATION.sub(" ", stripped.casefold())
+    return _WHITESPACE.sub(" ", stripped).strip()
+
+
+def _read_tsv(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            yield line.rstrip("\n").split("\t")
+
+
+class Gazetteer:
+    def __init__(self):
+        self.names = []
+        self.lat = array("f")
+        self.lon = array("f")
+        self.population = array("L")
+        self.kind = array("B")
+        self.country = array("H")      # index into self.country_codes
+        self.region = array("h")       # place index of the containing region, or NO_REGION
+        self.country_codes = []
+        self._country_ids = {}         # ISO code -> index into self.country_codes
+        self._country_places = {}      # country index -> place index of the country itself
+        self._index = {}               # normalized name -> place index or tuple of indices
+        self._region_codes = {}        # normalized region abbreviation -> tuple of place indices
+
+    # --- Loading ---
+    @classmethod
+    def load(cls, countries_file=COUNTRIES_FILE, regions_file=REGIONS_FILE, cities_file=CITIES_FILE,
+             min_population=0):
+        gazetteer = cls()
+        for code, name, lat, lon, alternates in _read_tsv(countries_file):
+            gazetteer._add_country(code, name, float(lat), float(lon), alternates.split(",") if alternates else [])
+        if regions_file and os.path.exists(regions_file):
+            for code, name, lat, lon, alternates in _read_tsv(regions_file):
+                gazetteer._add_region(code, name, float(lat), float(lon), alternates.split(",") if alternates else [])
+        if cities_file and os.path.exists(cities_file):
+            gazetteer._load_cities(cities_file, min_population)
+        return gazetteer
+
+    def _load_cities(self, path, min_population):
+        for row in _read_tsv(path):
+            if len(row) >= 19:
+                # GeoNames: id, name, asciiname, alternatenames, lat, lon, class, code, cc, cc2, admin1, ..., population
+                name, ascii_name, alternates, lat, lon, code, admin1, population = (
+                    row[1], row[2], row[3], row[4], row[5], row[8], row[10], row[14])
+                alternates = [alt for alt in alternates.split(",") if alt.isascii()] if alternates else []
+            else:
+                name, ascii_name, alternates, lat, lon, code, admin1, population = row[:8]
+                alternates = alternates.split(",") if alternates else []
+            population = int(population or 0)
+            if population < min_population or code not in self._country_ids:
+                continue
+            region = self._find_region(self._country_ids[code], admin1) if admin1 else NO_REGION
+            index = self._append(name, float(lat), float(lon), population, KIND_CITY, self._country_ids[code], region)
+            self._index_names(index, [name, ascii_name] + alternates)
+
+    def _add_country(self, code, name, lat, lon, alternates):
+        country_id = len(self.country_codes)
+        self.country_codes.append(code)
+        self._country_ids[code] = country_id
+        index = self._append(name, lat, lon, 0, KIND_COUNTRY, country_id, NO_REGION)
+        self._country_places[country_id] = index
+        self._index_names(index, [name, code] + alternates)
+
+    def _add_region(self, code, name, lat, lon, alternates):
+        if code not in self._country_ids:
+            return
+        index = self._append(name, lat, lon, 0, KIND_REGION, self._country_ids[code], NO_REGION)
+        self._index_names(index, [name] + [alt for alt in alternates if len(alt) > 3])
+        # Short abbreviations ("CA", "QC") are only trusted as qualifiers, never on their own
+        for abbreviation in (alt for alt in alternates if len(alt) <= 3):
+            key = normalize_place_name(abbreviation)
+            self._region_codes[key] = self._region_codes.get(key, ()) + (index,)
+
+    def _find_region(self, country_id, admin1):
+        key = normalize_place_name(admin1)
+        for index in self._candidates(key) + self._region_codes.get(key, ()):
+            if self.kind[index] == KIND_REGION and self.country[index] == country_id:
+                return index
+        return NO_REGION
+
+    def _append(self, name, lat, lon, population, kind, country_id, region):
+        self.names.append(name)
+        self.lat.append(lat)
+        self.lon.append(lon)
+        self.population.append(min(population, 0xFFFFFFFF))
+        self.kind.append(kind)
+        self.country.append(country_id)
+        self.region.append(region)
+        return len(self.names) - 1
+
+    def _index_names(self, index, names):
+        for key in {normalize_place_name(name) for name in names if name}:
+            if not key:
+                continue
+            existing = self._index.get(key)
+            if existing is None:
+                self._index[key] = index
+            elif isinstance(existing, tuple):
+                self._index[key] = existing + (index,)
+            elif existing != index:
+                self._index[key] = (existing, index)
+
+    def _candidates(self, key):
+        found = self._index.get(key)
+        if found is None:
+            return ()
+        return found if isinstance(found, tuple) else (found,)
+
+    # --- Lookup ---
+    def __len__(self):
+        return len(self.names)
+
+    def match(self, query):
+        """Place index for ``query`` ("City", "City, Region, Country", "Country, CC", "CC"), or None.
+
+        Every comma-separated qualifier after the first part must name the
+        place itself, its region or its country; otherwise the query is left
+        to a real geocoder rather than guessed.
+        """
+        parts = [key for key in (normalize_place_name(part) for part in query.split(",")) if key]
+        if not parts:
+            return None
+        head, qualifiers = parts[0], parts[1:]
+        candidates = self._candidates(head)
+        if not candidates:
+            return None
+        # A bare name prefers the broadest place (country > region > city); a qualified one the narrowest
+        kind_order = (KIND_CITY, KIND_REGION, KIND_COUNTRY) if qualifiers else (KIND_COUNTRY, KIND_REGION, KIND_CITY)
+        for kind in kind_order:
+            best = None
+            for index in candidates:
+                if self.kind[index] != kind or not all(self._qualifies(index, q) for q in qualifiers):
+                    continue
+                if best is None or self.population[index] > self.population[best]:
+                    best = index
+            if best is not None:
+                return best
+        return None
+
+    def _qualifies(self, index, qualifier):
+        """True if ``qualifier`` names the place at ``index``, its region or its country."""
+        country_place = self._country_places[self.country[index]]
+        region = self.region[index]
+        for other in self._candidates(qualifier) + self._region_codes.get(qualifier, ()):
+            if other in (index, country_place) or (region != NO_REGION and other == region):
+                return True
+            # A region qualifier also fits a city that has no region recorded, if the country matches
+            if self.kind[other] == KIND_REGION and region == NO_REGION and self.kind[index] == KIND_CITY \
+                    and self.country[other] == self.country[index]:
+                return True
+        return False
+
+    def hierarchy(self, query):
+        """``[(level, key, name)]`` from the country down to the place named by ``query``; [] if unknown.
+
+        ``level`` is "country", "region" or "city" and ``key`` is stable across
+        loads ("FI", "US:Oregon", "US:Oregon:Portland", "FI:Helsinki"). A query
+        that does not match as a whole is retried without its leading parts
+        ("Kallio, Helsinki, Finland" -> "Helsinki, Finland" -> "Finland").
+        """
+        parts = query.split(",")
+        for start in range(len(parts)):
+            index = self.match(",".join(parts[start:]))
+            if index is not None:
+                break
+        else:
+            return []
+        country_id = self.country[index]
+        code = self.country_codes[country_id]
+        levels = [("country", code, self.names[self._country_places[country_id]])]
+        region = index if self.kind[index] == KIND_REGION else self.region[index]
+        parent_key = code
+        if region != NO_REGION:
+            parent_key = f"{code}:{self.names[region]}"
+            levels.append(("region", parent_key, self.names[region]))
+        if self.kind[index] == KIND_CITY:
+            levels.append(("city", f"{parent_key}:{self.names[index]}", self.names[index]))
+        return levels
+
+    def lookup(self, query):
+        """``{"name", "lat", "lon", "country", "kind"}`` for ``query``, or None."""
+        index = self.match(query)
+        if index is None:
+            return None
+        return {
+            "name": self.names[index],
+            "lat": round(self.lat[index], 5),
+            "lon": round(self.lon[index], 5),
+            "country": self.country_codes[self.country[index]],
+            "kind": KIND_NAMES[self.kind[index]],
+        }
@@ -0,0 +1,76 @@
+"""
+Compact MusicBrainz artist records.
+
+The location pipeline only reads an artist's MBID, area, begin-area and
+country (plus, for later lookups, its Wikipedia/Wikidata links), so the
+MusicBrainz cache stores just that projection instead of the full
+``get_artist_by_id`` payload with every URL relation and alias.
+
+Cached entries carry a schema version ``v``. Entries written before the
+projection existed (full payloads, no ``v``) are projected when they are
+next read, and ``timed_cache`` writes the upgraded form back.
+"""
+
+MB_RECORD_VERSION = 2
+
+
+class MBArtistRecord:
+    __slots__ = ('mbid', 'name', 'area', 'area_id', 'begin_area', 'begin_area_id', 'country',
+                 'wikipedia', 'wikidata')
+
+    def __init__(self, mbid=None, name=None, area=None, area_id=None, begin_area=None, begin_area_id=None,
+                 country=None, wikipedia=None, wikidata=None):
+        self.mbid = mbid
+        self.name = name
+        self.area = area
+        self.area_id = area_id
+        self.begin_area = begin_area
+        self.begin_area_id = begin_area_id
+        self.country = country
+        self.wikipedia = wikipedia
+        self.wikidata = wikidata
+
+    def __repr__(self):
+        return f"MBArtistRecord({self.name!r}, mbid={self.mbid!r}, begin_area={self.begin_area!r}, area={self.area!r}, country={self.country!r})"
+
+    @classmethod
+    def from_payload(cls, artist):
+        """Project a MusicBrainz artist dict (search hit or full lookup)."""
+        area = artist.get('area') or {}
+        begin_area = artist.get('begin-area') or {}
+        record = cls(
+            mbid=artist.get('id'),
+            name=artist.get('name'),
+            area=area.get('name'),
+            area_id=area.get('id'),
+            begin_area=begin_area.get('name'),
+            begin_area_id=begin_area.get('id'),
+            country=artist.get('country'),
+        )
+        for relation in artist.get('url-relation-list', []):
+            if relation.get('type') == 'wikipedia' and not record.wikipedia:
+                record.wikipedia = relation.get('target')
+            elif relation.get('type') == 'wikidata' and not record.wikidata:
+                record.wikidata = relation.get('target')
+        return record
+
+    # --- Cache codec (see timed_cache) ---
+    @staticmethod
+    def encode(record):
+        if record is None:
+            return None
+        data = {slot: getattr(record, slot) for slot in MBArtistRecord.__slots__ if getattr(record, slot) is not None}
+        data['v'] = MB_RECORD_VERSION
+        return data
+
+    @classmethod
+    def decode(cls, data):
+        if data is None:
+            return None
+        if data.get('v') == MB_RECORD_VERSION:
+            return cls(**{slot: data.get(slot) for slot in cls.__slots__})
+        return cls.from_payload(data)  # legacy full payload
+
+    @staticmethod
+    def is_current(data):
+        return data is None or data.get('v') == MB_RECORD_VERSION
@@ -0,0 +1,43 @@
+"""
+Requests for MusicBrainz's XML web service (ws/2).
+
+app.py sends these over its own ``requests`` session, through
+``upstream_call``: the shared rate limit, an explicit per-request timeout
+and the MusicBrainz circuit breaker. musicbrainzngs is only used to parse
+the XML, so results keep the shape its ``search_artists``,
+``get_artist_by_id`` and ``browse_urls`` return (and MBArtistRecord reads).
+
+musicbrainzngs' own network calls are not used. Every one of them runs
+under a single process-wide lock, even with its rate limiting turned off;
+it retries a 5xx up to 8 times with growing sleeps while holding that lock;
+and it opens connections without a socket timeout. One slow call would
+stall every other MusicBrainz call in the process.
+
+These helpers only build requests and parse responses.
+"""
+import re
+
+from musicbrainzngs import mbxml
+
+# Characters musicbrainzngs escapes in Lucene search values
+LUCENE_SPECIAL = re.compile(r'([+\-&|!(){}\[\]\^"~*?:\\\/])')
+
+
+def artist_search_request(name, limit=3):
+    """``(path, params)`` for an artist name search, escaped as ``search_artists(artist=name)`` does."""
+    value = LUCENE_SPECIAL.sub(r'\\\1', name).lower()  # lower case: "and" / "or" are not operators
+    return 'artist/', {'query': f'artist:({value})', 'limit': str(limit)}
+
+
+def artist_lookup_request(mbid, includes=('url-rels',)):
+    return f'artist/{mbid}', {'inc': ' '.join(includes)}
+
+
+def url_lookup_request(resource, includes=('artist-rels',)):
+    """The MusicBrainz URL entity for ``resource`` (e.g. a Spotify artist page) and its relations."""
+    return 'url/', {'resource': resource, 'inc': ' '.join(includes)}
+
+
+def parse_response(content):
+    """A ws/2 XML body as the dict musicbrainzngs would return for it."""
+    return mbxml.parse_message(content)
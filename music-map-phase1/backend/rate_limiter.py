@@ -0,0 +1,91 @@
+"""
+Process-wide rate limiting for upstream APIs.
+
+One token bucket per upstream host is shared by every worker thread, so the
+configured budget holds no matter how many artists or user requests are being
+resolved at once. Callers reserve a slot under the lock and sleep outside it,
+which keeps waiting threads in FIFO order instead of waking together.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    """Token bucket refilled at ``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait=None):
+        """Take one token and return how long the caller must wait before using it.
+
+        Returns None (and takes nothing) if that wait would exceed ``max_wait``.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A negative balance is a queue of reservations ahead of the refill
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= 1
+            return wait
+
+
+class UpstreamRateLimiter:
+    """Token buckets keyed by upstream host, with queue wait statistics."""
+
+    def __init__(self, budgets):
+        """``budgets`` maps host -> (requests per second, burst)."""
+        self._buckets = {host: TokenBucket(rate, burst) for host, (rate, burst) in budgets.items()}
+        self._stats = {host: {"requests": 0, "refused": 0, "wait_total": 0.0, "wait_max": 0.0} for host in budgets}
+        self._stats_lock = threading.Lock()
+
+    def acquire(self, host, max_wait=None):
+        """Block until a request to ``host`` is within budget. Returns the seconds waited.
+
+        Returns None at once, without queueing, if the wait would exceed ``max_wait``.
+        """
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            return 0.0
+        wait = bucket.reserve(max_wait)
+        if wait is None:
+            with self._stats_lock:
+                self._stats[host]["refused"] += 1
+            return None
+        if wait > 0:
+            time.sleep(wait)
+        with self._stats_lock:
+            stats = self._stats[host]
+            stats["requests"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+        return wait
+
+    def concurrency(self, latency_seconds):
+        """Calls in flight needed to keep every host at its rate when each takes ``latency_seconds`` (Little's law)."""
+        return sum(bucket.rate * latency_seconds for bucket in self._buckets.values())
+
+    def stats(self):
+        """Per-host request count, budget, queue wait (total / mean / max, seconds) and refused reservations."""
+        with self._stats_lock:
+            return {
+                host: {
+                    "rate_per_sec": self._buckets[host].rate,
+                    "burst": self._buckets[host].burst,
+                    "requests": stats["requests"],
+                    "refused": stats["refused"],
+                    "wait_total": round(stats["wait_total"], 3),
+                    "wait_mean": round(stats["wait_total"] / stats["requests"], 3) if stats["requests"] else 0.0,
+                    "wait_max": round(stats["wait_max"], 3),
+                }
+                for host, stats in self._stats.items()
+            }
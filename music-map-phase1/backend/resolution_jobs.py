@@ -0,0 +1,123 @@
+"""
+Background artist resolution.
+
+``BackgroundResolver`` runs the location pipeline for artists that are
+missing from the cache or past their expiry. Every caller in the process
+shares its one ``PriorityScheduler``: artists a user is waiting for
+(INTERACTIVE) are taken before stale entries being revalidated (REFRESH),
+and both before cache warming (WARM). Submitting an artist that is already
+queued returns the existing future, promoted to the more urgent class.
+``ResolutionJob`` groups the artists queued for one /top-artists response
+so the client can poll for them by job id.
+"""
+import threading
+import time
+import uuid
+
+from scheduler import PriorityScheduler
+
+INTERACTIVE, REFRESH, WARM = 0, 1, 2
+PRIORITY_CLASSES = {INTERACTIVE: 'interactive', REFRESH: 'refresh', WARM: 'warm'}
+
+
+class BackgroundResolver:
+    def __init__(self, resolve_fn, max_workers, max_queue=1000, on_resolved=None, on_wait=None, job_ttl_seconds=600,
+                 key_fn=None):
+        """``resolve_fn(name, spotify_data, **kwargs)`` returns the artist's location data.
+
+        ``key_fn(name, spotify_data)`` identifies an artist, so that one already
+        queued is not queued again (default: the name).
+
+        ``on_resolved`` is called (with no arguments) after every resolution,
+        e.g. to flush caches that buffer their writes. ``on_wait(class_name,
+        seconds)`` receives each artist's time in the queue.
+        """
+        self.resolve_fn = resolve_fn
+        self.on_resolved = on_resolved
+        self.key_fn = key_fn or (lambda artist_name, spotify_data: artist_name)
+        self.job_ttl_seconds = job_ttl_seconds
+        self.scheduler = PriorityScheduler(max_workers, max_queue, PRIORITY_CLASSES, thread_name_prefix='resolver',
+                                           on_wait=on_wait)
+        self._lock = threading.Lock()
+        self._pending = {}  # artist key -> future
+        self._jobs = {}     # job id -> ResolutionJob
+
+    def submit(self, artist_name, spotify_data, priority=INTERACTIVE, block=False, **kwargs):
+        """Queue an artist for resolution; returns a future of its location data.
+
+        Raises QueueFull when the queue holds only work at least as urgent
+        (unless ``block``, which waits for room). ``kwargs`` go to ``resolve_fn``
+        if this call queues the artist.
+        """
+        key = self.key_fn(artist_name, spotify_data)
+        with self._lock:
+            future = self._pending.get(key)
+        if future is not None:
+            self.scheduler.promote(future, priority)
+            return future
+        future = self.scheduler.submit(self._run, artist_name, spotify_data, priority=priority, block=block, **kwargs)
+        with self._lock:
+            # Another caller may have queued the same artist meanwhile; the single flight in resolve_fn merges them
+            self._pending.setdefault(key, future)
+        future.add_done_callback(lambda done: self._forget(key, done))
+        return future
+
+    def _run(self, artist_name, spotify_data, **kwargs):
+        try:
+            return self.resolve_fn(artist_name, spotify_data, **kwargs)
+        finally:
+            if self.on_resolved:
+                self.on_resolved()
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def queue_depth(self):
+        """Artists queued or running."""
+        with self._lock:
+            return len(self._pending)
+
+    def stats(self):
+        return self.scheduler.stats()
+
+    def create_job(self, items):
+        """Queue ``(rank, name, spotify_data)`` items and track them as one job."""
+        job = ResolutionJob(
+            [(rank, name, spotify_data, self.submit(name, spotify_data)) for rank, name, spotify_data in items]
+        )
+        now = time.time()
+        with self._lock:
+            for job_id in [job_id for job_id, old in self._jobs.items() if now - old.created > self.job_ttl_seconds]:
+                del self._jobs[job_id]
+            self._jobs[job.id] = job
+        return job
+
+    def get_job(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+
+class ResolutionJob:
+    def __init__(self, entries):
+        self.id = uuid.uuid4().hex
+        self.created = time.time()
+        self.entries = entries  # [(rank, name, spotify_data, future)]
+
+    def done(self):
+        return all(future.done() for _, _, _, future in self.entries)
+
+    def pending(self):
+        return [{"name": name, "rank": rank} for rank, name, _, future in self.entries if not future.done()]
+
+    def resolved(self):
+        """``(rank, location_data)`` for every finished artist, with this job's Spotify fields."""
+        results = []
+        for rank, _, spotify_data, future in self.entries:
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                continue
+            location_data = future.result()
+            if location_data:
+                results.append((rank, {**location_data, **spotify_data}))
+        return results
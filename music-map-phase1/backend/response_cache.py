@@ -0,0 +1,104 @@
+"""
+Short-lived cache of rendered JSON responses, with strong ETags.
+
+/top-artists keeps each user's last complete answer per time range here for
+a few minutes. Switching back to a range reuses it without calling Spotify
+or re-checking the artist caches. The ETag (a hash of the exact body) lets
+the browser revalidate with ``If-None-Match`` and get an empty 304 when
+nothing changed.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def etag_for(body):
+    """Strong ETag (quoted) for a response body."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an ``If-None-Match`` header value matches ``etag`` (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any((tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()) == opaque
+               for tag in if_none_match.split(','))
+
+
+def render_json(payload):
+    """``(body bytes, etag)`` of a JSON payload, serialized deterministically."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode()
+    return body, etag_for(body)
+
+
+class CachedResponse:
+    __slots__ = ('body', 'etag', 'payload', 'created')
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.body, self.etag = render_json(payload)
+        self.created = time.monotonic()
+
+
+class ResponseCache:
+    """LRU of ``key -> CachedResponse`` whose entries expire ``ttl_seconds`` after they were stored.
+
+    ``entry_factory(payload)`` builds the stored entry; anything with a
+    monotonic ``created`` attribute can be kept instead of a CachedResponse.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=1000, entry_factory=CachedResponse):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entry_factory = entry_factory
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, payload):
+        entry = self.entry_factory(payload)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def discard_where(self, predicate):
+        """Drop every entry whose key satisfies ``predicate``; returns how many were dropped."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
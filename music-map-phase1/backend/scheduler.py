@@ -0,0 +1,208 @@
+"""
+Process-wide priority work queue.
+
+``PriorityScheduler`` runs submitted calls on a fixed set of long-lived
+worker threads, taking the most urgent queued call first (lowest priority
+number, then submission order). The queue is bounded. When it is full, a
+new call displaces the newest queued call of a less urgent class; that
+call's future is cancelled. If there is nothing to displace, the submitter
+either blocks until there is room (``block=True``, for batch producers
+such as cache warming) or gets ``QueueFull`` at once.
+
+A queued call can be promoted to a more urgent class, e.g. when a user
+asks for an artist that is already waiting for a background refresh.
+"""
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Task:
+    __slots__ = ('priority', 'seq', 'fn', 'args', 'kwargs', 'future', 'enqueued', 'started')
+
+    def __init__(self, priority, seq, fn, args, kwargs):
+        self.priority = priority
+        self.seq = seq
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.started = False
+
+
+class PriorityScheduler:
+    def __init__(self, max_workers, max_queue, classes, thread_name_prefix='worker', on_wait=None):
+        """``classes`` maps priority number -> name, most urgent (lowest number) first.
+
+        ``on_wait(class_name, seconds)`` is called with each task's queue wait when it starts.
+        """
+        self.max_queue = max(1, int(max_queue))
+        self.classes = dict(classes)
+        self.on_wait = on_wait
+        self.thread_name_prefix = thread_name_prefix
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._heap = []                    # (priority, seq, task); promoted tasks leave stale entries behind
+        self._queued = {}                  # future -> task, for tasks not yet started
+        self._seq = itertools.count()
+        self._workers = []
+        self._target_workers = 0
+        self._running = 0
+        self._counts = {name: {'submitted': 0, 'displaced': 0, 'rejected': 0, 'wait_total': 0.0, 'wait_max': 0.0,
+                               'started': 0} for name in self.classes.values()}
+        self.set_workers(max_workers)
+
+    # --- Workers ---
+    def set_workers(self, count):
+        """Grow or shrink the worker pool; surplus workers exit after their current task."""
+        with self._lock:
+            self._target_workers = max(1, int(count))
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            for _ in range(self._target_workers - len(self._workers)):
+                worker = threading.Thread(target=self._work, name=f'{self.thread_name_prefix}_{next(self._seq)}',
+                                          daemon=True)
+                self._workers.append(worker)
+                worker.start()
+            self._not_empty.notify_all()
+
+    @property
+    def max_workers(self):
+        return self._target_workers
+
+    def _work(self):
+        me = threading.current_thread()
+        while True:
+            with self._lock:
+                task = None
+                while task is None:
+                    if len([w for w in self._workers if w.is_alive()]) > self._target_workers:
+                        self._workers.remove(me)
+                        return
+                    task = self._pop()
+                    if task is None:
+                        self._not_empty.wait()
+                self._running += 1
+                waited = time.monotonic() - task.enqueued
+                counts = self._counts[self.classes[task.priority]]
+                counts['started'] += 1
+                counts['wait_total'] += waited
+                counts['wait_max'] = max(counts['wait_max'], waited)
+            if self.on_wait:
+                self.on_wait(self.classes[task.priority], waited)
+            try:
+                if task.future.set_running_or_notify_cancel():
+                    try:
+                        task.future.set_result(task.fn(*task.args, **task.kwargs))
+                    except BaseException as e:
+                        task.future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _pop(self):
+        """Next live task, or None; caller holds the lock."""
+        while self._heap:
+            priority, _, task = heapq.heappop(self._heap)
+            if task.started or priority != task.priority:
+                continue  # stale entry left by a promotion or a displacement
+            task.started = True
+            del self._queued[task.future]
+            self._not_full.notify()
+            return task
+        return None
+
+    # --- Submitting ---
+    def submit(self, fn, *args, priority, block=False, timeout=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` in class ``priority``; returns its future.
+
+        Raises QueueFull if the queue is full of equally or more urgent work and
+        ``block`` is false (or ``timeout`` seconds pass while blocking).
+        """
+        name = self.classes[priority]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        displaced = None
+        with self._lock:
+            while len(self._queued) >= self.max_queue:
+                displaced = self._displace(priority)
+                if displaced:
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    self._counts[name]['rejected'] += 1
+                    raise QueueFull(f"{len(self._queued)} calls queued")
+                self._not_full.wait(remaining)
+            task = _Task(priority, next(self._seq), fn, args, kwargs)
+            self._queued[task.future] = task
+            heapq.heappush(self._heap, (priority, task.seq, task))
+            self._counts[name]['submitted'] += 1
+            self._not_empty.notify()
+        if displaced:
+            displaced.future.cancel()  # outside the lock: cancelling runs the future's callbacks
+        return task.future
+
+    def _displace(self, priority):
+        """Dequeue the newest queued task less urgent than ``priority``; caller holds the lock."""
+        victims = [task for task in self._queued.values() if task.priority > priority]
+        if not victims:
+            return None
+        victim = max(victims, key=lambda task: (task.priority, task.seq))
+        del self._queued[victim.future]
+        victim.started = True  # drops its heap entry
+        self._counts[self.classes[victim.priority]]['displaced'] += 1
+        return victim
+
+    def promote(self, future, priority):
+        """Move a still-queued call up to class ``priority``. Returns False if it already started."""
+        with self._lock:
+            task = self._queued.get(future)
+            if task is None:
+                return False
+            if priority < task.priority:
+                task.priority = priority
+                heapq.heappush(self._heap, (priority, task.seq, task))
+            return True
+
+    # --- Observability ---
+    def depth(self):
+        """Queued calls per class."""
+        with self._lock:
+            depth = {name: 0 for name in self.classes.values()}
+            for task in self._queued.values():
+                depth[self.classes[task.priority]] += 1
+            return depth
+
+    def stats(self):
+        with self._lock:
+            depth = {name: 0 for name in self.classes.values()}
+            oldest = {name: 0.0 for name in self.classes.values()}
+            now = time.monotonic()
+            for task in self._queued.values():
+                name = self.classes[task.priority]
+                depth[name] += 1
+                oldest[name] = max(oldest[name], now - task.enqueued)
+            return {
+                'workers': self._target_workers,
+                'running': self._running,
+                'queued': len(self._queued),
+                'max_queue': self.max_queue,
+                'classes': {
+                    name: {
+                        'queued': depth[name],
+                        'oldest_wait': round(oldest[name], 3),
+                        'submitted': counts['submitted'],
+                        'displaced': counts['displaced'],
+                        'rejected': counts['rejected'],
+                        'wait_mean': round(counts['wait_total'] / counts['started'], 3) if counts['started'] else 0.0,
+                        'wait_max': round(counts['wait_max'], 3),
+                    }
+                    for name, counts in self._counts.items()
+                },
+            }
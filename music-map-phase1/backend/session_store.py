@@ -0,0 +1,103 @@
+"""
+Server-side Flask sessions in SQLite.
+
+One row per session, ``(id, data, expires)``, in a WAL-mode database file.
+Every worker process and thread can share it, as with the cache database. A
+request reads one row by primary key. A row is written only when the session
+changed, or when less than half of its lifetime is left (sliding expiry).
+Expired rows are deleted in one statement every ``sweep_interval`` seconds,
+so nothing piles up the way one-file-per-session storage does.
+"""
+import secrets
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from cache_store import SQLiteCacheDatabase
+
+
+class SQLiteSessionDatabase(SQLiteCacheDatabase):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            id TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            expires REAL NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires);
+    """
+
+
+class SQLiteSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, expires=None):
+        def on_update(session):
+            session.modified = True
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires = expires  # None for a new session
+        self.modified = False
+
+
+class SQLiteSessionInterface(SessionInterface):
+    serializer = session_json_serializer  # same tagged JSON as Flask's cookie sessions
+
+    def __init__(self, path, sweep_interval=600):
+        self.db = SQLiteSessionDatabase(path)
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            row = self.db.connection().execute(
+                'SELECT data, expires FROM sessions WHERE id = ? AND expires > ?', (sid, time.time())
+            ).fetchone()
+            if row is not None:
+                try:
+                    return SQLiteSession(self.serializer.loads(row[0]), sid=sid, expires=row[1])
+                except ValueError:
+                    pass  # unreadable row: start over
+        return SQLiteSession()
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain, path = self.get_cookie_domain(app), self.get_cookie_path(app)
+        if not session:
+            if session.sid and session.modified:  # cleared (logout)
+                self.db.connection().execute('DELETE FROM sessions WHERE id = ?', (session.sid,))
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        lifetime = self._lifetime(app)
+        renew = session.expires is None or session.expires - now < lifetime / 2
+        if session.modified or renew:
+            sid = session.sid or secrets.token_urlsafe(32)
+            self.db.connection().execute(
+                'INSERT INTO sessions (id, data, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET data = excluded.data, expires = excluded.expires',
+                (sid, self.serializer.dumps(dict(session)), now + lifetime),
+            )
+            if session.sid is None or self.should_set_cookie(app, session):
+                response.set_cookie(
+                    cookie_name, sid, expires=self.get_expiration_time(app, session), httponly=self.get_cookie_httponly(app),
+                    domain=domain, path=path, secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+                )
+            self._maybe_sweep(now)
+
+    def _maybe_sweep(self, now):
+        if now - self._last_sweep < self.sweep_interval or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = now
+            self.db.connection().execute('DELETE FROM sessions WHERE expires <= ?', (now,))
+        finally:
+            self._sweep_lock.release()
+
+    def count(self):
+        return self.db.connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
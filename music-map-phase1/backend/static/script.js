@@ -4,8 +4,13 @@
 * Handles Mapbox GL JS map initialization, Spotify data fetching,
 * marker clustering, popups, list interaction, and UI updates.
 *
-* Version 3.5: Fix time range button event listeners by selecting buttons
-* via class name instead of non-existent IDs.
+* Version 3.6: Stream artists from /top-artists/stream and add each one to
+* the map and list as it resolves.
+* Version 3.7: Keep each viewed time range's artists and redraw them instantly
+* when switching back, revalidating with /top-artists ETags in the background.
+* Version 3.8: Keep artists as server-built GeoJSON features keyed by ID and apply
+* each fetch as a diff; the map layers and their handlers are set up once, the
+* artist list renders only the rows in view, and cluster popups fill in as they scroll.
 */
 
 // --- Configuration ---
@@ -30,6 +35,11 @@ const POPUP_OFFSET_POINT = 15;
 const POPUP_OFFSET_CLUSTER = 25;
 const POPUP_MAX_WIDTH = '300px';
 const HOVER_POPUP_OFFSET = 10;
+const JOB_POLL_INTERVAL_MS = 1500;
+const RANGE_CACHE_TTL_MS = 5 * 60 * 1000; // how long an already viewed time range is shown without refetching
+const ARTIST_LIST_ROW_ESTIMATE_PX = 84; // .artist-list-item height plus margin, until a rendered row is measured
+const ARTIST_LIST_OVERSCAN_ROWS = 5; // rows rendered above and below the visible part of the list
+const CLUSTER_POPUP_PAGE_SIZE = 20; // cluster popup rows added per scroll to the bottom
 
 // --- DOM Elements ---
 const artistListContainer = document.getElementById('artist-list');
@@ -46,7 +56,13 @@ const mapContainer = document.getElementById('map');
 let map;
 let currentClickPopup = null;
 let currentHoverPopup = null;
-const artistDataStore = {};
+const artistDataStore = {}; // artist ID -> its feature's properties
+const artistFeatures = new Map(); // artist ID -> GeoJSON feature, as sent by the server; located ones are on the map
+const artistListView = { ids: [], rowHeight: 0, renderScheduled: false, renderedWindow: '', version: 0, activeId: null };
+const rangeCache = new Map(); // time range -> { entries: [{ rank, feature }], etag, storedAt } of complete results already shown
+let activeArtistUpdate = null; // the fetch being applied: { seen, received, located, fittedOnce, jobId }
+let artistSourceUpdateScheduled = false;
+let artistLayerHandlersAdded = false;
 // Initialize active button based on the one with 'active' class in HTML
 let activeTimeRangeButton = document.querySelector('.time-range-btn.active');
 const loadedImageIds = new Set();
@@ -179,12 +195,18 @@ console.log("Ignoring button click while loading.");
 
 if (artistListContainer) {
 artistListContainer.addEventListener('click', handleArtistListClick);
+artistListContainer.addEventListener('scroll', scheduleArtistListRender, { passive: true });
+window.addEventListener('resize', handleArtistListResize);
 } else {
 console.warn("Artist list container not found. List interactions disabled.");
 }
 }
 
 // --- Data Fetching and Processing ---
+// Artists arrive one NDJSON line at a time from /top-artists/stream: cached ones first,
+// then each newly resolved artist, so markers appear without waiting for the slowest lookup.
+// The server sends each artist as a ready-made GeoJSON feature (format=geojson). Features are
+// kept by artist ID across fetches, so a new fetch only adds, updates and removes what changed.
 async function fetchAndDisplayArtists(timeRange = 'medium_term') {
 if (!placeholderLoaded || !map || !map.isStyleLoaded()) {
 console.warn("Map or resources not ready. Aborting fetch.");
@@ -195,83 +217,308 @@ console.log(`Fetching top artists for time range: ${timeRange}`);
 setLoadingState(true);
 showFlashMessage(`Fetching your top artists (${timeRange.replace('_', ' ')})...`);
 updateActiveButton(timeRange); // Update active button state
-removeArtistLayersAndSource();
-artistListContainer.innerHTML = `<div class="empty-state"><i class="fas fa-spinner fa-spin"></i><p>Loading artists...</p></div>`;
-Object.keys(artistDataStore).forEach(key => delete artistDataStore[key]);
-const fetchUrl = `/top-artists?time_range=${timeRange}`;
+closeArtistPopups();
+showArtistListMessage('fa-spinner fa-spin', 'Loading artists...');
+const update = { seen: new Set(), received: 0, located: 0, fittedOnce: false, jobId: null };
+activeArtistUpdate = update;
+const cachedRange = rangeCache.get(timeRange);
+let etag = null;
+let fromCache = false;
 
 try {
-const response = await fetch(fetchUrl);
-if (!response.ok) {
+if (cachedRange && Date.now() - cachedRange.storedAt < RANGE_CACHE_TTL_MS) {
+// Viewed before: show it at once, then ask the server (with the ETag) whether it changed
+console.log(`Using cached artists for ${timeRange}.`);
+fromCache = true;
+cachedRange.entries.forEach(entry => applyArtistFeature(entry.feature, update, entry.rank));
+revalidateRange(timeRange, cachedRange);
+} else if (window.ReadableStream && window.TextDecoder) {
+const response = await fetch(`/top-artists/stream?time_range=${timeRange}&format=geojson`);
+await throwIfResponseNotOk(response);
+await readNdjsonStream(response, event => handleArtistStreamEvent(event, update));
+// The server ends the stream at its time budget; artists still resolving are then polled for
+if (update.jobId) await pollResolutionJob(update.jobId, update);
+} else {
+// Fallback for browsers without streaming fetch bodies: cached artists now, then poll the resolution job
+const response = await fetch(`/top-artists?time_range=${timeRange}&format=geojson`);
+await throwIfResponseNotOk(response);
+const payload = await response.json();
+if (!payload || !Array.isArray(payload.features)) throw new Error("Received unexpected data format.");
+payload.features.forEach(feature => applyArtistFeature(feature, update));
+if (payload.job_id) await pollResolutionJob(payload.job_id, update);
+else etag = response.headers.get('ETag');
+}
+removeArtistsExcept(update.seen); // the previous range's artists that this one lacks
+if (!fromCache) rememberRange(timeRange, etag, update);
+console.log(`Received ${update.received} artists.`);
+
+if (update.received === 0) {
+showArtistListMessage('fa-compact-disc', 'No top artists found for this period.');
+showFlashMessage(`No top artists found for ${timeRange.replace('_', ' ')}.`);
+return;
+}
+flushArtistSource();
+showFlashMessage(`Displaying ${update.received} artists. ${update.located} located on the map.`);
+if (update.located > 0) fitBoundsToGeoJSON(artistFeatureCollection(update.seen));
+
+} catch (error) {
+console.error('Error fetching or processing artists:', error);
+removeArtistsExcept(new Set());
+showArtistListMessage('fa-exclamation-triangle', `Error loading artists: ${error.message}`);
+showFlashMessage(`Error: ${error.message}`, 5000, true);
+} finally { setLoadingState(false); }
+}
+
+// Cached ranges keep their own ranks: the features themselves are shared with the other ranges.
+function rememberRange(timeRange, etag, update) {
+const entries = Array.from(update.seen, id => ({ rank: artistDataStore[id].rank, feature: artistFeatures.get(id) }))
+.sort((a, b) => a.rank - b.rank);
+rangeCache.set(timeRange, { entries, etag, storedAt: Date.now() });
+}
+
+function featureSignature(feature) {
+const p = feature.properties;
+return JSON.stringify([feature.geometry && feature.geometry.coordinates, p.name, p.origin, p.image_url, p.genres, p.spotify_url, p.uri]);
+}
+
+function rangeSignature(entries) {
+return entries.map(entry => `${entry.rank}:${featureSignature(entry.feature)}`).join('|');
+}
+
+// Checks a cached range against /top-artists in the background; 304 (same ETag) just renews it.
+// A changed, complete answer replaces the cache and is redrawn if that range is still on screen.
+async function revalidateRange(timeRange, cachedRange) {
+try {
+const headers = cachedRange.etag ? { 'If-None-Match': cachedRange.etag } : {};
+const response = await fetch(`/top-artists?time_range=${timeRange}&format=geojson`, { headers });
+if (response.status === 304) { cachedRange.storedAt = Date.now(); return; }
+if (!response.ok) return;
+const payload = await response.json();
+if (!payload || !Array.isArray(payload.features) || payload.job_id) return; // still resolving; keep what we have
+const entries = payload.features.map(feature => ({ rank: feature.properties.rank, feature })).sort((a, b) => a.rank - b.rank);
+const changed = rangeSignature(entries) !== rangeSignature(cachedRange.entries);
+rangeCache.set(timeRange, { entries: changed ? entries : cachedRange.entries, etag: response.headers.get('ETag'), storedAt: Date.now() });
+if (changed && activeTimeRangeButton?.dataset.range === timeRange && !document.body.classList.contains('loading')) {
+console.log(`Artists for ${timeRange} changed; redrawing.`);
+fetchAndDisplayArtists(timeRange);
+}
+} catch (error) {
+console.warn(`Could not revalidate cached artists for ${timeRange}:`, error);
+}
+}
+
+async function throwIfResponseNotOk(response) {
+if (response.ok) return;
 let errorMsg = `HTTP error ${response.status}`;
 try { const errorData = await response.json(); errorMsg = errorData.error || errorMsg; } catch (e) {}
 throw new Error(errorMsg);
 }
-const artists = await response.json();
-if (!Array.isArray(artists)) throw new Error("Received unexpected data format.");
-console.log(`Received ${artists.length} artists.`);
-artistListContainer.innerHTML = '';
 
-if (artists.length === 0) {
-artistListContainer.innerHTML = `<div class="empty-state"><i class="fas fa-compact-disc"></i><p>No top artists found for this period.</p></div>`;
-showFlashMessage(`No top artists found for ${timeRange.replace('_', ' ')}.`);
-setLoadingState(false); return;
-}
-
-const imageLoadPromises = [];
-const uniqueImageUrls = new Map();
-let locatedCount = 0;
-artists.forEach((artist, index) => {
-artist.id = String(artist.id || (artist.uri ? artist.uri.split(':').pop() : `generated-${artist.name}-${index}`));
-artist.rank = index + 1;
-artistDataStore[artist.id] = artist;
-const listItemHtml = createArtistListItem(artist, artist.rank);
-artistListContainer.insertAdjacentHTML('beforeend', listItemHtml);
-if (isValidCoordinate(artist.lat) && isValidCoordinate(artist.lon)) {
-locatedCount++;
-if (artist.image_url && !uniqueImageUrls.has(artist.image_url)) {
+// Adds artists from a background resolution job as they finish, until the job is done.
+async function pollResolutionJob(jobId, update) {
+while (true) {
+await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+const response = await fetch(`/top-artists/jobs/${jobId}?format=geojson`);
+await throwIfResponseNotOk(response);
+const job = await response.json();
+job.features.filter(feature => !update.seen.has(String(feature.id))).forEach(feature => applyArtistFeature(feature, update));
+if (job.status === 'done') return;
+}
+}
+
+// Calls onEvent with each parsed line of a newline-delimited JSON response body.
+async function readNdjsonStream(response, onEvent) {
+const reader = response.body.getReader();
+const decoder = new TextDecoder();
+let buffered = '';
+while (true) {
+const { value, done } = await reader.read();
+if (value) buffered += decoder.decode(value, { stream: true });
+let newlineIndex;
+while ((newlineIndex = buffered.indexOf('\n')) >= 0) {
+const line = buffered.slice(0, newlineIndex).trim();
+buffered = buffered.slice(newlineIndex + 1);
+if (line) onEvent(JSON.parse(line));
+}
+if (done) break;
+}
+if (buffered.trim()) onEvent(JSON.parse(buffered));
+}
+
+function handleArtistStreamEvent(event, update) {
+if (event.event === 'start') {
+console.log(`Stream started: ${event.total} artists expected.`);
+} else if (event.event === 'artist') {
+applyArtistFeature(event.feature, update, event.rank);
+} else if (event.event === 'error') {
+throw new Error(event.error || 'Server error');
+} else if (event.event === 'end') {
+console.log(`Stream finished: ${event.count} artists.`);
+if (event.job_id) {
+console.log(`${event.pending.length} artists still resolving (job ${event.job_id}).`);
+update.jobId = event.job_id;
+}
+}
+}
+
+// Adds or updates one artist in the keyed store, the ranked list and (if located) the map source.
+// An artist already on the map with the same data keeps its feature object and its loaded icon.
+function applyArtistFeature(feature, update, rank = feature.properties.rank) {
+if (update.received === 0) {
+// Markers are visible from the first artist on; buttons stay disabled until the stream ends
+if (loadingOverlay) loadingOverlay.setAttribute('aria-hidden', 'true');
+document.body.classList.remove('loading');
+}
+const id = String(feature.id ?? feature.properties.artistId);
+const repeated = update.seen.has(id);
+const previous = artistFeatures.get(id);
+if (previous && featureSignature(previous) === featureSignature(feature)) {
+feature = previous;
+} else {
+const keepIcon = previous && previous.properties.image_url === feature.properties.image_url;
+feature.id = id;
+feature.properties.artistId = id;
+feature.properties.iconId = keepIcon ? previous.properties.iconId : PLACEHOLDER_ICON_ID;
+artistFeatures.set(id, feature);
+if (feature.geometry || previous?.geometry) scheduleArtistSourceUpdate();
+if (feature.geometry && feature.properties.image_url && !keepIcon) loadArtistIcon(feature);
+}
+feature.properties.rank = rank;
+artistDataStore[id] = feature.properties;
+if (repeated) return;
+update.seen.add(id);
+update.received++;
+if (feature.geometry) update.located++;
+placeInArtistList(id);
+}
+
+function loadArtistIcon(feature) {
+const artist = feature.properties;
 const iconId = generateIconId(artist);
-uniqueImageUrls.set(artist.image_url, iconId);
-imageLoadPromises.push(createCircularImage(artist.image_url, iconId));
-console.log(JSON.stringify(artists, null, 2));
+createCircularImage(artist.image_url, iconId)
+.then(loadedIconId => {
+if (artistFeatures.get(artist.artistId) !== feature) return; // replaced or removed since
+artist.iconId = loadedIconId;
+scheduleArtistSourceUpdate();
+})
+.catch(error => console.warn(`Failed to load image for ${iconId} (URL: ${artist.image_url}):`, error || 'Unknown error'));
+}
+
+function removeArtistsExcept(keepIds) {
+let removedLocated = false;
+for (const [id, feature] of artistFeatures) {
+if (keepIds.has(id)) continue;
+artistFeatures.delete(id);
+delete artistDataStore[id];
+removedLocated = removedLocated || Boolean(feature.geometry);
 }
+if (removedLocated) scheduleArtistSourceUpdate();
 }
-});
 
-console.log(`Attempting to load ${imageLoadPromises.length} unique artist images...`);
-const imageLoadResults = await Promise.allSettled(imageLoadPromises);
-const successfullyLoadedIconIds = new Map();
-imageLoadResults.forEach((result, index) => {
-const originalUrl = Array.from(uniqueImageUrls.keys())[index];
-const intendedIconId = uniqueImageUrls.get(originalUrl);
-if (result.status === 'fulfilled' && result.value === intendedIconId) {
-successfullyLoadedIconIds.set(originalUrl, intendedIconId);
-} else { console.warn(`Failed to load image for ${intendedIconId} (URL: ${originalUrl}):`, result.reason || 'Unknown error'); }
-});
-console.log(`Successfully loaded ${successfullyLoadedIconIds.size} / ${uniqueImageUrls.size} unique artist images.`);
-
-const features = artists
-.filter(artist => isValidCoordinate(artist.lat) && isValidCoordinate(artist.lon))
-.map(artist => {
-const assignedIconId = successfullyLoadedIconIds.get(artist.image_url) || PLACEHOLDER_ICON_ID;
-return {
-type: 'Feature', id: artist.id,
-geometry: { type: 'Point', coordinates: [parseFloat(artist.lon), parseFloat(artist.lat)] },
-properties: { artistId: artist.id, name: artist.name || 'Unknown Artist', iconId: assignedIconId, rank: artist.rank }
-};
-});
+function artistFeatureCollection(ids = artistFeatures.keys()) {
+const features = [];
+for (const id of ids) {
+const feature = artistFeatures.get(id);
+if (feature && feature.geometry) features.push(feature);
+}
+return { type: 'FeatureCollection', features };
+}
 
-const artistGeoJSON = { type: 'FeatureCollection', features: features };
-setupArtistLayers(artistGeoJSON);
-showFlashMessage(`Displaying ${artists.length} artists. ${locatedCount} located on the map.`);
-if (features.length > 0) fitBoundsToGeoJSON(artistGeoJSON);
+function artistCoordinates(artistId) {
+const geometry = artistFeatures.get(String(artistId))?.geometry;
+return geometry ? geometry.coordinates.slice() : null;
+}
 
-} catch (error) {
-console.error('Error fetching or processing artists:', error);
-artistListContainer.innerHTML = `<div class="empty-state"><i class="fas fa-exclamation-triangle"></i><p>Error loading artists: ${error.message}</p></div>`;
-showFlashMessage(`Error: ${error.message}`, 5000, true);
-removeArtistLayersAndSource();
-} finally { setLoadingState(false); }
+// Coalesce bursts of arriving artists/icons into one setData per animation frame.
+// (Mapbox GL JS v2 GeoJSON sources have no partial update, so the store is sent whole;
+// the source, layers and handlers stay in place between fetches.)
+function scheduleArtistSourceUpdate() {
+if (artistSourceUpdateScheduled) return;
+artistSourceUpdateScheduled = true;
+requestAnimationFrame(flushArtistSource);
+}
+
+function flushArtistSource() {
+artistSourceUpdateScheduled = false;
+if (!map) return;
+const artistGeoJSON = artistFeatureCollection();
+const source = map.getSource(ARTIST_SOURCE_ID);
+if (source) source.setData(artistGeoJSON);
+else if (artistGeoJSON.features.length > 0) setupArtistLayers(artistGeoJSON);
+const update = activeArtistUpdate;
+if (update && !update.fittedOnce && update.located > 0) {
+update.fittedOnce = true;
+fitBoundsToGeoJSON(artistFeatureCollection(update.seen));
+}
+}
+
+// --- Artist List (virtualized) ---
+// Only the rows in or near view are in the DOM; spacers above and below keep the full scroll height.
+function showArtistListMessage(iconClass, message) {
+if (!artistListContainer) return;
+artistListView.ids = [];
+artistListView.renderedWindow = '';
+artistListContainer.scrollTop = 0;
+artistListContainer.innerHTML = `<div class="empty-state"><i class="fas ${iconClass}"></i><p>${message}</p></div>`;
+}
+
+function placeInArtistList(artistId) {
+const ids = artistListView.ids;
+const rank = artistDataStore[artistId].rank;
+let low = 0, high = ids.length;
+while (low < high) {
+const mid = (low + high) >> 1;
+if ((artistDataStore[ids[mid]]?.rank ?? Infinity) <= rank) low = mid + 1; else high = mid;
+}
+ids.splice(low, 0, artistId);
+artistListView.version++;
+scheduleArtistListRender();
+}
+
+function scheduleArtistListRender() {
+if (artistListView.renderScheduled) return;
+artistListView.renderScheduled = true;
+requestAnimationFrame(renderArtistList);
+}
+
+function renderArtistList() {
+artistListView.renderScheduled = false;
+const ids = artistListView.ids;
+if (!artistListContainer || ids.length === 0) return;
+const rowHeight = artistListView.rowHeight || ARTIST_LIST_ROW_ESTIMATE_PX;
+const scrollTop = artistListContainer.scrollTop;
+const viewportHeight = artistListContainer.clientHeight || window.innerHeight;
+const first = Math.max(0, Math.floor(scrollTop / rowHeight) - ARTIST_LIST_OVERSCAN_ROWS);
+const last = Math.min(ids.length, Math.ceil((scrollTop + viewportHeight) / rowHeight) + ARTIST_LIST_OVERSCAN_ROWS);
+const renderedWindow = `${first}:${last}:${artistListView.version}`;
+if (renderedWindow === artistListView.renderedWindow) return;
+artistListView.renderedWindow = renderedWindow;
+const rows = ids.slice(first, last).map(id => createArtistListItem(artistDataStore[id], artistDataStore[id].rank, artistCoordinates(id) !== null)).join('');
+artistListContainer.innerHTML = `<div class="artist-list-spacer" style="height:${first * rowHeight}px"></div>${rows}<div class="artist-list-spacer" style="height:${(ids.length - last) * rowHeight}px"></div>`;
+if (artistListView.activeId) {
+const activeItem = artistListContainer.querySelector(`.artist-list-item[data-artist-id="${CSS.escape(artistListView.activeId)}"]`);
+if (activeItem) activeItem.classList.add('active');
+}
+if (!artistListView.rowHeight) measureArtistListRow();
+}
+
+// Rows have a fixed layout, so one measured row gives the height of all of them
+function measureArtistListRow() {
+const row = artistListContainer.querySelector('.artist-list-item');
+if (!row) return;
+const style = getComputedStyle(row);
+const height = row.offsetHeight + parseFloat(style.marginTop) + parseFloat(style.marginBottom);
+if (height > 0) {
+artistListView.rowHeight = height;
+artistListView.renderedWindow = '';
+scheduleArtistListRender();
+}
+}
+
+function handleArtistListResize() {
+artistListView.rowHeight = 0; // media queries change the row padding and image size
+artistListView.renderedWindow = '';
+scheduleArtistListRender();
 }
 
 // --- Map Layer Management ---
@@ -376,46 +623,32 @@ paint: {
 addMapLayerEventHandlers();
 }
 
-function removeArtistLayersAndSource() {
-if (!map) return;
-console.log("Removing existing artist layers and source.");
-removeMapLayerEventHandlers();
+function closeArtistPopups() {
 if (currentClickPopup) { currentClickPopup.remove(); currentClickPopup = null; }
 if (currentHoverPopup) { currentHoverPopup.remove(); currentHoverPopup = null; }
 hoveredArtistFeatureId = null;
-const layersToRemove = [ UNCLUSTERED_POINT_LAYER_ID_ICON, CLUSTER_LAYER_ID_COUNT, CLUSTER_LAYER_ID_CIRCLE ];
-layersToRemove.forEach(layerId => { if (map.getLayer(layerId)) { try { map.removeLayer(layerId); } catch (e) { console.warn(`Error removing layer ${layerId}:`, e.message); } } });
-if (map.getSource(ARTIST_SOURCE_ID)) { try { map.removeSource(ARTIST_SOURCE_ID); } catch (e) { console.warn(`Error removing source ${ARTIST_SOURCE_ID}:`, e.message); } }
-console.log("Finished removing layers and source.");
 }
 
 // --- Map Interaction Handlers ---
+// Registered once, with the layers; the layers and their source live for the whole page.
 function addMapLayerEventHandlers() {
-if (!map) return;
+if (!map || artistLayerHandlersAdded) return;
+artistLayerHandlersAdded = true;
 map.on('click', CLUSTER_LAYER_ID_CIRCLE, handleClusterClick);
 map.on('click', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointClick);
 map.on('mouseenter', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointMouseEnter);
 map.on('mouseleave', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointMouseLeave);
 map.on('mouseenter', CLUSTER_LAYER_ID_CIRCLE, handleClusterMouseEnterSimple);
 map.on('mouseleave', CLUSTER_LAYER_ID_CIRCLE, handleClusterMouseLeaveSimple);
-map.on('mouseenter', CLUSTER_LAYER_ID_CIRCLE, () => { map.getCanvas().style.cursor = 'pointer'; });
-map.on('mouseenter', UNCLUSTERED_POINT_LAYER_ID_ICON, () => { map.getCanvas().style.cursor = 'pointer'; });
-map.on('mouseleave', CLUSTER_LAYER_ID_CIRCLE, () => { map.getCanvas().style.cursor = ''; });
-map.on('mouseleave', UNCLUSTERED_POINT_LAYER_ID_ICON, () => { map.getCanvas().style.cursor = ''; });
+map.on('mouseenter', CLUSTER_LAYER_ID_CIRCLE, setPointerCursor);
+map.on('mouseenter', UNCLUSTERED_POINT_LAYER_ID_ICON, setPointerCursor);
+map.on('mouseleave', CLUSTER_LAYER_ID_CIRCLE, resetCursor);
+map.on('mouseleave', UNCLUSTERED_POINT_LAYER_ID_ICON, resetCursor);
 console.log("Added map layer event handlers.");
 }
 
-function removeMapLayerEventHandlers() {
-if (!map) return;
-map.off('click', CLUSTER_LAYER_ID_CIRCLE, handleClusterClick);
-map.off('click', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointClick);
-map.off('mouseenter', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointMouseEnter);
-map.off('mouseleave', UNCLUSTERED_POINT_LAYER_ID_ICON, handleUnclusteredPointMouseLeave);
-map.off('mouseenter', CLUSTER_LAYER_ID_CIRCLE, handleClusterMouseEnterSimple);
-map.off('mouseleave', CLUSTER_LAYER_ID_CIRCLE, handleClusterMouseLeaveSimple);
-try { map.getCanvas().style.cursor = ''; } catch (e) { console.warn("Could not reset map cursor style:", e.message); }
-console.log("Removed map layer event handlers.");
-}
+function setPointerCursor() { map.getCanvas().style.cursor = 'pointer'; }
+function resetCursor() { map.getCanvas().style.cursor = ''; }
 
 // --- Specific Event Handler Functions ---
 function handleClusterClick(e) {
@@ -553,7 +786,7 @@ const popupHTML = createArtistPopupContent(artist);
 if (currentClickPopup) currentClickPopup.remove();
 currentClickPopup = new mapboxgl.Popup({ offset: POPUP_OFFSET_POINT, closeButton: true, maxWidth: POPUP_MAX_WIDTH })
 .setLngLat(coordinates).setHTML(popupHTML).addTo(map);
-highlightListItem(artist.id);
+highlightListItem(lookupId);
 }
 
 // --- Hover Handlers ---
@@ -637,15 +870,21 @@ flashTimeoutId = null;
 }, duration);
 }
 
+// Rows out of view are not rendered: scroll to the artist's row, which is marked active when it renders.
 function highlightListItem(artistId) {
 if (!artistListContainer) return;
+artistListView.activeId = artistId;
 const currentActive = artistListContainer.querySelector('.artist-list-item.active');
 if (currentActive) currentActive.classList.remove('active');
-const listItem = artistListContainer.querySelector(`.artist-list-item[data-artist-id="${artistId}"]`);
-if (listItem) {
-listItem.classList.add('active');
-listItem.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
-}
+const index = artistListView.ids.indexOf(artistId);
+if (index < 0) return;
+const rowHeight = artistListView.rowHeight || ARTIST_LIST_ROW_ESTIMATE_PX;
+const rowTop = index * rowHeight;
+const { scrollTop, clientHeight } = artistListContainer;
+if (rowTop < scrollTop) artistListContainer.scrollTo({ top: rowTop, behavior: 'smooth' });
+else if (rowTop + rowHeight > scrollTop + clientHeight) artistListContainer.scrollTo({ top: rowTop + rowHeight - clientHeight, behavior: 'smooth' });
+const listItem = artistListContainer.querySelector(`.artist-list-item[data-artist-id="${CSS.escape(artistId)}"]`);
+if (listItem) listItem.classList.add('active');
 }
 
 // --- List Interaction ---
@@ -656,8 +895,8 @@ const artistId = listItem.dataset.artistId;
 console.log(`List item clicked: ${artistId}`);
 highlightListItem(artistId);
 const artist = artistDataStore[artistId];
-if (artist && isValidCoordinate(artist.lat) && isValidCoordinate(artist.lon)) {
-const coords = [parseFloat(artist.lon), parseFloat(artist.lat)];
+const coords = artistCoordinates(artistId);
+if (artist && coords) {
 map.flyTo({ center: coords, zoom: Math.max(map.getZoom(), FLY_TO_ZOOM_UNCLUSTERED), speed: FLY_TO_SPEED, essential: true });
 setTimeout(() => {
 if (map && map.getSource(ARTIST_SOURCE_ID)) {
@@ -675,18 +914,19 @@ if (currentClickPopup) currentClickPopup.remove();
 }
 
 // --- HTML Generation ---
-// (Keep existing functions createArtistListItem, createArtistPopupContent, createClusterPopupContent, addClusterPopupEventListeners - unchanged from v3.4)
-function createArtistListItem(artist, rank) { const artistName = artist.name || 'Unknown Artist'; const artistId = artist.id; const imageUrl = artist.image_url || PLACEHOLDER_IMG_URL; const hasLocation = isValidCoordinate(artist.lat) && isValidCoordinate(artist.lon); const originText = hasLocation ? (artist.origin || 'Origin Unknown') : `${artist.origin || 'Origin Unknown'} (Location unavailable)`; let genresListText = 'No genre data'; if (Array.isArray(artist.genres) && artist.genres.length > 0) { genresListText = artist.genres.slice(0, 3).join(', '); if (artist.genres.length > 3) genresListText += '...'; } const genresTitle = Array.isArray(artist.genres) ? artist.genres.join(', ') : ''; let spotifyLinkHtml = ''; const spotifyUrl = artist.spotify_url || (artist.uri && artist.uri.includes(':') ? `https://open.spotify.com/$${artist.uri.split(':')[1]}/${artist.uri.split(':')[2]}` : null); if (spotifyUrl && spotifyUrl !== 'null') { spotifyLinkHtml = `<a href="${spotifyUrl}" target="_blank" title="Open ${artistName} on Spotify" class="spotify-play-icon" onclick="event.stopPropagation();" aria-label="Open ${artistName} on Spotify"><i class="fab fa-spotify" aria-hidden="true"></i></a>`; } return ` <div class="artist-list-item" data-artist-id="${artistId}" role="listitem" tabindex="0" aria-label="Artist: ${artistName}, Rank ${rank}"> <div class="artist-rank" aria-hidden="true">${rank}</div> <img src="${imageUrl}" class="artist-list-image" alt="Image of ${artistName}" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMG_URL}'"> <div class="artist-info"> <span class="artist-name">${artistName}</span> <span class="artist-origin" title="${artist.origin || 'Origin Unknown'}"> <i class="fas fa-map-marker-alt" aria-hidden="true"></i> ${originText} </span> <span class="artist-genres" title="${genresTitle}"> <i class="fas fa-tag" aria-hidden="true"></i> ${genresListText} </span> </div> <div class="artist-actions"> ${spotifyLinkHtml} </div> </div>`; }
+// Built on demand: list rows as they scroll into view, popups when clicked.
+function createArtistListItem(artist, rank, hasLocation) { const artistName = artist.name || 'Unknown Artist'; const artistId = artist.artistId; const imageUrl = artist.image_url || PLACEHOLDER_IMG_URL; const originText = hasLocation ? (artist.origin || 'Origin Unknown') : `${artist.origin || 'Origin Unknown'} (Location unavailable)`; let genresListText = 'No genre data'; if (Array.isArray(artist.genres) && artist.genres.length > 0) { genresListText = artist.genres.slice(0, 3).join(', '); if (artist.genres.length > 3) genresListText += '...'; } const genresTitle = Array.isArray(artist.genres) ? artist.genres.join(', ') : ''; let spotifyLinkHtml = ''; const spotifyUrl = artist.spotify_url || (artist.uri && artist.uri.includes(':') ? `https://open.spotify.com/$${artist.uri.split(':')[1]}/${artist.uri.split(':')[2]}` : null); if (spotifyUrl && spotifyUrl !== 'null') { spotifyLinkHtml = `<a href="${spotifyUrl}" target="_blank" title="Open ${artistName} on Spotify" class="spotify-play-icon" onclick="event.stopPropagation();" aria-label="Open ${artistName} on Spotify"><i class="fab fa-spotify" aria-hidden="true"></i></a>`; } return ` <div class="artist-list-item" data-artist-id="${artistId}" role="listitem" tabindex="0" aria-label="Artist: ${artistName}, Rank ${rank}"> <div class="artist-rank" aria-hidden="true">${rank}</div> <img src="${imageUrl}" class="artist-list-image" alt="Image of ${artistName}" loading="lazy" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMG_URL}'"> <div class="artist-info"> <span class="artist-name">${artistName}</span> <span class="artist-origin" title="${artist.origin || 'Origin Unknown'}"> <i class="fas fa-map-marker-alt" aria-hidden="true"></i> ${originText} </span> <span class="artist-genres" title="${genresTitle}"> <i class="fas fa-tag" aria-hidden="true"></i> ${genresListText} </span> </div> <div class="artist-actions"> ${spotifyLinkHtml} </div> </div>`; }
 function createArtistPopupContent(artist) { const artistName = artist.name || 'Unknown Artist'; const imageUrl = artist.image_url || PLACEHOLDER_IMG_URL; const originText = artist.origin || 'Origin unknown'; let spotifyUrl = artist.spotify_url; let genresText = 'N/A'; if (Array.isArray(artist.genres) && artist.genres.length > 0) { genresText = artist.genres.join(', '); } let spotifySectionHtml = ''; if (artist.uri && artist.uri.includes(':')) { const uriParts = artist.uri.split(':'); if (uriParts.length === 3 && ['artist', 'track', 'album'].includes(uriParts[1])) { const embedType = uriParts[1]; const embedId = uriParts[2]; const embedSrc = `https://open.spotify.com/embed/${embedType}/${embedId}?utm_source=generator&theme=0`; spotifySectionHtml = ` <div class="spotify-embed-container"> <iframe style="border-radius:12px" src="${embedSrc}" width="100%" height="80" frameBorder="0" allowfullscreen="" allow="autoplay; clipboard-write; encrypted-media; fullscreen; picture-in-picture" loading="lazy" title="Spotify Embed for ${artistName}"> </iframe> </div>`; } } if (!spotifySectionHtml) { if (!spotifyUrl && artist.uri && artist.uri.includes(':')) { const uriParts = artist.uri.split(':'); if (uriParts.length === 3) { spotifyUrl = `https://open.spotify.com/${uriParts[1]}/${uriParts[2]}`; } } if (spotifyUrl && spotifyUrl !== 'null') { spotifySectionHtml = ` <a href="${spotifyUrl}" target="_blank" class="popup-spotify-link"> <i class="fab fa-spotify" aria-hidden="true"></i> Listen on Spotify </a>`; } } return ` <div class="popup-header"> <img src="${imageUrl}" class="popup-artist-image" alt="${artistName}" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMG_URL}'"> </div> <div class="popup-content"> <h3 class="popup-artist-name">${artistName}</h3> <div class="popup-artist-origin"> <i class="fas fa-map-marker-alt" aria-hidden="true"></i> ${originText} </div> <div class="popup-artist-genres"> <i class="fas fa-tag" aria-hidden="true"></i> Genres: <small>${genresText}</small> </div> ${spotifySectionHtml} </div>`; }
-function createClusterPopupContent(artists, totalCount) { let listHtml = artists.map((artist, index) => { const rank = artist.rank || index + 1; const imageUrl = artist.image_url || PLACEHOLDER_IMG_URL; const artistName = artist.name || 'Unknown Artist'; const spotifyUrl = artist.spotify_url || (artist.uri && artist.uri.includes(':') ? `https://open.spotify.com/${artist.uri.split(':')[1]}/${artist.uri.split(':')[2]}` : null); let spotifyLinkHtml = ''; if (spotifyUrl && spotifyUrl !== 'null') { spotifyLinkHtml = `<a href="${spotifyUrl}" target="_blank" class="cluster-spotify-link" title="Open ${artistName} on Spotify" onclick="event.stopPropagation();"><i class="fab fa-spotify"></i></a>`; } return ` <div class="cluster-artist-item" data-artist-id="${artist.id}" role="button" tabindex="0"> <span class="cluster-artist-rank">${rank}</span> <img src="${imageUrl}" class="cluster-artist-img" alt="${artistName}" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMG_URL}'"> <div class="cluster-artist-info"> <span class="cluster-artist-name">${artistName}</span> ${spotifyLinkHtml} </div> </div> `; }).join(''); return ` <div class="popup-title">${totalCount} Artists</div> <div class="artist-cluster-list"> ${listHtml} </div> `; }
-function addClusterPopupEventListeners(popupInstance, artistsInCluster) { const popupElement = popupInstance.getElement(); if (!popupElement) return; const items = popupElement.querySelectorAll('.cluster-artist-item'); items.forEach(item => { item.addEventListener('click', (e) => { const artistId = e.currentTarget.dataset.artistId; if (!artistId) return; console.log(`Cluster popup item clicked: ${artistId}`); const artist = artistDataStore[artistId]; if (artist && isValidCoordinate(artist.lat) && isValidCoordinate(artist.lon)) { const coords = [parseFloat(artist.lon), parseFloat(artist.lat)]; if (currentClickPopup) currentClickPopup.remove(); map.flyTo({ center: coords, zoom: FLY_TO_ZOOM_UNCLUSTERED + 1, speed: FLY_TO_SPEED, essential: true }); setTimeout(() => { if (map && map.getSource(ARTIST_SOURCE_ID)) { const popupHTML = createArtistPopupContent(artist); currentClickPopup = new mapboxgl.Popup({ offset: POPUP_OFFSET_POINT, closeButton: true, maxWidth: POPUP_MAX_WIDTH }).setLngLat(coords).setHTML(popupHTML).addTo(map); highlightListItem(artistId); } }, 600); } else { showFlashMessage("Selected artist location not available.", 2000); } }); }); }
+function createClusterArtistItem(artist, index) { const rank = artist.rank || index + 1; const imageUrl = artist.image_url || PLACEHOLDER_IMG_URL; const artistName = artist.name || 'Unknown Artist'; const spotifyUrl = artist.spotify_url || (artist.uri && artist.uri.includes(':') ? `https://open.spotify.com/${artist.uri.split(':')[1]}/${artist.uri.split(':')[2]}` : null); let spotifyLinkHtml = ''; if (spotifyUrl && spotifyUrl !== 'null') { spotifyLinkHtml = `<a href="${spotifyUrl}" target="_blank" class="cluster-spotify-link" title="Open ${artistName} on Spotify" onclick="event.stopPropagation();"><i class="fab fa-spotify"></i></a>`; } return ` <div class="cluster-artist-item" data-artist-id="${artist.artistId}" role="button" tabindex="0"> <span class="cluster-artist-rank">${rank}</span> <img src="${imageUrl}" class="cluster-artist-img" alt="${artistName}" loading="lazy" onerror="this.onerror=null; this.src='${PLACEHOLDER_IMG_URL}'"> <div class="cluster-artist-info"> <span class="cluster-artist-name">${artistName}</span> ${spotifyLinkHtml} </div> </div> `; }
+function createClusterPopupContent(artists, totalCount) { const listHtml = artists.slice(0, CLUSTER_POPUP_PAGE_SIZE).map(createClusterArtistItem).join(''); return ` <div class="popup-title">${totalCount} Artists</div> <div class="artist-cluster-list"> ${listHtml} </div> `; }
+// One delegated click listener per popup; further rows are built when the list is scrolled to its end.
+function addClusterPopupEventListeners(popupInstance, artistsInCluster) { const popupElement = popupInstance.getElement(); const list = popupElement && popupElement.querySelector('.artist-cluster-list'); if (!list) return; let rendered = Math.min(CLUSTER_POPUP_PAGE_SIZE, artistsInCluster.length); list.addEventListener('scroll', () => { if (rendered >= artistsInCluster.length || list.scrollTop + list.clientHeight < list.scrollHeight - 40) return; const page = artistsInCluster.slice(rendered, rendered + CLUSTER_POPUP_PAGE_SIZE); list.insertAdjacentHTML('beforeend', page.map((artist, i) => createClusterArtistItem(artist, rendered + i)).join('')); rendered += page.length; }, { passive: true }); list.addEventListener('click', (e) => { const item = e.target.closest('.cluster-artist-item'); const artistId = item && item.dataset.artistId; if (!artistId) return; console.log(`Cluster popup item clicked: ${artistId}`); const artist = artistDataStore[artistId]; const coords = artistCoordinates(artistId); if (artist && coords) { if (currentClickPopup) currentClickPopup.remove(); map.flyTo({ center: coords, zoom: FLY_TO_ZOOM_UNCLUSTERED + 1, speed: FLY_TO_SPEED, essential: true }); setTimeout(() => { if (map && map.getSource(ARTIST_SOURCE_ID)) { const popupHTML = createArtistPopupContent(artist); currentClickPopup = new mapboxgl.Popup({ offset: POPUP_OFFSET_POINT, closeButton: true, maxWidth: POPUP_MAX_WIDTH }).setLngLat(coords).setHTML(popupHTML).addTo(map); highlightListItem(artistId); } }, 600); } else { showFlashMessage("Selected artist location not available.", 2000); } }); }
 
 // --- Image Processing ---
 function createCircularImage(imageUrl, iconId) { return new Promise((resolve, reject) => { if (loadedImageIds.has(iconId) || (map && map.hasImage(iconId))) { resolve(iconId); return; } const img = new Image(); img.crossOrigin = "anonymous"; img.onload = () => { try { const canvas = document.createElement('canvas'); const size = ICON_SIZE_PX; canvas.width = size; canvas.height = size; const ctx = canvas.getContext('2d'); ctx.beginPath(); ctx.arc(size / 2, size / 2, size / 2, 0, Math.PI * 2, true); ctx.closePath(); ctx.clip(); ctx.drawImage(img, 0, 0, size, size); if (ICON_BORDER_WIDTH_PX > 0) { ctx.beginPath(); ctx.arc(size / 2, size / 2, size / 2 - ICON_BORDER_WIDTH_PX / 2, 0, Math.PI * 2, true); ctx.closePath(); ctx.strokeStyle = '#ffffff'; ctx.lineWidth = ICON_BORDER_WIDTH_PX; ctx.stroke(); } const imageData = ctx.getImageData(0, 0, size, size); if (map && map.isStyleLoaded() && !map.hasImage(iconId)) { map.addImage(iconId, imageData, { sdf: false }); loadedImageIds.add(iconId); resolve(iconId); } else if (!map || !map.isStyleLoaded()) { console.warn(`Map not ready when trying to add image ${iconId}.`); resolve(iconId); } else { resolve(iconId); } } catch (error) { console.error(`Error processing image for ${iconId}:`, error); reject(error); } }; img.onerror = (error) => { console.warn(`Failed to load image URL: ${imageUrl} for icon ID: ${iconId}`); reject(new Error(`Image load failed`)); }; img.src = imageUrl; }); }
 
 // --- Utility Functions ---
-function generateIconId(artist) { const spotifyId = artist.uri ? artist.uri.split(':').pop() : null; if (spotifyId) return `artist-icon-${spotifyId}`; const safeName = (artist.name || 'unknown').replace(/[^a-zA-Z0-9]/g, '_').toLowerCase(); return `artist-icon-${safeName}-${artist.id}`; }
-function isValidCoordinate(coord) { const num = parseFloat(coord); return coord != null && !isNaN(num) && isFinite(num); }
+function generateIconId(artist) { const spotifyId = artist.uri ? artist.uri.split(':').pop() : null; if (spotifyId) return `artist-icon-${spotifyId}`; const safeName = (artist.name || 'unknown').replace(/[^a-zA-Z0-9]/g, '_').toLowerCase(); return `artist-icon-${safeName}-${artist.artistId}`; }
 function fitBoundsToGeoJSON(geojson) { if (!map || !geojson || !geojson.features || geojson.features.length === 0) return; try { const bounds = new mapboxgl.LngLatBounds(); geojson.features.forEach(feature => { if (feature.geometry && feature.geometry.type === 'Point' && feature.geometry.coordinates) { bounds.extend(feature.geometry.coordinates); } }); if (!bounds.isEmpty()) { map.fitBounds(bounds, { padding: calculatePadding(), maxZoom: CLUSTER_MAX_ZOOM + 1, duration: 1000, essential: true }); } } catch (error) { console.error("Error calculating or fitting map bounds:", error); } }
 function calculatePadding(isPopupOpen = false) { const panelWidth = document.getElementById('artist-panel')?.offsetWidth || 0; const isMobile = window.innerWidth <= parseInt(getComputedStyle(document.documentElement).getPropertyValue('--mobile-breakpoint') || '992px'); const defaultPadding = 50; const panelPadding = isMobile ? defaultPadding : Math.max(defaultPadding, panelWidth + 20); const popupPaddingIncrease = isPopupOpen ? 30 : 0; return { top: defaultPadding + popupPaddingIncrease, bottom: defaultPadding + 30, left: panelPadding, right: defaultPadding + popupPaddingIncrease }; }
 
@@ -0,0 +1,12 @@
+"""
+Unit tests for the backend's standalone modules.
+
+    cd music-map-phase1/backend && python -m pytest tests
+
+None of them import app.py, so spotipy and the upstream clients are not needed
+(test_session_store needs Flask).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import pytest
+
+from artist_keys import (ArtistKeys, canonical_key, display_name, entry_spotify_id, normalize_name, spotify_artist_id,
+                         spotify_key)
+
+X, Y = 'XXXXXXXXXXXXXXXXXXXXXX', 'YYYYYYYYYYYYYYYYYYYYYY'
+
+
+def entry(**data):
+    return {'data': data, 'timestamp': '2026-01-01T00:00:00'}
+
+
+@pytest.fixture
+def keys():
+    moves = []
+    keys = ArtistKeys({}, on_move=lambda store, old, new, moved: moves.append((old, new)))
+    keys.moves = moves
+    return keys
+
+
+def test_canonical_keys():
+    assert normalize_name(' Björk ') == normalize_name('BJORK') == 'bjork'
+    assert canonical_key('Björk') == 'name:bjork'
+    assert canonical_key('Björk', X) == spotify_key(X) == f'spotify:artist:{X}'
+
+
+def test_spotify_ids_from_urls_uris_and_entries():
+    assert spotify_artist_id({'spotify_url': f'https://open.spotify.com/artist/{X}?si=1'}) == X
+    assert spotify_artist_id({'uri': f'spotify:artist:{Y}'}) == Y
+    assert spotify_artist_id({'uri': 'spotify:track:abc'}) is None
+    assert spotify_artist_id(None) is None
+    assert entry_spotify_id(entry(spotify_id=X)) == X
+    assert entry_spotify_id(entry(uri=f'spotify:artist:{Y}')) == Y
+    assert entry_spotify_id(entry(name='Solo')) is None
+
+
+def test_display_name():
+    assert display_name(spotify_key(X), entry(name='Twin')) == 'Twin'
+    assert display_name('Legacy Name', entry()) == 'Legacy Name'
+    assert display_name(spotify_key(X), entry()) is None
+
+
+def test_alias_index(keys):
+    keys.remember(spotify_key(X), name='Björk', mbid='mb-1')
+    assert keys.lookup('name:bjork') == keys.lookup('mbid:mb-1') == spotify_key(X)
+    assert keys.candidates('BJORK') == ['name:bjork', spotify_key(X), 'BJORK']
+    assert keys.candidates('Björk', mbid='mb-1') == ['name:bjork', spotify_key(X), 'Björk']
+    # Given another ID, the name alias points at a different artist of the same name
+    assert keys.candidates('Björk', Y) == [spotify_key(Y), 'name:bjork', 'Björk']
+
+
+def test_canonical_entry_is_found_without_moving(keys):
+    store = {spotify_key(X): entry(name='Twin')}
+    assert keys.locate(store, 'Twin', X) == spotify_key(X)
+    assert keys.locate({}, 'Twin', X) == spotify_key(X)
+    assert keys.locate({}, 'Twin') == 'name:twin'
+    assert keys.migrated == 0 and keys.moves == []
+
+
+def test_legacy_entry_moves_to_the_canonical_key(keys):
+    store = {'Twin': entry(name='Twin', mbid='mb-1')}
+    assert keys.locate(store, 'Twin', X) == spotify_key(X)
+    assert list(store) == [spotify_key(X)]
+    assert keys.lookup('name:twin') == keys.lookup('mbid:mb-1') == spotify_key(X)
+    assert keys.moves == [('Twin', spotify_key(X))] and keys.migrated == 1
+    assert keys.locate(store, 'twin') == spotify_key(X)  # later name-only lookups follow the alias
+
+
+def test_namesake_entry_is_not_taken_over(keys):
+    store = {'Twin': entry(name='Twin', uri=f'spotify:artist:{X}')}
+    assert keys.locate(store, 'Twin', Y) == spotify_key(Y)
+    assert list(store) == ['Twin'] and keys.moves == []
+    assert keys.locate(store, 'Twin', X) == spotify_key(X)
+    assert list(store) == [spotify_key(X)]
+
+
+def test_name_only_lookup_moves_an_entry_to_the_id_it_records(keys):
+    store = {'Solo': entry(name='Solo', spotify_id=X)}
+    assert keys.locate(store, 'Solo') == spotify_key(X)
+    assert list(store) == [spotify_key(X)]
+    assert keys.lookup('name:solo') == spotify_key(X)
+
+
+def test_move_never_overwrites_an_existing_canonical_entry(keys):
+    store = {'name:twin': entry(name='Twin', origin='old'), spotify_key(X): entry(name='Twin', origin='new')}
+    keys.remember(spotify_key(X), name='Twin')
+    assert keys.locate(store, 'Twin') == spotify_key(X)
+    assert store[spotify_key(X)]['data']['origin'] == 'new'
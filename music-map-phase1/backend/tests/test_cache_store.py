@@ -0,0 +1,89 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from cache_store import CacheStore, JsonFileStore, SQLiteCacheDatabase
+
+
+def entry(data, age_seconds=0):
+    return {'data': data, 'timestamp': (datetime.now() - timedelta(seconds=age_seconds)).isoformat()}
+
+
+@pytest.fixture
+def db(tmp_path):
+    return SQLiteCacheDatabase(str(tmp_path / 'cache.sqlite3'))
+
+
+def test_sqlite_upsert_replaces_entry(db):
+    store = db.store('geocode')
+    store['Helsinki'] = entry({'lat': 1})
+    store['Helsinki'] = entry({'lat': 2})
+    assert store['Helsinki']['data'] == {'lat': 2}
+    assert len(store) == 1
+
+
+def test_sqlite_namespaces_are_separate(db):
+    db.store('geocode')['x'] = entry(1)
+    assert db.store('wikipedia').get('x') is None
+    assert 'x' in db.store('geocode')
+
+
+def test_sqlite_get_fresh_respects_ttl(db):
+    store = db.store('geocode')
+    store['new'] = entry('new', age_seconds=10)
+    store['old'] = entry('old', age_seconds=3600)
+    assert store.get_fresh('new', 60)['data'] == 'new'
+    assert store.get_fresh('old', 60) is None
+    assert store.get_fresh('missing', 60) is None
+
+
+def test_sqlite_update_many_keep_newer(db):
+    store = db.store('musicbrainz')
+    store['a'] = entry('current', age_seconds=10)
+    store.update_many([('a', entry('stale', age_seconds=100)), ('b', entry('added'))], keep_newer=True)
+    assert store['a']['data'] == 'current'
+    assert store['b']['data'] == 'added'
+    store.update_many([('a', entry('stale', age_seconds=100))])
+    assert store['a']['data'] == 'stale'
+
+
+def test_sqlite_update_many_rolls_back_on_error(db):
+    store = db.store('musicbrainz')
+    with pytest.raises(KeyError):
+        store.update_many([('a', entry(1)), ('b', {'data': 2})])  # no timestamp
+    assert len(store) == 0
+
+
+def test_json_flush_replaces_file_and_skips_unchanged(tmp_path):
+    path = tmp_path / 'cache.json'
+    store = JsonFileStore(str(path))
+    store['a'] = entry(1)
+    store.flush()
+    assert json.loads(path.read_text())['a']['data'] == 1
+    mtime = os.stat(path).st_mtime_ns
+    store.flush()
+    assert os.stat(path).st_mtime_ns == mtime
+    assert os.listdir(tmp_path) == ['cache.json']  # no temporary file left behind
+    assert JsonFileStore(str(path))['a']['data'] == 1
+
+
+def test_json_flush_failure_keeps_previous_file(tmp_path):
+    path = tmp_path / 'cache.json'
+    store = JsonFileStore(str(path))
+    store['a'] = entry(1)
+    store.flush()
+    store['b'] = entry(object())  # not JSON serializable
+    store.flush()
+    assert set(json.loads(path.read_text())) == {'a'}
+    assert os.listdir(tmp_path) == ['cache.json']
+
+
+def test_incomplete_store_fails_when_created():
+    class GetOnly(CacheStore):
+        def get(self, key, default=None):
+            return default
+
+    with pytest.raises(TypeError):
+        GetOnly()
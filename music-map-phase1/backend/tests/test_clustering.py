@@ -0,0 +1,85 @@
+import pytest
+
+from clustering import ClusterIndex
+
+WORLD = (-180, -85, 180, 85)
+UUSIMAA = (24, 59.5, 26, 61)  # small enough for any zoom
+HELSINKI, ESPOO, TOKYO = (24.94, 60.17), (24.66, 60.21), (139.69, 35.69)
+
+
+def index_of(**points):
+    index = ClusterIndex(max_zoom=10)
+    for point_id, (lon, lat) in points.items():
+        index.add(point_id, lon, lat, {'name': point_id.title()})
+    return index
+
+
+def clusters_by_id(index, bbox, zoom):
+    return {feature['id']: feature for feature in index.clusters(bbox, zoom)}
+
+
+def test_nearby_points_share_a_cell_until_zoomed_in():
+    index = index_of(helsinki=HELSINKI, espoo=ESPOO, tokyo=TOKYO)
+    features = index.clusters(WORLD, 2)
+    clusters = [f for f in features if f['properties'].get('cluster')]
+    assert len(features) == 2 and len(clusters) == 1
+    cluster = clusters[0]['properties']
+    assert cluster['point_count'] == 2 and cluster['sample'] in ('Helsinki', 'Espoo')
+    assert 'tokyo' in {f['id'] for f in features}
+    expansion = cluster['expansion_zoom']
+    assert expansion <= 10
+    (merged,) = index.clusters(UUSIMAA, expansion - 1)
+    assert merged['properties']['point_count'] == 2
+    assert set(clusters_by_id(index, UUSIMAA, expansion)) == {'helsinki', 'espoo'}
+
+
+def test_same_coordinates_stay_clustered_and_page_as_leaves():
+    index = index_of(a=HELSINKI, b=HELSINKI, c=HELSINKI)
+    (feature,) = index.clusters(UUSIMAA, 10)
+    assert feature['properties']['expansion_zoom'] == 11
+    total, page = index.leaves(feature['id'], limit=2)
+    assert total == 3 and [leaf['id'] for leaf in page] == ['a', 'b']
+    assert [leaf['id'] for leaf in index.leaves(feature['id'], limit=2, offset=2)[1]] == ['c']
+    assert index.leaves('10/0/0') is None
+
+
+def test_incremental_move_and_remove_update_every_level():
+    index = index_of(helsinki=HELSINKI, espoo=ESPOO)
+    index.add('espoo', *TOKYO, {'name': 'Espoo'})
+    assert set(clusters_by_id(index, WORLD, 0)) == {'helsinki', 'espoo'}
+    index.remove('espoo')
+    index.remove('missing')
+    assert len(index) == 1 and set(clusters_by_id(index, WORLD, 0)) == {'helsinki'}
+    index.remove('helsinki')
+    assert index.clusters(WORLD, 0) == []
+    assert all(count == 0 for count in index.stats()['cells'].values())
+
+
+def test_bbox_crossing_the_antimeridian():
+    index = index_of(fiji=(178.4, -18.1), samoa=(-171.8, -13.8), tokyo=TOKYO)
+    assert set(clusters_by_id(index, (170, -30, -165, 0), 3)) == {'fiji', 'samoa'}
+    assert set(clusters_by_id(index, (-165, -30, 170, 40), 3)) == {'tokyo'}
+
+
+def test_zoom_is_floored_and_clamped():
+    index = index_of(helsinki=HELSINKI, espoo=ESPOO)
+    assert index.clusters(WORLD, 2.9) == index.clusters(WORLD, 2)
+    assert index.clusters(WORLD, -3) == index.clusters(WORLD, 0)
+    assert index.clusters(UUSIMAA, 99) == index.clusters(UUSIMAA, 10)
+
+
+@pytest.mark.parametrize('bbox, zoom', [
+    (WORLD, float('inf')),
+    (WORLD, float('1e400')),
+    (WORLD, float('nan')),
+    ((float('-inf'), -85, 180, 85), 3),
+])
+def test_non_finite_bbox_or_zoom_is_a_value_error(bbox, zoom):
+    with pytest.raises(ValueError):
+        index_of(helsinki=HELSINKI).clusters(bbox, zoom)
+
+
+def test_oversized_bbox_is_rejected():
+    index = ClusterIndex(max_zoom=16, max_cells=100)
+    with pytest.raises(ValueError):
+        index.clusters(WORLD, 12)
@@ -0,0 +1,93 @@
+import pytest
+
+from gazetteer import Gazetteer, normalize_place_name
+
+COUNTRIES = """# iso2\tname\tlatitude\tlongitude\talternate names
+FI\tFinland\t61.92411\t25.748151\tSuomi
+GE\tGeorgia\t42.315407\t43.356892\t
+SE\tSweden\t60.128161\t18.643501\t
+US\tUnited States\t37.09024\t-95.712891\tUSA,United States of America
+"""
+REGIONS = """# iso2\tname\tlatitude\tlongitude\talternate names
+US\tGeorgia\t33.040619\t-83.643074\tGA
+US\tMaine\t44.693947\t-69.381927\tME
+US\tOregon\t44.572021\t-122.070938\tOR
+"""
+CITIES = """# name\tasciiname\talternatenames\tlatitude\tlongitude\tcountry code\tadmin1\tpopulation
+Helsinki\tHelsinki\tHelsingfors\t60.16952\t24.93545\tFI\t\t658864
+Malmö\tMalmo\t\t55.60587\t13.00073\tSE\t\t301706
+Portland\tPortland\t\t45.52345\t-122.67621\tUS\tOregon\t652503
+Portland\tPortland\t\t43.66147\t-70.25533\tUS\tMaine\t68408
+Athens\tAthens\t\t33.96095\t-83.37794\tUS\tGA\t127315
+Tinytown\tTinytown\t\t50.0\t10.0\tFI\t\t12
+"""
+GEONAMES_ROW = "\t".join(["5746545", "Salem", "Salem", "Salem Oregon", "44.9429", "-123.0351", "P", "PPLA", "US", "",
+                          "OR", "047", "", "", "175535", "", "46", "America/Los_Angeles", "2019-09-05"]) + "\n"
+
+
+@pytest.fixture
+def gazetteer(tmp_path):
+    files = {}
+    for name, text in (('countries', COUNTRIES), ('regions', REGIONS), ('cities', CITIES),
+                       ('geonames', GEONAMES_ROW)):
+        files[name] = tmp_path / f'{name}.tsv'
+        files[name].write_text(text, encoding='utf-8')
+    gazetteer = Gazetteer.load(str(files['countries']), str(files['regions']), str(files['cities']), min_population=100)
+    gazetteer._load_cities(str(files['geonames']), 0)
+    return gazetteer
+
+
+def name_of(gazetteer, query):
+    index = gazetteer.match(query)
+    return None if index is None else (gazetteer.names[index], gazetteer.country_codes[gazetteer.country[index]])
+
+
+def test_normalize_place_name():
+    assert normalize_place_name("  Malmö ") == normalize_place_name("MALMO") == "malmo"
+    assert normalize_place_name("St. John's") == "st john s"
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('Helsinki', ('Helsinki', 'FI')),
+    ('helsingfors', ('Helsinki', 'FI')),
+    ('Malmo, Sweden', ('Malmö', 'SE')),
+    ('FI', ('Finland', 'FI')),
+    ('Finland, FI', ('Finland', 'FI')),
+    ('USA', ('United States', 'US')),
+    ('Georgia', ('Georgia', 'GE')),        # a bare name prefers the broadest place
+    ('Athens, Georgia', ('Athens', 'US')),  # a qualified one the narrowest
+    ('Athens, GA, USA', ('Athens', 'US')),
+    ('Portland', ('Portland', 'US')),
+    ('Salem, Oregon', ('Salem', 'US')),     # GeoNames row, admin1 given as a code
+])
+def test_match(gazetteer, query, expected):
+    assert name_of(gazetteer, query) == expected
+
+
+def test_bare_name_picks_the_most_populous_and_qualifiers_disambiguate(gazetteer):
+    oregon, maine = gazetteer.match('Portland, Oregon'), gazetteer.match('Portland, ME')
+    assert oregon != maine
+    assert gazetteer.match('Portland') == oregon
+    assert gazetteer.match('Portland, Maine, United States') == maine
+
+
+@pytest.mark.parametrize('query', ['', ' , ', 'Atlantis', 'Portland, Finland', 'Helsinki, Oregon', 'OR', 'Tinytown'])
+def test_unknown_or_contradictory_queries_are_left_to_the_geocoder(gazetteer, query):
+    assert gazetteer.match(query) is None
+
+
+def test_hierarchy(gazetteer):
+    assert gazetteer.hierarchy('Portland, Oregon') == [
+        ('country', 'US', 'United States'), ('region', 'US:Oregon', 'Oregon'),
+        ('city', 'US:Oregon:Portland', 'Portland')]
+    assert gazetteer.hierarchy('Oregon') == [('country', 'US', 'United States'), ('region', 'US:Oregon', 'Oregon')]
+    assert gazetteer.hierarchy('Kallio, Helsinki, Finland') == [
+        ('country', 'FI', 'Finland'), ('city', 'FI:Helsinki', 'Helsinki')]
+    assert gazetteer.hierarchy('Nowhere, Atlantis') == []
+
+
+def test_lookup(gazetteer):
+    assert gazetteer.lookup('Helsinki, Finland') == {
+        'name': 'Helsinki', 'lat': 60.16952, 'lon': 24.93545, 'country': 'FI', 'kind': 'city'}
+    assert gazetteer.lookup('Maine')['kind'] == 'region'
+    assert gazetteer.lookup('Atlantis') is None
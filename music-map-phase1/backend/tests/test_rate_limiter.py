@@ -0,0 +1,65 @@
+import pytest
+
+from rate_limiter import TokenBucket, UpstreamRateLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen ``time.monotonic``; ``time.sleep`` advances it instead of sleeping."""
+    now = [100.0]
+    monkeypatch.setattr('rate_limiter.time.monotonic', lambda: now[0])
+    monkeypatch.setattr('rate_limiter.time.sleep', lambda seconds: now.__setitem__(0, now[0] + seconds))
+    return now
+
+
+def test_burst_is_free_then_reservations_queue_fifo(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0.5, 1.0, 1.5])
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve()
+    bucket.reserve()
+    clock[0] += 60
+    assert [bucket.reserve() for _ in range(3)] == pytest.approx([0, 0, 1.0])
+
+
+def test_elapsed_time_pays_down_the_queue(clock):
+    bucket = TokenBucket(rate=4, burst=1)
+    bucket.reserve()
+    assert bucket.reserve() == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert bucket.reserve() == pytest.approx(0.25)
+
+
+def test_max_wait_refuses_without_taking_a_token(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    bucket.reserve()
+    assert bucket.reserve(max_wait=0.5) is None
+    assert bucket.reserve(max_wait=1.0) == pytest.approx(1.0)  # the refusal did not join the queue
+    assert bucket.reserve(max_wait=1.5) is None
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_acquire_sleeps_and_records_waits(clock):
+    limiter = UpstreamRateLimiter({'mb': (1, 1)})
+    assert limiter.acquire('mb') == 0
+    assert limiter.acquire('mb') == pytest.approx(1.0)
+    assert clock[0] == pytest.approx(101.0)
+    assert limiter.acquire('mb', max_wait=0.1) is None
+    assert limiter.acquire('unlimited.example') == 0.0
+    stats = limiter.stats()['mb']
+    assert (stats['requests'], stats['refused'], stats['wait_max']) == (2, 1, 1.0)
+    assert stats['wait_mean'] == 0.5
+
+
+def test_concurrency_is_rate_times_latency_summed_over_hosts():
+    limiter = UpstreamRateLimiter({'mb': (1, 1), 'wiki': (50, 10), 'nominatim': (1, 1)})
+    assert limiter.concurrency(0.2) == pytest.approx(0.2 + 10 + 0.2)
+    assert UpstreamRateLimiter({}).concurrency(1.0) == 0
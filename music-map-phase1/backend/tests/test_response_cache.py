@@ -0,0 +1,42 @@
+from response_cache import ResponseCache, etag_matches, render_json
+
+
+def test_etag_is_stable_for_equal_payloads():
+    body, etag = render_json({'b': 1, 'a': [1, 2]})
+    assert (body, etag) == render_json({'a': [1, 2], 'b': 1})
+    assert etag != render_json({'a': [1, 2], 'b': 2})[1]
+
+
+def test_etag_matches_if_none_match_forms():
+    _, etag = render_json({'a': 1})
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag}', etag)
+    assert etag_matches('W/' + etag, etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches('', etag)
+
+
+def test_cached_entry_revalidates_until_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('response_cache.time.monotonic', lambda: now[0])
+    cache = ResponseCache(ttl_seconds=60)
+    stored = cache.put(('user', 'short_term'), {'artists': ['x']})
+    now[0] += 30
+    hit = cache.get(('user', 'short_term'))
+    assert hit is stored and etag_matches(stored.etag, hit.etag)
+    now[0] += 31
+    assert cache.get(('user', 'short_term')) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lru_bound_and_discard_where():
+    cache = ResponseCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)  # evicts b, the least recently used
+    assert cache.get('b') is None and cache.get('a') is not None
+    assert cache.discard_where(lambda key: key in ('a', 'c')) == 2
+    assert cache.stats()['entries'] == 0
@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from scheduler import PriorityScheduler, QueueFull
+
+CLASSES = {0: 'interactive', 1: 'refresh', 2: 'warm'}
+
+
+@pytest.fixture
+def held():
+    """``(scheduler, release)``: a one-worker scheduler whose worker is busy until ``release`` is set."""
+    started, release = threading.Event(), threading.Event()
+    scheduler = PriorityScheduler(max_workers=1, max_queue=2, classes=CLASSES)
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    scheduler.submit(hold, priority=0)
+    assert started.wait(5)
+    yield scheduler, release
+    release.set()
+
+
+def test_full_queue_displaces_newest_less_urgent(held):
+    scheduler, release = held
+    older = scheduler.submit(lambda: 'older', priority=2)
+    newer = scheduler.submit(lambda: 'newer', priority=2)
+    urgent = scheduler.submit(lambda: 'urgent', priority=0)
+    assert newer.cancelled()
+    assert not older.cancelled()
+    assert scheduler.depth() == {'interactive': 1, 'refresh': 0, 'warm': 1}
+    assert scheduler.stats()['classes']['warm']['displaced'] == 1
+    release.set()
+    assert urgent.result(5) == 'urgent'
+    assert older.result(5) == 'older'
+
+
+def test_full_queue_of_equal_priority_raises(held):
+    scheduler, _ = held
+    scheduler.submit(lambda: None, priority=1)
+    scheduler.submit(lambda: None, priority=0)
+    with pytest.raises(QueueFull):
+        scheduler.submit(lambda: None, priority=1)
+    with pytest.raises(QueueFull):
+        scheduler.submit(lambda: None, priority=2, block=True, timeout=0.05)
+    classes = scheduler.stats()['classes']
+    assert (classes['refresh']['rejected'], classes['warm']['rejected']) == (1, 1)
+
+
+def test_blocked_submit_proceeds_when_room_frees(held):
+    scheduler, release = held
+    scheduler.submit(lambda: None, priority=0)
+    scheduler.submit(lambda: None, priority=0)
+    threading.Timer(0.05, release.set).start()
+    assert scheduler.submit(lambda: 'warm', priority=2, block=True, timeout=5).result(5) == 'warm'
+
+
+def test_runs_most_urgent_first_and_promotes(held):
+    scheduler, release = held
+    order = []
+    warm = scheduler.submit(order.append, 'warm', priority=2)
+    refresh = scheduler.submit(order.append, 'refresh', priority=1)
+    assert scheduler.promote(warm, 0)
+    release.set()
+    refresh.result(5)
+    warm.result(5)
+    assert order == ['warm', 'refresh']
+    assert not scheduler.promote(warm, 0)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+from session_store import SQLiteSessionInterface
+
+LIFETIME = 100
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('session_store.time.time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def app(tmp_path, clock):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.permanent_session_lifetime = timedelta(seconds=LIFETIME)
+    app.session_interface = SQLiteSessionInterface(str(tmp_path / 'sessions.sqlite3'), sweep_interval=0)
+
+    @app.route('/login/<user>')
+    def login(user):
+        session['user'] = user
+        return ''
+
+    @app.route('/whoami')
+    def whoami():
+        return session.get('user', '')
+
+    @app.route('/logout')
+    def logout():
+        session.clear()
+        return ''
+
+    return app
+
+
+def sid(client):
+    cookie = client.get_cookie('session')
+    return cookie.value if cookie else None
+
+
+def row(app, session_id):
+    return app.session_interface.db.connection().execute(
+        'SELECT data, expires FROM sessions WHERE id = ?', (session_id,)).fetchone()
+
+
+def test_round_trip(app):
+    client = app.test_client()
+    assert client.get('/whoami').text == ''
+    assert sid(client) is None  # an empty session is never stored
+    client.get('/login/alice')
+    assert client.get('/whoami').text == 'alice'
+    assert app.session_interface.count() == 1
+    assert 'alice' in row(app, sid(client))[0]
+
+
+def test_logout_deletes_the_row(app):
+    client = app.test_client()
+    client.get('/login/alice')
+    session_id = sid(client)
+    client.get('/logout')
+    assert row(app, session_id) is None
+    assert sid(client) is None
+    assert client.get('/whoami').text == ''
+
+
+def test_unmodified_session_is_renewed_only_past_half_life(app, clock):
+    client = app.test_client()
+    client.get('/login/alice')
+    session_id = sid(client)
+    clock[0] += LIFETIME / 2 - 1
+    client.get('/whoami')
+    assert row(app, session_id)[1] == 1000 + LIFETIME  # not rewritten
+    clock[0] += 2
+    client.get('/whoami')
+    assert row(app, session_id)[1] == clock[0] + LIFETIME
+    assert sid(client) == session_id
+
+
+@pytest.mark.parametrize('expired', [False, True])
+def test_unknown_or_expired_sid_gets_a_new_sid(app, clock, expired):
+    client = app.test_client()
+    if expired:
+        client.get('/login/alice')
+        clock[0] += LIFETIME + 1
+    else:
+        client.set_cookie('session', 'chosen-by-attacker')
+    stale = sid(client)
+    assert client.get('/whoami').text == ''
+    client.get('/login/bob')
+    assert sid(client) != stale
+    assert row(app, stale) is None or row(app, stale)[1] <= clock[0]
+
+
+def test_sweep_deletes_only_expired_rows(app, clock):
+    first, second = app.test_client(), app.test_client()
+    first.get('/login/alice')
+    clock[0] += 60
+    second.get('/login/bob')
+    clock[0] += 60  # alice's row expired, bob's has not
+    app.test_client().get('/login/carol')  # a write triggers the sweep
+    assert app.session_interface.count() == 2
+    assert second.get('/whoami').text == 'bob'
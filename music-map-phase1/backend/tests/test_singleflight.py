@@ -0,0 +1,52 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight, entered, release = SingleFlight(), threading.Event(), threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        entered.set()
+        release.wait(5)
+        return {'artist': 'x'}
+
+    with ThreadPoolExecutor(4) as pool:
+        leader = pool.submit(flight.do, 'x', fetch)
+        assert entered.wait(5)
+        followers = [pool.submit(flight.do, 'x', fetch) for _ in range(3)]
+        while flight.stats()['coalesced'] < 3:
+            time.sleep(0.01)
+        release.set()
+        results = [leader.result(5)] + [f.result(5) for f in followers]
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.in_flight() == 0
+
+
+def test_error_reaches_every_waiter_and_is_not_remembered():
+    flight, entered, release = SingleFlight(), threading.Event(), threading.Event()
+
+    def failing():
+        entered.set()
+        release.wait(5)
+        raise LookupError('upstream down')
+
+    with ThreadPoolExecutor(2) as pool:
+        leader = pool.submit(flight.do, 'x', failing)
+        assert entered.wait(5)
+        follower = pool.submit(flight.do, 'x', failing)
+        while flight.stats()['coalesced'] < 1:
+            time.sleep(0.01)
+        release.set()
+        for future in (leader, follower):
+            with pytest.raises(LookupError, match='upstream down'):
+                future.result(5)
+    assert flight.in_flight() == 0
+    assert flight.do('x', lambda: 'recovered') == 'recovered'
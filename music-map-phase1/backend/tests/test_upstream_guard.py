@@ -0,0 +1,63 @@
+import pytest
+
+from upstream_guard import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+
+def tripped(reset_timeout, transitions=None):
+    """A breaker opened by two failures; state changes are appended to ``transitions``."""
+    transitions = [] if transitions is None else transitions
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=reset_timeout,
+                             on_state_change=lambda name, old, new: transitions.append((old, new)))
+    for _ in range(2):
+        breaker.allow()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_consecutive_failures():
+    breaker = tripped(reset_timeout=60)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_admits_one_probe():
+    breaker = tripped(reset_timeout=0)
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # the probe is still in flight
+
+
+def test_half_open_probe_success_closes():
+    transitions = []
+    breaker = tripped(reset_timeout=0, transitions=transitions)
+    breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert transitions == [(CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED)]
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = tripped(reset_timeout=0)
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.stats()['opened'] == 2
+
+
+def test_released_probe_lets_another_through():
+    breaker = tripped(reset_timeout=0)
+    breaker.allow()
+    breaker.release()
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
@@ -0,0 +1,67 @@
+import pytest
+
+from wiki_infobox import clean_wikitext_value, has_infobox, infobox_fields, origin_from_wikitext
+
+BAND = """{{Short description|Finnish band}}
+{{Infobox musical artist
+| name = Example Band <!-- not the Swedish one -->
+| image = Example.jpg
+| origin = [[Helsinki]], [[Finland]]<ref name="bio">{{cite web|url=https://example.org|title=Bio}}</ref>
+| genre = {{hlist|[[Indie pop]]|[[Dream pop]]}}
+| years_active = 2010–present
+| label = {{ubl|[[Sub Pop|Sub Pop Records]]|Bella Union}}
+}}
+'''Example Band''' is a band from {{city|Helsinki}}.
+"""
+
+
+def test_fields_in_template_order():
+    fields = infobox_fields(BAND)
+    assert [name for name, _ in fields] == ['name', 'image', 'origin', 'genre', 'years_active', 'label']
+    assert dict(fields)['name'] == 'Example Band'  # comment removed
+
+
+def test_pipes_inside_links_and_nested_templates_do_not_split_fields():
+    fields = dict(infobox_fields(BAND))
+    assert fields['origin'] == '[[Helsinki]], [[Finland]]'  # <ref> with its own template removed
+    assert fields['genre'] == '{{hlist|[[Indie pop]]|[[Dream pop]]}}'
+    assert fields['label'] == '{{ubl|[[Sub Pop|Sub Pop Records]]|Bella Union}}'
+
+
+def test_field_names_are_normalized():
+    assert infobox_fields("{{Infobox person\n| Birth Place = Oslo\n}}") == [('birth_place', 'Oslo')]
+
+
+@pytest.mark.parametrize('wikitext', ['', 'No templates here.', '{{Short description|x}} text <!-- {{Infobox band}} -->'])
+def test_missing_infobox(wikitext):
+    assert infobox_fields(wikitext) == []
+    assert origin_from_wikitext(wikitext) is None
+    assert not has_infobox(wikitext)
+
+
+@pytest.mark.parametrize('raw, cleaned', [
+    ('[[Helsinki]], [[Finland]]', 'Helsinki, Finland'),
+    ('[[Portland, Oregon|Portland]], U.S.', 'Portland, U.S.'),
+    ('{{hlist|[[Indie pop]]|[[Dream pop]]}}', 'Indie pop'),
+    ('{{ubl|[[Sub Pop|Sub Pop Records]]|Bella Union}}', 'Sub Pop Records'),
+    ('{{nowrap|{{small|[[Reykjavík]]}}}}', 'Reykjavík'),
+    ('{{flagicon|NOR}} [[Bergen]], Norway', 'Bergen, Norway'),
+    ('Montreal, Quebec<br />Canada', 'Montreal, Quebec'),
+    ('* [[Athens]], Georgia\n* [[Atlanta]]', 'Athens, Georgia'),
+    ("''[[Leeds]]''&nbsp;England", 'Leeds England'),
+    ('[https://example.org Glasgow], Scotland', 'Glasgow, Scotland'),
+    ('', ''),
+])
+def test_clean_wikitext_value(raw, cleaned):
+    assert clean_wikitext_value(raw) == cleaned
+
+
+def test_origin_prefers_the_first_origin_like_field():
+    wikitext = "{{Infobox musical artist\n| birth_place = [[Turku]] (born)\n| origin = [[Helsinki]]\n}}"
+    assert origin_from_wikitext(wikitext) == ('birth_place', 'Turku')
+    assert origin_from_wikitext(BAND) == ('origin', 'Helsinki, Finland')
+
+
+def test_origin_skips_values_too_short_to_be_places():
+    wikitext = "{{Infobox musical artist\n| origin = {{citation needed}}\n| location = [[Lund]], Sweden\n}}"
+    assert origin_from_wikitext(wikitext) == ('location', 'Lund, Sweden')
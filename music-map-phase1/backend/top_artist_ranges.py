@@ -0,0 +1,48 @@
+"""
+One user's Spotify top artists across all time ranges.
+
+Spotify ranks a user's artists separately for ``short_term``,
+``medium_term`` and ``long_term``, and the three lists mostly overlap. A
+``TopArtistsLibrary`` is built from all three at once. It keeps each artist
+once, keyed by Spotify ID, and each range is a ranked list of IDs into that
+table. The route resolves the union in one batch and answers every range as
+a view of it, so switching ranges does not start another lookup run.
+"""
+import time
+
+
+class TopArtistsLibrary:
+    __slots__ = ('artists', 'ranges', 'created')
+
+    def __init__(self, ranges):
+        """``ranges`` maps time range -> Spotify artist objects in rank order."""
+        self.artists = {}  # Spotify ID -> artist object (as first seen)
+        self.ranges = {}   # time range -> [Spotify ID], ranked, without duplicates
+        self.created = time.monotonic()  # for ResponseCache expiry
+        for time_range, items in ranges.items():
+            ids, seen = [], set()
+            for artist in items:
+                key = artist.get('id') or artist['name']
+                if key in seen:
+                    continue  # pages fetched while the ranking moved can repeat an artist
+                seen.add(key)
+                self.artists.setdefault(key, artist)
+                ids.append(key)
+            self.ranges[time_range] = ids
+
+    def view(self, time_range):
+        """The range's artists in rank order."""
+        return [self.artists[key] for key in self.ranges.get(time_range, [])]
+
+    def others(self, time_range):
+        """Artists of the other ranges that ``time_range`` lacks, best rank in any range first."""
+        own = set(self.ranges.get(time_range, []))
+        best = {}
+        for ids in self.ranges.values():
+            for rank, key in enumerate(ids):
+                if key not in own:
+                    best[key] = min(rank, best.get(key, rank))
+        return [self.artists[key] for key in sorted(best, key=best.get)]
+
+    def __len__(self):
+        return len(self.artists)
@@ -0,0 +1,161 @@
+"""
+Latency budgets and circuit breakers for upstream APIs.
+
+A ``Deadline`` is created where a budget starts (a streamed request, one
+artist's pipeline run) and handed down the pipeline. ``deadline.run(fn)``
+makes it the current deadline for that call, including calls made on
+worker threads. The cached lookups keep their one-key signatures, and
+``upstream_call`` reads the current deadline before each request: it
+refuses to queue for a rate-limit token past the deadline and clamps the
+request's timeout to what is left.
+
+One ``CircuitBreaker`` per upstream host counts consecutive failures
+(timeouts, 5xx, 429). After ``failure_threshold`` of them the breaker opens
+and calls fail at once with ``CircuitOpenError``, without waiting on the
+host. After ``reset_timeout`` seconds a single probe call is let through
+(half-open). If the probe succeeds the breaker closes; if it fails the
+breaker opens again.
+"""
+import contextvars
+import threading
+import time
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}  # for the metrics gauge
+
+_current_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class UpstreamUnavailable(Exception):
+    """An upstream call was not made (or was abandoned); the caller should fall through, not cache a miss."""
+
+
+class UpstreamError(UpstreamUnavailable):
+    """The host timed out, was unreachable or answered 5xx / 429."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class Deadline:
+    """A point in time by which some work must be done; ``seconds=None`` means no budget."""
+
+    def __init__(self, seconds=None):
+        self.budget = seconds
+        self.expires = None if seconds is None else time.monotonic() + seconds
+
+    @staticmethod
+    def current():
+        return _current_deadline.get()
+
+    def remaining(self):
+        """Seconds left (never negative), or None without a budget."""
+        return None if self.expires is None else max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return self.expires is not None and time.monotonic() >= self.expires
+
+    def timeout(self, default):
+        """``default`` clamped to the time left."""
+        remaining = self.remaining()
+        return default if remaining is None else min(default, remaining)
+
+    def check(self, what):
+        if self.expired():
+            raise DeadlineExceeded(f"{what}: {self.budget:g}s budget spent")
+
+    def run(self, fn, *args, **kwargs):
+        """Call ``fn`` with this as the current deadline (also on executor threads)."""
+        token = _current_deadline.set(self)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_deadline.reset(token)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0, on_state_change=None):
+        """``on_state_change(name, old_state, new_state)`` is called outside the lock."""
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0        # consecutive
+        self._opened_at = 0.0
+        self._probing = False     # a half-open probe is in flight
+        self._opened = 0
+        self._rejected = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow(self):
+        """Reserve a call. Raises CircuitOpenError while the breaker is open (or its probe is in flight)."""
+        with self._lock:
+            old = self._state
+            if old == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state, self._probing = HALF_OPEN, False
+            if self._state == CLOSED or (self._state == HALF_OPEN and not self._probing):
+                self._probing = self._state == HALF_OPEN
+                new = self._state
+            else:
+                self._rejected += 1
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+                new = None
+        if new is None:
+            raise CircuitOpenError(f"{self.name}: circuit open, next probe in {retry_in:.0f}s")
+        self._notify(old, new)
+
+    def record_success(self):
+        with self._lock:
+            old = self._state
+            self._failures = 0
+            if old == HALF_OPEN:
+                self._state, self._probing = CLOSED, False
+            new = self._state
+        self._notify(old, new)
+
+    def record_failure(self):
+        with self._lock:
+            old = self._state
+            self._failures += 1
+            if old == HALF_OPEN or (old == CLOSED and self._failures >= self.failure_threshold):
+                self._state, self._probing = OPEN, False
+                self._opened_at = time.monotonic()
+                self._opened += 1
+            new = self._state
+        self._notify(old, new)
+
+    def release(self):
+        """The reserved call told us nothing about the host (skipped, or failed on our side)."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def _notify(self, old, new):
+        if old != new and self.on_state_change:
+            self.on_state_change(self.name, old, new)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'opened': self._opened,
+                'rejected': self._rejected,
+            }
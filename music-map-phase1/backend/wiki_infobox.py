@@ -0,0 +1,147 @@
+"""
+Infobox origin extraction from raw wikitext.
+
+Instead of downloading a rendered article and building a full HTML tree,
+the app asks the MediaWiki API for the wikitext of the lead section
+(``action=parse&prop=wikitext&section=0``), which holds the infobox, and
+reads the ``origin``/``birth_place`` fields with the small scanner below.
+
+``ExtractionStats`` counts bytes and parse time per extraction path so the
+wikitext and HTML paths can be compared on live traffic.
+"""
+import html
+import re
+import threading
+
+# Infobox fields that name where an artist is from; the first one present (in template order) wins
+ORIGIN_FIELDS = ('origin', 'birth_place', 'hometown', 'location')
+
+# Templates replaced by their first argument (lists, formatting); any other template is dropped
+UNWRAP_TEMPLATES = {'nowrap', 'nobr', 'small', 'hlist', 'flatlist', 'plainlist', 'ubl', 'unbulleted list',
+                    'unbulleted_list', 'plain list', 'flat list', 'csv'}
+
+_INFOBOX_START = re.compile(r'\{\{\s*infobox', re.IGNORECASE)
+_COMMENT = re.compile(r'<!--.*?-->', re.DOTALL)
+_REF = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref\s*>', re.DOTALL | re.IGNORECASE)
+_INNER_TEMPLATE = re.compile(r'\{\{([^{}]*)\}\}')
+_WIKILINK = re.compile(r'\[\[(?:[^\[\]|]*\|)?([^\[\]|]*)\]\]')
+_EXTERNAL_LINK = re.compile(r'\[https?://\S+\s*([^\]]*)\]')
+_LINE_BREAK = re.compile(r'<br\s*/?>', re.IGNORECASE)
+_TAG = re.compile(r'<[^>]+>')
+
+
+def infobox_fields(wikitext):
+    """``[(field, raw value)]`` of the first infobox in ``wikitext``, in template order."""
+    wikitext = _REF.sub('', _COMMENT.sub('', wikitext))
+    start = _INFOBOX_START.search(wikitext)
+    if not start:
+        return []
+    parts, current = [], []
+    template_depth = link_depth = 0
+    i, end = start.start(), len(wikitext)
+    while i < end:
+        pair = wikitext[i:i + 2]
+        if pair == '{{':
+            template_depth += 1
+            i += 2
+            if template_depth > 1: current.append(pair)
+            continue
+        if pair == '}}':
+            template_depth -= 1
+            i += 2
+            if template_depth == 0: break
+            current.append(pair)
+            continue
+        if pair == '[[':
+            link_depth += 1
+            current.append(pair)
+            i += 2
+            continue
+        if pair == ']]':
+            link_depth = max(0, link_depth - 1)
+            current.append(pair)
+            i += 2
+            continue
+        ch = wikitext[i]
+        if ch == '|' and template_depth == 1 and link_depth == 0:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(ch)
+        i += 1
+    parts.append(''.join(current))
+
+    fields = []
+    for part in parts[1:]:  # parts[0] is the template name
+        name, sep, value = part.partition('=')
+        if sep:
+            fields.append((name.strip().lower().replace(' ', '_'), value.strip()))
+    return fields
+
+
+def _replace_template(match):
+    args = match.group(1).split('|')
+    name = args[0].strip().lower()
+    if name in UNWRAP_TEMPLATES and len(args) > 1:
+        return next((arg for arg in args[1:] if arg.strip() and '=' not in arg), '')
+    return ''
+
+
+def clean_wikitext_value(value):
+    """Plain text of the first line/list item of an infobox value."""
+    value = _WIKILINK.sub(r'\1', value)  # before templates, so piped links don't split template arguments
+    for _ in range(10):  # innermost templates first; nesting is shallow in practice
+        value, replaced = _INNER_TEMPLATE.subn(_replace_template, value)
+        if not replaced: break
+    value = _EXTERNAL_LINK.sub(r'\1', value)
+    value = _TAG.sub('', _LINE_BREAK.sub('\n', value))
+    value = html.unescape(value.replace("'''", '').replace("''", '')).replace('\xa0', ' ')
+    for line in value.split('\n'):
+        line = re.sub(r'\s+', ' ', line.strip().lstrip('*#:').strip())
+        if line:
+            return line
+    return ''
+
+
+def origin_from_wikitext(wikitext):
+    """``(field, origin)`` from the first infobox origin-like field, or None."""
+    for field, raw_value in infobox_fields(wikitext):
+        if field not in ORIGIN_FIELDS:
+            continue
+        origin = clean_wikitext_value(raw_value).split('(')[0].strip().strip(',. ')
+        if len(origin) > 2:
+            return field, origin
+    return None
+
+
+def has_infobox(wikitext):
+    return bool(_INFOBOX_START.search(_COMMENT.sub('', wikitext or '')))
+
+
+class ExtractionStats:
+    """Per-path counters: lookups, response bytes, parse time and hits."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def record(self, path, response_bytes, parse_seconds, found):
+        with self._lock:
+            stats = self._paths.setdefault(path, {'lookups': 0, 'bytes': 0, 'parse_seconds': 0.0, 'found': 0})
+            stats['lookups'] += 1
+            stats['bytes'] += response_bytes
+            stats['parse_seconds'] += parse_seconds
+            stats['found'] += bool(found)
+
+    def stats(self):
+        with self._lock:
+            return {
+                path: {
+                    'lookups': s['lookups'],
+                    'found': s['found'],
+                    'bytes_total': s['bytes'],
+                    'bytes_mean': round(s['bytes'] / s['lookups']) if s['lookups'] else 0,
+                    'parse_ms_mean': round(s['parse_seconds'] / s['lookups'] * 1000, 3) if s['lookups'] else 0.0,
+                }
+                for path, s in self._paths.items()
+            }
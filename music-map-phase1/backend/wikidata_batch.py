@@ -0,0 +1,109 @@
+"""
+Batched Wikipedia -> Wikidata origin lookup.
+
+One MediaWiki ``action=query`` call maps up to 50 artist names to article
+titles (following normalization and redirects) and Wikidata item IDs. One
+Wikidata SPARQL query then returns, for all of those items at once, the
+formation location (P740) or place of birth (P19), with each place's label,
+country and coordinates (P625).
+
+Country of origin (P495) is not asked for: the answer is stored as the
+infobox origin, and a country alone would outrank a city from MusicBrainz.
+
+These helpers only build requests and parse responses; the HTTP calls,
+rate limiting and caching live in app.py.
+"""
+import re
+
+WIKIPEDIA_BATCH_SIZE = 50  # MediaWiki limit on titles per query for normal clients
+
+# Origin properties in order of preference; both name a place at least as specific as an infobox origin
+ORIGIN_PROPERTIES = ('P740', 'P19')
+
+_POINT = re.compile(r'Point\(\s*([-\d.eE]+)\s+([-\d.eE]+)\s*\)')
+_QID = re.compile(r'Q\d+$')
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def title_query_params(titles):
+    return {
+        'action': 'query', 'titles': '|'.join(titles), 'redirects': 1,
+        'prop': 'pageprops', 'ppprop': 'wikibase_item|disambiguation',
+        'format': 'json', 'formatversion': 2,
+    }
+
+
+def items_for_titles(titles, payload):
+    """``{title: QID, or None if there is no such article}`` from an ``action=query`` response.
+
+    Titles whose page exists but has no Wikidata item, or is a
+    disambiguation page, are left out: nothing is known about them yet.
+    """
+    query = payload.get('query', {})
+    renamed = {}
+    for step in query.get('normalized', []) + query.get('redirects', []):
+        renamed[step['from']] = step['to']
+    pages = {page['title']: page for page in query.get('pages', [])}
+
+    items = {}
+    for title in titles:
+        final, seen = title, set()
+        while final in renamed and final not in seen:  # normalized -> redirect target
+            seen.add(final)
+            final = renamed[final]
+        page = pages.get(final)
+        if page is None:
+            continue
+        if page.get('missing') or page.get('invalid'):
+            items[title] = None
+            continue
+        props = page.get('pageprops', {})
+        if 'disambiguation' not in props and props.get('wikibase_item'):
+            items[title] = props['wikibase_item']
+    return items
+
+
+def origin_sparql(qids):
+    values = ' '.join(f'wd:{qid}' for qid in qids if _QID.match(qid))
+    props = ' '.join(f'wdt:{prop}' for prop in ORIGIN_PROPERTIES)
+    return f"""SELECT ?item ?prop ?placeLabel ?countryLabel ?coord WHERE {{
+  VALUES ?item {{ {values} }}
+  VALUES ?prop {{ {props} }}
+  ?item ?prop ?place .
+  OPTIONAL {{ ?place wdt:P625 ?coord . }}
+  OPTIONAL {{ ?place wdt:P17 ?country . }}
+  SERVICE wikibase:label {{ bd:serviceParam wikibase:language "en". }}
+}}"""
+
+
+def origins_from_bindings(payload):
+    """``{QID: {"origin", "lat", "lon", "property"}}`` from SPARQL JSON results, best property per item.
+
+    ``origin`` reads like an infobox value ("Helsinki, Finland"); ``lat`` and
+    ``lon`` are None when the place has no coordinates.
+    """
+    best = {}
+    for row in payload.get('results', {}).get('bindings', []):
+        qid = row['item']['value'].rsplit('/', 1)[-1]
+        prop = row['prop']['value'].rsplit('/', 1)[-1]
+        place = row.get('placeLabel', {}).get('value', '')
+        if not place or _QID.match(place):  # no English label
+            continue
+        country = row.get('countryLabel', {}).get('value', '')
+        lat = lon = None
+        point = _POINT.match(row.get('coord', {}).get('value', ''))
+        if point:
+            lon, lat = float(point.group(1)), float(point.group(2))
+        candidate = {
+            'origin': f"{place}, {country}" if country and country != place and not _QID.match(country) else place,
+            'lat': lat, 'lon': lon, 'property': prop,
+        }
+        current = best.get(qid)
+        rank = (ORIGIN_PROPERTIES.index(prop), lat is None)
+        if current is None or rank < (ORIGIN_PROPERTIES.index(current['property']), current['lat'] is None):
+            best[qid] = candidate
+    return best